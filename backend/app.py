@@ -2,57 +2,135 @@
 Flask APIサーバー
 フロントエンドからのOCR処理リクエストを受け付けてPython OCRエンジンを実行
 """
+import json
 import os
 import tempfile
+import threading
 import uuid
 import time
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, Response, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from main import process_pdf
+from config import env_flag, env_int
+from main import process_pdf, warmup_engines, ADAPTIVE_DPI, COLOR_MODES, TEXT_LAYER_MODES
+from jobs import JobManager, JobQueueFull
+from workers import OcrWorkerPool
+from image_input import ImageDocument, is_image_upload
+import doc_cache
+import metrics
 
 app = Flask(__name__)
 CORS(app)  # CORS有効化
 
+
+# OCRワーカープロセス数（1以上で各プロセスがエンジンを1組ずつ持つ本番モード。0 ならこのプロセス内で実行）
+SERVER_WORKERS = max(0, env_int('OCR_SERVER_WORKERS', 0))
+# 起動時に start_worker_pool() で作成する
+worker_pool = None
+
+# 非同期OCRジョブの実行管理（同時実行数は OCR_JOB_WORKERS、ワーカープロセス使用時はその数で制御）
+job_manager = JobManager(max_workers=SERVER_WORKERS) if SERVER_WORKERS else JobManager()
+
 # 一時ファイル保存用ディレクトリ
 UPLOAD_FOLDER = tempfile.gettempdir()
-ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'tiff', 'tif'}
+ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'tiff', 'tif', 'zip'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB制限
 
 
+class SpoolingRequest(Request):
+    """アップロードファイルを受信しながら UPLOAD_FOLDER のスプールファイルへ直接書き出すリクエスト
+
+    既定ではアップロードは一時ファイル（小さいものはメモリ）に受信された後、file.save で
+    もう一度コピーされる。ここでは受信先を最初から UPLOAD_FOLDER に置き、_save_upload で
+    リネームするだけにする。使われなかったスプールファイルはリクエスト終了時に削除する。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spool_paths = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = tempfile.NamedTemporaryFile(
+            'wb+', dir=app.config['UPLOAD_FOLDER'], prefix='upload_', suffix='.part', delete=False,
+        )
+        self.spool_paths.append(spool.name)
+        return spool
+
+    def close(self):
+        super().close()
+        for path in self.spool_paths:
+            if os.path.exists(path):
+                safe_remove(path)
+
+
+app.request_class = SpoolingRequest
+
+
+# 同一ファイル・同一パラメータの再アップロード時に処理済みPDFを再利用する（0 / false / off で無効）
+if env_flag('OCR_DOC_CACHE'):
+    document_cache = doc_cache.DocumentCache(
+        os.environ.get('OCR_DOC_CACHE_DIR') or os.path.join(UPLOAD_FOLDER, 'ocr-pdf-converter', 'doc_cache'),
+        ttl_sec=max(60, env_int('OCR_DOC_CACHE_TTL_SEC', 24 * 3600)),
+        max_bytes=max(1, env_int('OCR_DOC_CACHE_MAX_MB', 1024)) * 1024 * 1024,
+    )
+else:
+    document_cache = None
+
+# ページ単位のチェックポイント（処理中にサーバーが停止しても、同じファイル・同じパラメータで
+# 再投入すると完了済みのページを再利用して残りだけを処理する。0 / false / off で無効）
+if env_flag('OCR_CHECKPOINT'):
+    CHECKPOINT_DIR = (
+        os.environ.get('OCR_CHECKPOINT_DIR') or os.path.join(UPLOAD_FOLDER, 'ocr-pdf-converter', 'checkpoints')
+    )
+else:
+    CHECKPOINT_DIR = ''
+
+# ジョブのイベントストリーム（SSE）で、イベントがない間に送るキープアライブの間隔（秒）
+SSE_KEEPALIVE_SEC = max(1, env_int('OCR_SSE_KEEPALIVE_SEC', 15))
+# 同時に開けるイベントストリームの数（サーバー全体 / 1ジョブあたり）。
+# ストリームは接続中ずっとリクエストスレッドを1つ使うため、上限を超えた接続は 429 で断り、
+# waitress のスレッド数はこの上限分を上乗せして他のAPIが待たされないようにする
+SSE_MAX_STREAMS = max(1, env_int('OCR_SSE_MAX_STREAMS', 16))
+SSE_MAX_STREAMS_PER_JOB = max(1, env_int('OCR_SSE_MAX_STREAMS_PER_JOB', 2))
+_sse_streams = {}
+_sse_lock = threading.Lock()
+
+
+def _open_sse_stream(job_id):
+    """イベントストリームの枠を1つ確保する（上限に達していれば False）。"""
+    with _sse_lock:
+        if sum(_sse_streams.values()) >= SSE_MAX_STREAMS:
+            return False
+        if _sse_streams.get(job_id, 0) >= SSE_MAX_STREAMS_PER_JOB:
+            return False
+        _sse_streams[job_id] = _sse_streams.get(job_id, 0) + 1
+        return True
+
+
+def _close_sse_stream(job_id):
+    with _sse_lock:
+        remaining = _sse_streams.get(job_id, 0) - 1
+        if remaining > 0:
+            _sse_streams[job_id] = remaining
+        else:
+            _sse_streams.pop(job_id, None)
+
+
 def allowed_file(filename):
     """ファイル拡張子チェック"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def convert_image_to_pdf(image_path, pdf_path):
-    """画像ファイルをPDFに変換"""
-    from PIL import Image
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.utils import ImageReader
-    
-    try:
-        img = Image.open(image_path)
-        
-        # 画像サイズを取得（ピクセル）
-        img_width, img_height = img.size
-        
-        # A4固定にすると要件（A4以外にも対応）に反するため、
-        # 画像のピクセル寸法をそのままポイントとして扱い、ページサイズを画像に合わせる。
-        # ※ 透明テキスト埋め込みは後段で元PDFのページサイズ基準で行う。
-        page_w_pt = float(img_width)
-        page_h_pt = float(img_height)
-
-        c = canvas.Canvas(pdf_path, pagesize=(page_w_pt, page_h_pt))
-        c.drawImage(ImageReader(img), 0, 0, width=page_w_pt, height=page_h_pt)
-        c.save()
-        
-        return True
-    except Exception as e:
-        print(f"[画像→PDF変換エラー] {e}")
-        return False
+def _save_upload(file, path):
+    """受信済みのアップロードを path に置く（スプールファイルならリネームのみでコピーしない）。"""
+    spool_path = getattr(file.stream, 'name', None)
+    if isinstance(spool_path, str) and spool_path in request.spool_paths:
+        file.stream.close()
+        os.replace(spool_path, path)
+    else:
+        file.save(path)
 
 
 def safe_remove(path, attempts=5, delay_sec=0.2):
@@ -73,136 +151,367 @@ def safe_remove(path, attempts=5, delay_sec=0.2):
             return False
 
 
+def _remove_inputs(input_path, images=None):
+    """入力PDFと、画像入力の場合は元画像ファイルを削除する。"""
+    safe_remove(input_path)
+    if images is not None:
+        for path in images.paths:
+            safe_remove(path)
+
+
+SUPPORTED_ENGINES = {'onnxocr', 'paddleocr'}
+
+
+def _parse_engines(param):
+    """カンマ区切りのエンジン指定を解析する（未指定なら OCR_ENGINES、既定 paddleocr）。"""
+    param = (param or '').strip().lower()
+    if not param:
+        param = os.environ.get('OCR_ENGINES', 'paddleocr')
+    requested_engines = [e.strip() for e in param.lower().split(',') if e.strip()]
+    if not requested_engines:
+        requested_engines = ['paddleocr']
+    # サポートされているエンジンのみフィルタ
+    return [e for e in requested_engines if e in SUPPORTED_ENGINES]
+
+
+# 起動時プリロードの状態（/api/health・/api/ready で返す）
+# state: disabled（プリロードなし・初回リクエストで初期化）/ loading / ready / failed
+engine_preload = {
+    "state": "disabled",
+    "engines": {},
+    "cold_start_sec": None,
+}
+
+
+def start_engine_preload():
+    """OCR_ENGINES のエンジンをバックグラウンドで読み込み、ウォームアップ推論まで済ませる。"""
+    engines = _parse_engines(None)
+    engine_preload.update(state="loading", engines={eng: {"ready": False} for eng in engines})
+
+    def _run():
+        started = time.perf_counter()
+        report = warmup_engines(engines)
+        engine_preload["engines"] = report
+        engine_preload["cold_start_sec"] = round(time.perf_counter() - started, 3)
+        ready = bool(report) and all(status["ready"] for status in report.values())
+        engine_preload["state"] = "ready" if ready else "failed"
+        print(f"[API] エンジンのプリロード{'完了' if ready else '失敗'}: {engine_preload['cold_start_sec']}秒")
+
+    threading.Thread(target=_run, name='engine-preload', daemon=True).start()
+
+
+def start_worker_pool():
+    """OCRワーカープロセスを起動し、各プロセスで OCR_ENGINES のエンジンを読み込む。"""
+    global worker_pool
+    engines = _parse_engines(None)
+    engine_preload.update(state="loading", engines={eng: {"ready": False} for eng in engines}, workers={})
+    started = time.perf_counter()
+
+    def on_ready(reports):
+        engine_preload["workers"] = {str(pid): report for pid, report in reports.items()}
+        engine_preload["engines"] = {
+            eng: {
+                "ready": len(reports) == SERVER_WORKERS and all(r[eng]["ready"] for r in reports.values()),
+                "workers_ready": sum(1 for r in reports.values() if r[eng]["ready"]),
+            }
+            for eng in engines
+        }
+        engine_preload["cold_start_sec"] = round(time.perf_counter() - started, 3)
+        ready = all(status["ready"] for status in engine_preload["engines"].values())
+        engine_preload["state"] = "ready" if ready else "failed"
+        print(f"[API] ワーカー{len(reports)}プロセスのプリロード{'完了' if ready else '失敗'}: "
+              f"{engine_preload['cold_start_sec']}秒")
+
+    worker_pool = OcrWorkerPool(SERVER_WORKERS, engines, on_ready=on_ready)
+    worker_pool.start()
+
+
+def _is_ready():
+    return engine_preload["state"] in ("ready", "disabled")
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """ヘルスチェックエンドポイント"""
+    """ヘルスチェックエンドポイント（エンジンのプリロード状況とコールドスタート時間を含む）"""
     return jsonify({
         "status": "ok",
-        "message": "OCR API Server is running"
+        "message": "OCR API Server is running",
+        "ready": _is_ready(),
+        "preload": engine_preload,
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """レディネスチェックエンドポイント（エンジンのプリロード完了までは 503）"""
+    return jsonify({
+        "ready": _is_ready(),
+        "preload": engine_preload,
+    }), 200 if _is_ready() else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """処理段階ごとの所要時間ヒストグラム（Prometheus のテキスト形式）"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _error(message, status):
+    return jsonify({
+        "success": False,
+        "error": message
+    }), status
+
+
+def _prepare_ocr_request():
+    """
+    OCRリクエストのファイル検証・パラメータ取得・入力ファイル保存を行う
+
+    戻り値:
+        (params, None): process_pdf に渡すパラメータ（input_path / output_path を含む）
+        (None, エラーレスポンス): 検証・変換エラー時
+    """
+    # ファイルの検証（初回の request.files でアップロードを受信し、スプールファイルへ書き出す）
+    with metrics.span('upload'):
+        files = request.files
+    if 'file' not in files:
+        return None, _error("ファイルが送信されていません", 400)
+
+    file = files['file']
+
+    if file.filename == '':
+        return None, _error("ファイル名が空です", 400)
+
+    if not allowed_file(file.filename):
+        return None, _error("PDF、JPEG、PNG、TIFF、画像のZIPファイルのみ対応しています", 400)
+
+    # パラメータ取得
+    # dpi='auto' はページごとに文字サイズから解像度を決める（適応DPI）
+    dpi_param = (request.form.get('dpi', '') or '').strip().lower() or '300'
+    if dpi_param == ADAPTIVE_DPI:
+        dpi = ADAPTIVE_DPI
+    else:
+        try:
+            dpi = int(dpi_param)
+        except ValueError:
+            dpi = 0
+        if dpi <= 0:
+            return None, _error(f"dpi は正の整数または '{ADAPTIVE_DPI}' を指定してください。", 400)
+    confidence_threshold = float(request.form.get('confidence_threshold', 0.5))
+    # 複数エンジン対応: カンマ区切りで複数エンジンを指定可能
+    valid_engines = _parse_engines(request.form.get('ocr_engines', ''))
+    if not valid_engines:
+        return None, _error(
+            "ocr_engines は 'onnxocr' および/または 'paddleocr' をカンマ区切りで指定してください（例: onnxocr,paddleocr）。",
+            400,
+        )
+
+    # 既存テキストレイヤーの扱い（未指定ならサーバー設定 OCR_TEXT_LAYER_MODE）
+    text_layer_mode = (request.form.get('text_layer_mode', '') or '').strip().lower() or None
+    if text_layer_mode is not None and text_layer_mode not in TEXT_LAYER_MODES:
+        return None, _error(
+            f"text_layer_mode は {' / '.join(TEXT_LAYER_MODES)} のいずれかを指定してください。",
+            400,
+        )
+
+    # レンダリングの色モード（未指定ならサーバー設定 OCR_COLOR_MODE）
+    color_mode = (request.form.get('color_mode', '') or '').strip().lower() or None
+    if color_mode is not None and color_mode not in COLOR_MODES:
+        return None, _error(
+            f"color_mode は {' / '.join(COLOR_MODES)} のいずれかを指定してください。",
+            400,
+        )
+
+    # ファイル保存
+    original_name = file.filename
+    filename = secure_filename(original_name)
+    # secure_filename が空文字/拡張子欠落になる環境があるため補正
+    if not filename:
+        filename = 'upload.pdf'
+
+    # 画像ファイル（画像をまとめた ZIP を含む）かどうかを判定
+    is_image = is_image_upload(filename)
+
+    token = uuid.uuid4().hex
+    doc_key = None
+    images = None
+
+    if is_image:
+        # 画像ファイルの場合、まず画像として保存（OCRはこの画像のフレームを直接使うため処理後まで残す）
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], f"image_{token}_{filename}")
+        _save_upload(file, image_path)
+        print(f"[API] 画像ファイル受信: {original_name} -> {os.path.basename(image_path)}")
+        doc_key = _document_cache_key(image_path, dpi, confidence_threshold, valid_engines, text_layer_mode, color_mode)
+
+        # 元画像の圧縮データをそのまま埋め込んだ画像PDFを作る（全フレーム・ZIP内の全画像）
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"input_{token}_{filename}.pdf")
+        try:
+            with metrics.span('image_to_pdf'):
+                images = ImageDocument(image_path)
+                images.write_pdf(input_path)
+        except ValueError as e:
+            print(f"[API] 画像読み込みエラー: {e}")
+            safe_remove(image_path)
+            safe_remove(input_path)
+            return None, _error(f"画像を読み込めませんでした: {original_name}", 400)
+        except Exception as e:
+            print(f"[画像→PDF変換エラー] {e}")
+            safe_remove(image_path)
+            safe_remove(input_path)
+            return None, _error("画像からPDFへの変換に失敗しました", 500)
+        print(f"[API] 画像PDF作成完了: {images.page_count}ページ -> {os.path.basename(input_path)}")
+    else:
+        # PDFファイルの場合、直接保存
+        if not filename.lower().endswith('.pdf'):
+            filename = f"{filename}.pdf"
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"input_{token}_{filename}")
+        _save_upload(file, input_path)
+        print(f"[API] PDFファイル受信: {original_name} -> {os.path.basename(input_path)}")
+        doc_key = _document_cache_key(input_path, dpi, confidence_threshold, valid_engines, text_layer_mode, color_mode)
+
+    output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"output_{token}_{filename if not is_image else filename + '.pdf'}")
+
+    return {
+        "input_path": input_path,
+        "output_path": output_path,
+        "dpi": dpi,
+        "confidence_threshold": confidence_threshold,
+        "ocr_engines": valid_engines,
+        "text_layer_mode": text_layer_mode,
+        "color_mode": color_mode,
+        "doc_key": doc_key,
+        "images": images,
+    }, None
+
+
+def _document_cache_key(upload_path, dpi, confidence_threshold, ocr_engines, text_layer_mode, color_mode):
+    """文書キャッシュ・チェックポイントのキーを作る（どちらも無効なら None）。"""
+    if document_cache is None and not CHECKPOINT_DIR:
+        return None
+    return doc_cache.make_key(
+        upload_path,
+        dpi=dpi,
+        confidence_threshold=confidence_threshold,
+        ocr_engines=ocr_engines,
+        text_layer_mode=text_layer_mode,
+        color_mode=color_mode,
+    )
+
+
+def _process_pdf(input_path, output_path, **kwargs):
+    """OCR本体を実行する（ワーカープロセス使用時は空いているワーカーで実行する）。"""
+    if worker_pool is not None:
+        return worker_pool.process_pdf(input_pdf_path=input_path, output_pdf_path=output_path, **kwargs)
+    return process_pdf(input_path, output_path, **kwargs)
+
+
+def run_ocr_job(input_path, output_path, dpi, confidence_threshold, ocr_engines, text_layer_mode=None,
+                color_mode=None, doc_key=None, images=None, progress_callback=None, cancel_event=None,
+                event_callback=None):
+    """
+    OCR処理を実行してAPIレスポンス用の結果を返す（同期APIとジョブAPIで共通）
+
+    入力ファイル（画像入力なら元画像も）は処理後に削除する。
+    doc_key が文書キャッシュにあれば process_pdf を実行せず、処理済みPDFを出力ファイルとして返す。
+    doc_key はチェックポイントのキーにも使い、前回途中で止まった同じ文書は未完了のページだけを処理する。
+    event_callback(event, data) には process_pdf のページ単位のイベントを渡す。
+    """
+    if document_cache is not None and doc_key is not None:
+        cached = document_cache.fetch(doc_key, output_path)
+        if cached is not None:
+            _remove_inputs(input_path, images)
+            print(f"[API] 文書キャッシュヒット: {os.path.basename(output_path)}")
+            if progress_callback:
+                progress_callback(1, 1, "完了（キャッシュ）")
+            return {
+                "success": True,
+                "file_id": os.path.basename(output_path),
+                **cached,
+                "cached": True,
+                "message": "OCR処理が完了しました"
+            }
+
+    try:
+        # OCR処理実行（複数エンジン対応）
+        result = _process_pdf(
+            input_path,
+            output_path,
+            dpi=dpi,
+            confidence_threshold=confidence_threshold,
+            progress_callback=progress_callback,
+            ocr_engines=ocr_engines,  # 複数エンジンをリストで渡す
+            cancel_event=cancel_event,
+            event_callback=event_callback,
+            text_layer_mode=text_layer_mode,
+            color_mode=color_mode,
+            images=images,
+            checkpoint_dir=CHECKPOINT_DIR,
+            resume=True,
+            checkpoint_key=doc_key,
+        )
+    finally:
+        # 一時ファイル削除
+        _remove_inputs(input_path, images)
+
+    if not result["success"]:
+        if result.get("cancelled"):
+            # 途中までの出力は不要
+            safe_remove(output_path)
+        return result
+
+    summary = {
+        "pages_processed": result["pages_processed"],
+        "pages_skipped": result.get("pages_skipped", 0),  # テキストレイヤーがありOCRを省略したページ数
+        "pages_resumed": result.get("pages_resumed", 0),  # チェックポイントから再利用したページ数
+        "page_dpis": result.get("page_dpis"),  # ページごとに使用したDPI
+        "engines": result.get("engines", ocr_engines),  # 複数エンジン結果
+        "engine_stats": result.get("engine_stats"),  # エンジン別精度
+        "best_engine": result.get("best_engine"),  # 最高精度エンジン
+    }
+    if document_cache is not None and doc_key is not None:
+        try:
+            document_cache.store(doc_key, output_path, summary)
+        except Exception as e:
+            print(f"[API WARN] 文書キャッシュ登録失敗: {e}")
+
+    return {
+        "success": True,
+        "file_id": os.path.basename(output_path),
+        **summary,
+        "cached": False,
+        "message": "OCR処理が完了しました"
+    }
+
+
 @app.route('/api/ocr/process', methods=['POST'])
 def ocr_process():
     """
-    OCR処理エンドポイント
+    OCR処理エンドポイント（処理完了まで待機する同期API）
     
     リクエスト:
-        - file: PDFファイル（multipart/form-data）
-        - dpi: 解像度（オプション、デフォルト300）
+        - file: PDFファイル、画像（JPEG / PNG / マルチページTIFF）または画像のZIP（multipart/form-data）
+        - dpi: 解像度（オプション、デフォルト300。'auto' でページごとに自動選択）
         - confidence_threshold: 信頼度閾値（オプション、デフォルト0.5）
+        - text_layer_mode: 既存テキストレイヤーの扱い force / skip / image_only（オプション）
+        - color_mode: レンダリングの色モード auto / color / gray（オプション）
         
     レスポンス:
         - success: 成功/失敗
         - file_id: 処理済みファイルID
         - pages_processed: 処理ページ数
+        - pages_skipped: テキストレイヤーがありOCRを省略したページ数
+        - pages_resumed: 前回途中で止まった処理のチェックポイントから再利用したページ数
+        - cached: 同一ファイル・同一パラメータの処理済みPDFを再利用した場合 True
     """
     try:
-        # ファイルの検証
-        if 'file' not in request.files:
-            return jsonify({
-                "success": False,
-                "error": "ファイルが送信されていません"
-            }), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({
-                "success": False,
-                "error": "ファイル名が空です"
-            }), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({
-                "success": False,
-                "error": "PDF、JPEG、PNG、TIFFファイルのみ対応しています"
-            }), 400
-        
-        # パラメータ取得
-        dpi = int(request.form.get('dpi', 300))
-        confidence_threshold = float(request.form.get('confidence_threshold', 0.5))
-        # 複数エンジン対応: カンマ区切りで複数エンジンを指定可能
-        ocr_engines_param = (request.form.get('ocr_engines', '') or '').strip().lower()
-        if not ocr_engines_param:
-            ocr_engines_param = os.environ.get('OCR_ENGINES', 'paddleocr')
-        
-        # カンマ区切りでエンジンリストを作成
-        requested_engines = [e.strip() for e in ocr_engines_param.split(',') if e.strip()]
-        if not requested_engines:
-            requested_engines = ['paddleocr']
-        
-        # サポートされているエンジンのみフィルタ
-        valid_engines = [e for e in requested_engines if e in {'onnxocr', 'paddleocr'}]
-        if not valid_engines:
-            return jsonify({
-                "success": False,
-                "error": "ocr_engines は 'onnxocr' および/または 'paddleocr' をカンマ区切りで指定してください（例: onnxocr,paddleocr）。"
-            }), 400
-        
-        # ファイル保存
-        original_name = file.filename
-        filename = secure_filename(original_name)
-        # secure_filename が空文字/拡張子欠落になる環境があるため補正
-        if not filename:
-            filename = 'upload.pdf'
-        
-        # 画像ファイルかどうかを判定
-        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        is_image = file_ext in {'jpg', 'jpeg', 'png', 'tiff', 'tif'}
-        
-        token = uuid.uuid4().hex
-        
-        if is_image:
-            # 画像ファイルの場合、まず画像として保存
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], f"image_{token}_{filename}")
-            file.save(image_path)
-            print(f"[API] 画像ファイル受信: {original_name} -> {os.path.basename(image_path)}")
-            
-            # 画像をPDFに変換
-            input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"input_{token}_{filename}.pdf")
-            if not convert_image_to_pdf(image_path, input_path):
-                safe_remove(image_path)
-                return jsonify({
-                    "success": False,
-                    "error": "画像からPDFへの変換に失敗しました"
-                }), 500
-            
-            # 元の画像ファイルを削除
-            safe_remove(image_path)
-            print(f"[API] 画像→PDF変換完了: {os.path.basename(input_path)}")
-        else:
-            # PDFファイルの場合、直接保存
-            if not filename.lower().endswith('.pdf'):
-                filename = f"{filename}.pdf"
-            input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"input_{token}_{filename}")
-            file.save(input_path)
-            print(f"[API] PDFファイル受信: {original_name} -> {os.path.basename(input_path)}")
-        
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"output_{token}_{filename if not is_image else filename + '.pdf'}")
-        
-        # OCR処理実行（複数エンジン対応）
-        result = process_pdf(
-            input_path,
-            output_path,
-            dpi=dpi,
-            confidence_threshold=confidence_threshold,
-            ocr_engines=valid_engines,  # 複数エンジンをリストで渡す
-        )
-        
-        # 一時ファイル削除
-        safe_remove(input_path)
-        
+        params, error_response = _prepare_ocr_request()
+        if error_response is not None:
+            return error_response
+
+        result = run_ocr_job(**params)
+
         if result["success"]:
-            return jsonify({
-                "success": True,
-                "file_id": os.path.basename(output_path),
-                "pages_processed": result["pages_processed"],
-                "engines": result.get("engines", valid_engines),  # 複数エンジン結果
-                "engine_stats": result.get("engine_stats"),  # エンジン別精度
-                "best_engine": result.get("best_engine"),  # 最高精度エンジン
-                "message": "OCR処理が完了しました"
-            })
+            return jsonify(result)
         else:
             return jsonify({
                 "success": False,
@@ -217,6 +526,125 @@ def ocr_process():
         }), 500
 
 
+@app.route('/api/ocr/jobs', methods=['POST'])
+def ocr_job_submit():
+    """
+    OCRジョブ投入エンドポイント（非同期API）
+
+    リクエストは /api/ocr/process と同じ。処理はワーカープールで実行され、
+    レスポンスはジョブIDを即座に返す（202）。進捗は GET /api/ocr/jobs/<job_id> で取得するか、
+    GET /api/ocr/jobs/<job_id>/events（Server-Sent Events）で購読する。
+    """
+    try:
+        params, error_response = _prepare_ocr_request()
+        if error_response is not None:
+            return error_response
+
+        input_path, images = params["input_path"], params["images"]
+        try:
+            job = job_manager.submit(
+                run_ocr_job,
+                cleanup=lambda: _remove_inputs(input_path, images),
+                **params,
+            )
+        except JobQueueFull as e:
+            _remove_inputs(input_path, images)
+            return _error(str(e), 429)
+
+        print(f"[API] ジョブ投入: {job.job_id}")
+        return jsonify({
+            "success": True,
+            "job_id": job.job_id,
+            "status": job.status,
+        }), 202
+
+    except Exception as e:
+        print(f"[API エラー] {str(e)}")
+        return _error(f"サーバーエラー: {str(e)}", 500)
+
+
+@app.route('/api/ocr/jobs/<job_id>', methods=['GET'])
+def ocr_job_status(job_id):
+    """
+    OCRジョブ状態取得エンドポイント
+
+    レスポンス:
+        - status: queued / running / completed / failed / cancelled
+        - progress: ページ単位の進捗（current / total / percent / message）
+        - result: 完了時の結果（file_id などは /api/ocr/process と同じ）
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return _error("ジョブが見つかりません", 404)
+    return jsonify({"success": True, **job.to_dict()})
+
+
+@app.route('/api/ocr/jobs/<job_id>/events', methods=['GET'])
+def ocr_job_events(job_id):
+    """
+    OCRジョブのイベントストリーム（Server-Sent Events）
+
+    ジョブのイベントログを投入時から順に送り、ジョブが終了したら最後の status イベントを送って閉じる。
+    再接続時は Last-Event-ID ヘッダー（または last_event_id クエリ）の続きから送る。
+    同時接続数が上限（OCR_SSE_MAX_STREAMS / OCR_SSE_MAX_STREAMS_PER_JOB）に達している場合は 429 を返す
+    （GET /api/ocr/jobs/<job_id> のポーリングで状態を取得する）。
+    イベント:
+        - status: ジョブ状態（GET /api/ocr/jobs/<job_id> と同じ内容。終了時は result / error を含む）
+        - progress: ページ単位の進捗（current / total / message）
+        - page_rendered / page_ocr / page_overlay / page_failed / merged: process_pdf のページ単位のイベント
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return _error("ジョブが見つかりません", 404)
+    try:
+        cursor = max(0, int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0))
+    except ValueError:
+        cursor = 0
+    if not _open_sse_stream(job_id):
+        response, status = _error("イベントストリームの同時接続数が上限に達しています", 429)
+        response.headers['Retry-After'] = str(SSE_KEEPALIVE_SEC)
+        return response, status
+
+    def stream():
+        # OCRスレッドはイベントログに積むだけで、送信はこのレスポンスのスレッドが行う
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        while True:
+            events, finished = job.events_after(cursor, timeout=SSE_KEEPALIVE_SEC)
+            for item in events:
+                data = json.dumps(item["data"], ensure_ascii=False)
+                yield f"id: {item['id']}\nevent: {item['event']}\ndata: {data}\n\n"
+                cursor = item["id"]
+            if finished and not events:
+                return
+            if not events:
+                yield ": keepalive\n\n"
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # 送信完了・クライアント切断のどちらでもレスポンスが閉じられた時点で枠を返す
+    response.call_on_close(lambda: _close_sse_stream(job_id))
+    return response
+
+
+@app.route('/api/ocr/jobs/<job_id>', methods=['DELETE'])
+def ocr_job_cancel(job_id):
+    """
+    OCRジョブキャンセルエンドポイント
+
+    実行中のジョブはページ境界で中断される。
+    """
+    cancelled = job_manager.cancel(job_id)
+    if cancelled is None:
+        return _error("ジョブが見つかりません", 404)
+    if not cancelled:
+        return _error("ジョブは既に終了しています", 409)
+    job = job_manager.get(job_id)
+    return jsonify({"success": True, **job.to_dict()})
+
+
 @app.route('/api/ocr/download/<file_id>', methods=['GET'])
 def download_file(file_id):
     """
@@ -266,8 +694,26 @@ if __name__ == '__main__':
     print("サーバー起動中...")
     print("URL: http://localhost:5000")
     print("=" * 60)
-    # Windows環境で debug リローダーがプロセスを分岐させ、
-    # 起動スクリプト/ターミナルとの相性で終了してしまうことがあるため、
-    # 既定では reloader を無効化する。
-    debug_enabled = os.environ.get('FLASK_DEBUG', '0') == '1'
-    app.run(host='0.0.0.0', port=5000, debug=debug_enabled, use_reloader=False)
+    if SERVER_WORKERS:
+        # 本番モード: ワーカープロセスごとにエンジンを読み込み、空いているワーカーへ振り分ける
+        start_worker_pool()
+    elif env_flag('OCR_PRELOAD'):
+        # OCR_ENGINES のエンジンを起動時に読み込む（OCR_PRELOAD=0 で初回リクエスト時の遅延初期化）
+        start_engine_preload()
+
+    serve = None
+    if SERVER_WORKERS:
+        try:
+            from waitress import serve
+        except ImportError:
+            print("[API] waitress が見つからないため Flask 開発サーバーで起動します（本番運用では pip install waitress を推奨）")
+    if serve is not None:
+        print(f"[API] waitress で起動します（OCRワーカー {SERVER_WORKERS}プロセス）")
+        # イベントストリームが接続中スレッドを占有しても、他のAPI用に max(4, 2N) 本を残す
+        serve(app, host='0.0.0.0', port=5000, threads=max(4, SERVER_WORKERS * 2) + SSE_MAX_STREAMS)
+    else:
+        # Windows環境で debug リローダーがプロセスを分岐させ、
+        # 起動スクリプト/ターミナルとの相性で終了してしまうことがあるため、
+        # 既定では reloader を無効化する。
+        debug_enabled = os.environ.get('FLASK_DEBUG', '0') == '1'
+        app.run(host='0.0.0.0', port=5000, debug=debug_enabled, use_reloader=False, threaded=True)
@@ -0,0 +1,196 @@
+"""
+ページ単位のチェックポイント
+完了したページのOCR集計とオーバーレイ（透明テキスト）をその都度ディスクへ書き出し、
+処理が途中で止まっても（プロセスの異常終了・Pod の退去など）次回は未完了のページだけを処理する。
+
+チェックポイントは <directory>/<文書キー>/ に置く。文書キーは入力ファイルの内容と処理パラメータのハッシュ。
+  manifest.json              文書のページ数
+  page_000012.json           ページの集計結果（このファイルがあるページを完了とみなす）
+  page_000012.text / .pdf    ページのオーバーレイ
+
+処理中は <directory>/<文書キー>.lock を排他ロックし、同じ文書を同時に処理する別のジョブ・プロセスとは
+チェックポイントを共有しない（ロックはプロセスが異常終了してもOSが解放するため、再開を妨げない）。
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+
+from text_overlay import TextOverlay
+
+_MANIFEST = 'manifest.json'
+_LOCK_SUFFIX = '.lock'
+
+
+class CheckpointBusy(Exception):
+    """同じ文書のチェックポイントを別の処理が使用中。"""
+
+
+def _try_lock(path):
+    """ロックファイル path を排他ロックして開いたファイルを返す（別の処理がロック中なら None）。"""
+    f = open(path, 'a+b')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _unlock(f):
+    try:
+        if os.name == 'nt':
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+def _write_atomic(path, data):
+    """一時ファイルに書いてから置き換える（途中で止まっても書きかけのファイルを残さない）。"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune(directory, ttl_sec):
+    """最終更新から ttl_sec 秒を過ぎたチェックポイント（再開されなかった文書）を削除する。
+
+    処理中（ロックされている）の文書は、1ページの処理に時間がかかって更新が止まっていても削除しない。
+    """
+    now = time.time()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if now - os.stat(path).st_mtime <= ttl_sec:
+                continue
+            if name.endswith(_LOCK_SUFFIX):
+                # 文書の記録がなくなったロックファイル
+                if os.path.exists(path[:-len(_LOCK_SUFFIX)]):
+                    continue
+                lock = _try_lock(path)
+                if lock is not None:
+                    os.remove(path)
+                    _unlock(lock)
+            elif os.path.isdir(path):
+                lock = _try_lock(path + _LOCK_SUFFIX)
+                if lock is None:
+                    continue
+                try:
+                    shutil.rmtree(path, ignore_errors=True)
+                finally:
+                    _unlock(lock)
+        except OSError:
+            continue
+
+
+class PageCheckpoint:
+    """1文書分のチェックポイント
+
+    save() はページの結果 dict（process_pdf のページ結果。'overlay' に TextOverlay またはオーバーレイPDF）を保存し、
+    load() は保存済みの全ページを {page_num: 結果 dict} で返す。
+    """
+
+    def __init__(self, directory, key, page_count, resume=True):
+        """
+        Args:
+            directory: チェックポイントの保存先ディレクトリ
+            key: 文書キー（入力ファイルの内容 + 処理パラメータのハッシュ）
+            page_count: 文書のページ数（保存済みのものと食い違えば破棄する）
+            resume: False なら保存済みのチェックポイントを破棄して最初から記録する
+
+        Raises:
+            CheckpointBusy: 同じ文書を別の処理が記録中
+        """
+        self.directory = os.path.join(directory, key)
+        self.page_count = page_count
+        os.makedirs(directory, exist_ok=True)
+        self._lock = _try_lock(self.directory + _LOCK_SUFFIX)
+        if self._lock is None:
+            raise CheckpointBusy(f"文書 {key} のチェックポイントは別の処理が使用中です")
+        try:
+            self._open(resume)
+        except BaseException:
+            self.close()
+            raise
+
+    def _open(self, resume):
+        page_count = self.page_count
+        manifest_path = os.path.join(self.directory, _MANIFEST)
+        if resume and os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    resume = json.load(f).get('page_count') == page_count
+            except (OSError, ValueError):
+                resume = False
+        else:
+            resume = False
+        if not resume:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        if not resume:
+            _write_atomic(manifest_path, json.dumps({'page_count': page_count}).encode('utf-8'))
+
+    def _path(self, page_num, kind):
+        return os.path.join(self.directory, f"page_{page_num:06d}.{kind}")
+
+    def save(self, page_num, page_result):
+        """完了したページを記録する（オーバーレイ → 集計結果の順に書き、集計結果の置き換えで確定する）。"""
+        overlay = page_result.get('overlay')
+        kind = None
+        if overlay:
+            kind = 'text' if isinstance(overlay, TextOverlay) else 'pdf'
+            _write_atomic(self._path(page_num, kind), overlay.content if kind == 'text' else overlay)
+        record = {k: v for k, v in page_result.items() if k != 'overlay'}
+        record['overlay'] = kind
+        _write_atomic(self._path(page_num, 'json'), json.dumps(record, ensure_ascii=False).encode('utf-8'))
+
+    def load(self):
+        """保存済みのページを {page_num: 結果 dict} で返す（読めないページは未完了として扱う）。"""
+        pages = {}
+        for page_num in range(self.page_count):
+            try:
+                with open(self._path(page_num, 'json'), 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                kind = record.get('overlay')
+                overlay = None
+                if kind is not None:
+                    with open(self._path(page_num, kind), 'rb') as f:
+                        data = f.read()
+                    overlay = TextOverlay(data) if kind == 'text' else data
+            except (OSError, ValueError):
+                continue
+            record['overlay'] = overlay
+            pages[page_num] = record
+        return pages
+
+    def remove(self):
+        """文書の処理が完了したらチェックポイントを削除する。"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.close()
+
+    def close(self):
+        """ロックを解放する（記録は残し、次回の再開に使う）。"""
+        if self._lock is not None:
+            _unlock(self._lock)
+            self._lock = None
@@ -0,0 +1,24 @@
+"""
+環境変数による設定の読み取り
+app.py / jobs.py / main.py などで共通に使う。
+"""
+import os
+
+# フラグを無効とみなす値（大文字小文字は区別しない）
+_FALSE_VALUES = ('0', 'false', 'off', 'no')
+
+
+def env_int(name: str, default: int) -> int:
+    """環境変数を整数として読む（未設定・不正値は既定値）。"""
+    try:
+        return int((os.environ.get(name, '') or '').strip() or default)
+    except ValueError:
+        return default
+
+
+def env_flag(name: str, default: bool = True) -> bool:
+    """環境変数をオン/オフのフラグとして読む（0 / false / off / no ならオフ。未設定・空なら既定値）。"""
+    value = (os.environ.get(name, '') or '').strip().lower()
+    if not value:
+        return default
+    return value not in _FALSE_VALUES
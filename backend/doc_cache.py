@@ -0,0 +1,126 @@
+"""
+文書単位の処理結果キャッシュ
+アップロードファイルの内容と処理パラメータのハッシュをキーに、完成した検索可能PDFと
+APIレスポンス用の結果を保存し、同一ファイルの再アップロード時は process_pdf を省略する。
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+
+def make_key(upload_path, **params):
+    """アップロードファイルの内容 + 処理パラメータからキャッシュキーを作る。"""
+    h = hashlib.sha256()
+    with open(upload_path, 'rb') as f:
+        # メモリマップをそのまま渡し、読み込み用のコピーを作らずにハッシュする
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                h.update(mapping)
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _link_or_copy(src, dst):
+    """ハードリンクで複製する（別ボリューム等で失敗したらコピー）。"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class DocumentCache:
+    """TTL + 容量上限付きの検索可能PDFキャッシュ
+
+    キャッシュ本体は <key>.pdf / <key>.json としてディレクトリに置く。
+    取り出し時は出力ファイルとしてハードリンク（またはコピー）を作るため、
+    ダウンロード後に出力ファイルが削除されてもキャッシュ本体は残る。
+
+    TTL は登録時刻（登録後に書き換えない <key>.json の更新時刻）から数え、利用されても延長しない。
+    容量超過時の削除順は最終利用時刻（取り出しのたびに更新する <key>.pdf の更新時刻）で決める。
+    """
+
+    def __init__(self, directory, ttl_sec, max_bytes):
+        self.directory = directory
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.pdf', base + '.json'
+
+    def fetch(self, key, output_path):
+        """キャッシュがあれば output_path に出力PDFを作り、保存済みの結果 dict を返す（なければ None）。"""
+        pdf_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                if time.time() - os.path.getmtime(meta_path) > self.ttl_sec:
+                    self._remove(key)
+                    return None
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                _link_or_copy(pdf_path, output_path)
+                # 最終利用時刻を更新（容量超過時は古いものから削除する）
+                os.utime(pdf_path)
+            except (OSError, ValueError):
+                return None
+        return result
+
+    def store(self, key, output_path, result):
+        """完成した出力PDFと結果 dict をキャッシュへ登録する。"""
+        pdf_path, meta_path = self._paths(key)
+        tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+        with self._lock:
+            try:
+                _link_or_copy(output_path, pdf_path + tmp_suffix)
+                with open(meta_path + tmp_suffix, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(meta_path + tmp_suffix, meta_path)
+                os.replace(pdf_path + tmp_suffix, pdf_path)
+            finally:
+                for path in (pdf_path + tmp_suffix, meta_path + tmp_suffix):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._evict()
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """登録から TTL を過ぎたものを削除し、合計サイズが上限を超えていれば最終利用が古いものから削除する。"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pdf'):
+                continue
+            key = name[:-len('.pdf')]
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            try:
+                created = os.path.getmtime(os.path.join(self.directory, key + '.json'))
+            except FileNotFoundError:
+                # 結果 dict のない .pdf は取り出せないため削除する（登録時は .json を先に置く）
+                self._remove(key)
+                continue
+            if now - created > self.ttl_sec:
+                self._remove(key)
+            else:
+                entries.append((st.st_mtime, st.st_size, key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
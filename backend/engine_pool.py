@@ -0,0 +1,108 @@
+"""
+OCRエンジンプール
+同じエンジンのインスタンスを設定数まで保持し、貸し出し（checkout）と返却（release）で
+1インスタンスを同時に使うスレッド数を制限する。
+PaddleOCR のように再入できないエンジンも、インスタンス数だけ複数文書を並行して処理できる。
+"""
+import contextlib
+import threading
+import time
+
+
+class EnginePoolTimeout(Exception):
+    """待機時間内にエンジンを借りられなかった。"""
+
+
+class EnginePool:
+    """エンジンインスタンスの貸し出しプール
+
+    インスタンスは factory() で必要になった時点で作成する（最大 size 個）。
+    max_users は1インスタンスを同時に借りられるスレッド数（スレッドセーフなエンジンのみ 2 以上にする）。
+    インスタンスによって異なる場合は max_users(engine) を渡す（作成時に1回だけ評価する）。
+    借りる際は、未使用のインスタンス → 新規作成 → 利用者が最も少ないインスタンス の順に選ぶ。
+    """
+
+    def __init__(self, name, factory, size=1, max_users=1, timeout_sec=None):
+        self.name = name
+        self._factory = factory
+        self.size = max(1, int(size))
+        self.max_users = max_users if callable(max_users) else max(1, int(max_users))
+        self.timeout_sec = timeout_sec
+        self._cond = threading.Condition()
+        # インスタンス → 現在の利用者数（作成順）
+        self._users = {}
+        # インスタンス → 同時に借りられるスレッド数
+        self._limits = {}
+        self._instances = []
+        self._creating = 0
+
+    def _pick(self):
+        """借りられるインスタンスを返す。新規作成すべきなら None、空きがなければ False。"""
+        candidates = [e for e in self._instances if self._users[id(e)] < self._limits[id(e)]]
+        idle = [e for e in candidates if self._users[id(e)] == 0]
+        if idle:
+            return idle[0]
+        if len(self._instances) + self._creating < self.size:
+            return None
+        if candidates:
+            return min(candidates, key=lambda e: self._users[id(e)])
+        return False
+
+    def checkout(self, timeout=None):
+        """インスタンスを1つ借りる（空きがなければ timeout 秒まで待つ。None ならプールの既定値）。"""
+        timeout = self.timeout_sec if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                engine = self._pick()
+                if engine is None:
+                    self._creating += 1
+                    break
+                if engine is not False:
+                    self._users[id(engine)] += 1
+                    return engine
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise EnginePoolTimeout(
+                        f"{self.name}: {timeout}秒待ってもエンジンが空きませんでした（インスタンス数 {self.size}）"
+                    )
+                self._cond.wait(remaining)
+
+        # 初期化は時間がかかるため、ロックの外で行う
+        try:
+            engine = self._factory()
+            limit = self.max_users(engine) if callable(self.max_users) else self.max_users
+        except BaseException:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._creating -= 1
+            self._instances.append(engine)
+            self._users[id(engine)] = 1
+            self._limits[id(engine)] = max(1, int(limit))
+        return engine
+
+    def release(self, engine):
+        """借りたインスタンスを返す。"""
+        with self._cond:
+            self._users[id(engine)] -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """with 文の間だけインスタンスを借りる。"""
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": len(self._instances),
+                "in_use": sum(1 for e in self._instances if self._users[id(e)] > 0),
+            }
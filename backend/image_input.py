@@ -0,0 +1,427 @@
+"""
+画像入力
+JPEG / PNG / TIFF（マルチページ）と、それらをまとめた ZIP をページ列として扱う。
+
+- OCR にはデコードしたフレームをそのまま渡す（PDFに変換してから再レンダリングしない）。
+- 出力PDFのページには元画像の圧縮データをそのまま埋め込む（再圧縮しない）。
+  JPEG は DCTDecode、TIFF の CCITT G3/G4 は CCITTFaxDecode、PNG は IDAT を Flate + PNG予測子で埋め込む。
+  それ以外（LZW の TIFF、透過付き PNG など）は画素を可逆の Flate で埋め込む。
+- ページサイズは画像の解像度から決める（解像度情報がなければ 1px = 1pt）。
+- ZIP は画像メンバー数・展開後サイズに上限を設け、超えるものは展開せずに拒否する。
+"""
+import io
+import itertools
+import re
+import struct
+import zipfile
+import zlib
+
+from config import env_int
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'tif', 'tiff')
+ARCHIVE_EXTENSIONS = ('zip',)
+# 解像度情報がない画像の扱い（従来の画像→PDF変換と同じ 1px = 1pt）
+DEFAULT_DPI = 72.0
+# ZIP の展開上限（アップロードされた ZIP を展開しすぎてメモリを使い果たさないように）。
+# 画像メンバー数・1メンバーの展開後サイズ・展開後サイズの合計がこれを超える ZIP は読み込まない
+ZIP_MAX_MEMBERS = max(1, env_int('OCR_ZIP_MAX_MEMBERS', 1000))
+ZIP_MAX_MEMBER_BYTES = max(1, env_int('OCR_ZIP_MAX_MEMBER_MB', 256)) * 1024 * 1024
+ZIP_MAX_TOTAL_BYTES = max(1, env_int('OCR_ZIP_MAX_TOTAL_MB', 1024)) * 1024 * 1024
+
+# TIFF タグ
+_TIFF_BITS_PER_SAMPLE = 258
+_TIFF_COMPRESSION = 259
+_TIFF_PHOTOMETRIC = 262
+_TIFF_FILL_ORDER = 266
+_TIFF_STRIP_OFFSETS = 273
+_TIFF_ROWS_PER_STRIP = 278
+_TIFF_STRIP_BYTE_COUNTS = 279
+_TIFF_T4_OPTIONS = 292
+# TIFF の圧縮方式 → CCITT の種類（2: Modified Huffman, 3: T.4, 4: T.6）
+_TIFF_CCITT = (2, 3, 4)
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# FillOrder=2（下位ビットから詰めたデータ）を PDF の上位ビット優先に並べ替える表
+_BIT_REVERSE = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+
+
+def _extension(name):
+    return name.rsplit('.', 1)[1].lower() if '.' in name else ''
+
+
+def is_image_file(name):
+    return _extension(name) in IMAGE_EXTENSIONS
+
+
+def is_image_upload(name):
+    """画像入力として扱うファイル名か（画像そのもの、または画像をまとめた ZIP）。"""
+    return _extension(name) in IMAGE_EXTENSIONS + ARCHIVE_EXTENSIONS
+
+
+def _natural_key(name):
+    """page2 < page10 となるよう、数字部分を数値として比較するキー。"""
+    return [int(part) if i % 2 else part.lower() for i, part in enumerate(re.split(r'(\d+)', name))]
+
+
+def _zip_image_members(archive, path):
+    """ZIP 内の画像メンバー（ZipInfo）を自然順に返す。展開上限を超える ZIP は ValueError。
+
+    展開後サイズはヘッダの file_size で判定する（zipfile はヘッダのサイズを超えて展開しないため、
+    偽装したヘッダで上限をすり抜けることはできない）。
+    """
+    members = sorted(
+        (info for info in archive.infolist()
+         if not info.is_dir() and is_image_file(info.filename)
+         and not info.filename.startswith('__MACOSX/')),
+        key=lambda info: _natural_key(info.filename),
+    )
+    if not members:
+        raise ValueError(f"ZIPに画像ファイルがありません: {path}")
+    if len(members) > ZIP_MAX_MEMBERS:
+        raise ValueError(f"ZIP内の画像が多すぎます: {len(members)}件（上限 {ZIP_MAX_MEMBERS}件）")
+    for info in members:
+        _check_member_size(info)
+    total = sum(info.file_size for info in members)
+    if total > ZIP_MAX_TOTAL_BYTES:
+        raise ValueError(f"ZIPの展開後サイズが大きすぎます: {total}バイト（上限 {ZIP_MAX_TOTAL_BYTES}バイト）")
+    return members
+
+
+def _check_member_size(info):
+    if info.file_size > ZIP_MAX_MEMBER_BYTES:
+        raise ValueError(f"ZIP内のファイルが大きすぎます: {info.filename} {info.file_size}バイト"
+                         f"（上限 {ZIP_MAX_MEMBER_BYTES}バイト）")
+
+
+def _frame_dpi(im):
+    """画像の解像度 (横dpi, 縦dpi) を返す（情報がない・不正なら DEFAULT_DPI）。"""
+    try:
+        x_dpi, y_dpi = (float(v) for v in im.info['dpi'])
+    except (KeyError, TypeError, ValueError):
+        return DEFAULT_DPI, DEFAULT_DPI
+    if x_dpi <= 1 or y_dpi <= 1:
+        return DEFAULT_DPI, DEFAULT_DPI
+    return x_dpi, y_dpi
+
+
+class ImageFrame:
+    """1ページ分の画像フレーム（ファイル / ZIP内のメンバー / TIFF のフレーム番号）"""
+
+    def __init__(self, path, member, index, width, height, dpi):
+        self.path = path
+        self.member = member
+        self.index = index
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+
+    @property
+    def name(self):
+        name = self.member if self.member is not None else self.path
+        return f"{name}[{self.index}]" if self.index else name
+
+    @property
+    def page_size(self):
+        """ページサイズ (幅pt, 高さpt)"""
+        x_dpi, y_dpi = self.dpi
+        return self.width * 72.0 / x_dpi, self.height * 72.0 / y_dpi
+
+
+class ImageDocument:
+    """画像ファイル群をページ列として扱う
+
+    paths は画像ファイルまたは ZIP のパス（複数可、指定順にページを並べる）。
+    ZIP 内の画像はファイル名の自然順に並べる。マルチページ TIFF は全フレームをページにする。
+    pickle 可能（ページ並列処理・OCRワーカープロセスへそのまま渡せる）。
+    """
+
+    def __init__(self, paths):
+        from PIL import Image
+
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = list(paths)
+        self.frames = []
+        for path in self.paths:
+            if _extension(path) in ARCHIVE_EXTENSIONS:
+                try:
+                    with zipfile.ZipFile(path) as archive:
+                        for info in _zip_image_members(archive, path):
+                            self._scan(Image, path, info.filename, io.BytesIO(archive.read(info)))
+                except zipfile.BadZipFile as e:
+                    raise ValueError(f"ZIPを読み込めません: {path}: {e}")
+            else:
+                with open(path, 'rb') as fp:
+                    self._scan(Image, path, None, fp)
+        if not self.frames:
+            raise ValueError("画像がありません")
+
+    def _scan(self, Image, path, member, fp):
+        try:
+            with Image.open(fp) as im:
+                for index in range(getattr(im, 'n_frames', 1)):
+                    im.seek(index)
+                    self.frames.append(ImageFrame(path, member, index, im.width, im.height, _frame_dpi(im)))
+        except Exception as e:
+            raise ValueError(f"画像を読み込めません: {member or path}: {e}")
+
+    @property
+    def page_count(self):
+        return len(self.frames)
+
+    def page_size(self, page_number):
+        return self.frames[page_number].page_size
+
+    @staticmethod
+    def _open(path, member):
+        if member is None:
+            return open(path, 'rb')
+        with zipfile.ZipFile(path) as archive:
+            info = archive.getinfo(member)
+            _check_member_size(info)
+            return io.BytesIO(archive.read(info))
+
+    def load_frame(self, page_number):
+        """OCR用にフレームをデコードし、(PIL Image, dpi) を返す。
+
+        Image のモードは 'L'（白黒・グレースケール）または 'RGB'（透過は白で合成）。
+        縦横の解像度が異なる画像（ファクスの 204x98dpi など）は、低い方を拡大して正方ピクセルにする。
+        """
+        from PIL import Image
+
+        frame = self.frames[page_number]
+        with self._open(frame.path, frame.member) as fp, Image.open(fp) as im:
+            im.seek(frame.index)
+            img = _to_ocr_mode(Image, im)
+        x_dpi, y_dpi = frame.dpi
+        if x_dpi != y_dpi:
+            dpi = max(x_dpi, y_dpi)
+            size = (round(frame.width * dpi / x_dpi), round(frame.height * dpi / y_dpi))
+            img = img.resize(size, Image.BILINEAR)
+        return img, int(round(max(x_dpi, y_dpi)))
+
+    def write_pdf(self, output_path):
+        """各フレームを1ページとする画像だけのPDFを書き出す（元の圧縮データをそのまま埋め込む）。"""
+        from PIL import Image
+
+        embedded = 0
+        with open(output_path, 'wb') as out:
+            pdf = _PdfFile(out)
+            catalog = pdf.reserve()
+            pages = pdf.reserve()
+            kids = []
+            for (path, member), frames in itertools.groupby(self.frames, key=lambda f: (f.path, f.member)):
+                with self._open(path, member) as fp, Image.open(fp) as im:
+                    for frame in frames:
+                        im.seek(frame.index)
+                        strips = _raw_strips(im, fp)
+                        if strips is None:
+                            strips = [_flate_strip(Image, im)]
+                        else:
+                            embedded += 1
+                        kids.append(self._write_page(pdf, pages, frame, strips))
+            pdf.write_object(pages, f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in kids)}] "
+                                    f"/Count {len(kids)} >>")
+            pdf.write_object(catalog, f"<< /Type /Catalog /Pages {pages} 0 R >>")
+            pdf.close(catalog)
+        print(f"[画像入力] PDF作成: {len(kids)}ページ（元データ埋め込み {embedded} / 可逆再符号化 {len(kids) - embedded}）")
+        return output_path
+
+    def _write_page(self, pdf, pages, frame, strips):
+        """1フレーム分のページを書き出す。ストリップは上から順に縦に並べる。"""
+        page_w, page_h = frame.page_size
+        row_pt = page_h / frame.height
+        xobjects = []
+        content = []
+        top = 0
+        for i, (params, data, rows) in enumerate(strips):
+            image = pdf.reserve()
+            pdf.write_stream(image, f"/Type /XObject /Subtype /Image /Width {frame.width} /Height {rows} {params}", data)
+            xobjects.append(f"/Im{i} {image} 0 R")
+            bottom = page_h - (top + rows) * row_pt
+            content.append(f"q {page_w:.4f} 0 0 {rows * row_pt:.4f} 0 {bottom:.4f} cm /Im{i} Do Q")
+            top += rows
+        contents = pdf.reserve()
+        pdf.write_stream(contents, "", "\n".join(content).encode('ascii'))
+        page = pdf.reserve()
+        pdf.write_object(
+            page,
+            f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {page_w:.4f} {page_h:.4f}] "
+            f"/Resources << /XObject << {' '.join(xobjects)} >> >> /Contents {contents} 0 R >>",
+        )
+        return page
+
+
+def _to_ocr_mode(Image, im):
+    """フレームを 'L' または 'RGB' の Image にする。"""
+    if im.mode in ('1', 'L'):
+        return im.convert('L')
+    if im.mode.startswith('I;16'):
+        # 16ビットグレースケールは上位8ビットにする
+        return im.convert('I').point(lambda v: v * (1 / 256)).convert('L')
+    if im.mode in ('RGBA', 'LA', 'PA') or (im.mode == 'P' and 'transparency' in im.info):
+        rgba = im.convert('RGBA')
+        background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, rgba).convert('RGB')
+    return im.convert('RGB')
+
+
+def _raw_strips(im, fp):
+    """元の圧縮データを埋め込めるなら [(画像辞書の追加項目, データ, 行数)] を返す（できなければ None）。"""
+    if im.format == 'JPEG':
+        return _jpeg_strips(im, fp)
+    if im.format == 'PNG':
+        return _png_strips(im, fp)
+    if im.format == 'TIFF':
+        return _ccitt_strips(im, fp)
+    return None
+
+
+def _read_all(fp):
+    fp.seek(0)
+    return fp.read()
+
+
+def _jpeg_strips(im, fp):
+    if im.mode == 'L':
+        params = "/ColorSpace /DeviceGray"
+    elif im.mode == 'RGB':
+        params = "/ColorSpace /DeviceRGB"
+    elif im.mode == 'CMYK':
+        params = "/ColorSpace /DeviceCMYK"
+        if 'adobe' in im.info:
+            # Adobe の CMYK JPEG は値が反転して格納されている
+            params += " /Decode [1 0 1 0 1 0 1 0]"
+    else:
+        return None
+    return [(f"{params} /BitsPerComponent 8 /Filter /DCTDecode", _read_all(fp), im.height)]
+
+
+def _png_strips(im, fp):
+    """PNG の IDAT（zlib + 行ごとの予測フィルタ）は FlateDecode + Predictor 15 でそのまま読める。"""
+    data = _read_all(fp)
+    if not data.startswith(_PNG_SIGNATURE):
+        return None
+    pos = len(_PNG_SIGNATURE)
+    header = palette = None
+    idat = []
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif kind == b'PLTE':
+            palette = chunk
+        elif kind == b'IDAT':
+            idat.append(chunk)
+        elif kind == b'tRNS':
+            # 透過は白で合成して埋め込む
+            return None
+        elif kind == b'IEND':
+            break
+    if header is None or not idat:
+        return None
+    width, height, bits, color_type, _, _, interlace = header
+    if interlace:
+        return None
+    if color_type == 0:
+        colors, color_space = 1, "/DeviceGray"
+    elif color_type == 2:
+        colors, color_space = 3, "/DeviceRGB"
+    elif color_type == 3 and palette:
+        colors = 1
+        color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+    else:
+        # アルファ付き（color_type 4 / 6）
+        return None
+    params = (f"/ColorSpace {color_space} /BitsPerComponent {bits} /Filter /FlateDecode "
+              f"/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent {bits} /Columns {width} >>")
+    return [(params, b''.join(idat), height)]
+
+
+def _ccitt_strips(im, fp):
+    """CCITT 圧縮の TIFF はストリップごとに CCITTFaxDecode の画像として埋め込む。
+
+    G4 はストリップごとに独立して符号化されていて連結できないため、ストリップを縦に並べて1ページにする。
+    """
+    tags = im.tag_v2
+    compression = tags.get(_TIFF_COMPRESSION)
+    if compression not in _TIFF_CCITT or tags.get(_TIFF_BITS_PER_SAMPLE, 1) not in (1, (1,)):
+        return None
+    offsets = tags.get(_TIFF_STRIP_OFFSETS)
+    counts = tags.get(_TIFF_STRIP_BYTE_COUNTS)
+    if not offsets or not counts or len(offsets) != len(counts):
+        return None
+    rows_per_strip = min(tags.get(_TIFF_ROWS_PER_STRIP, im.height), im.height)
+    t4_options = tags.get(_TIFF_T4_OPTIONS, 0)
+
+    if compression == 4:
+        k, byte_align = -1, False
+    elif compression == 3:
+        k, byte_align = (1 if t4_options & 1 else 0), bool(t4_options & 4)
+    else:
+        # Modified Huffman: 行ごとにバイト境界へそろえた1次元符号化
+        k, byte_align = 0, True
+    # PhotometricInterpretation=1（BlackIsZero）の CCITT データは白黒が反転して見える
+    black_is_1 = 'true' if tags.get(_TIFF_PHOTOMETRIC, 0) == 1 else 'false'
+    reverse_bits = tags.get(_TIFF_FILL_ORDER, 1) == 2
+
+    strips = []
+    for i, (offset, count) in enumerate(zip(offsets, counts)):
+        rows = min(rows_per_strip, im.height - i * rows_per_strip)
+        if rows <= 0:
+            break
+        fp.seek(offset)
+        data = fp.read(count)
+        if reverse_bits:
+            data = data.translate(_BIT_REVERSE)
+        params = (f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /CCITTFaxDecode "
+                  f"/DecodeParms << /K {k} /Columns {im.width} /Rows {rows} /BlackIs1 {black_is_1} "
+                  f"/EncodedByteAlign {'true' if byte_align else 'false'} >>")
+        strips.append((params, data, rows))
+    return strips
+
+
+def _flate_strip(Image, im):
+    """元データを埋め込めない画像は、画素を可逆の Flate で符号化する。"""
+    if im.mode == '1':
+        # 1ビット（白=1）は DeviceGray の 1ビットと同じ並び
+        color_space, bits, img = "/DeviceGray", 1, im
+    else:
+        img = _to_ocr_mode(Image, im)
+        color_space, bits = ("/DeviceGray", 8) if img.mode == 'L' else ("/DeviceRGB", 8)
+    params = f"/ColorSpace {color_space} /BitsPerComponent {bits} /Filter /FlateDecode"
+    return params, zlib.compress(img.tobytes()), im.height
+
+
+class _PdfFile:
+    """オブジェクトを順に書き出すだけの最小限のPDFライター（画像データを保持しない）"""
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._offsets = {}
+        self._next = 1
+        fp.write(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+
+    def reserve(self):
+        number = self._next
+        self._next += 1
+        return number
+
+    def write_object(self, number, body):
+        self._offsets[number] = self._fp.tell()
+        self._fp.write(f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+
+    def write_stream(self, number, params, data):
+        self._offsets[number] = self._fp.tell()
+        self._fp.write(f"{number} 0 obj\n<< {params} /Length {len(data)} >>\nstream\n".encode('latin-1'))
+        self._fp.write(data)
+        self._fp.write(b"\nendstream\nendobj\n")
+
+    def close(self, root):
+        xref = self._fp.tell()
+        lines = [f"xref\n0 {self._next}\n0000000000 65535 f \n"]
+        lines.extend(f"{self._offsets[n]:010d} 00000 n \n" for n in range(1, self._next))
+        lines.append(f"trailer\n<< /Size {self._next} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._fp.write(''.join(lines).encode('ascii'))
@@ -0,0 +1,202 @@
+"""
+OCRジョブ管理
+API から投入されたOCR処理をバックグラウンドのワーカープールで実行し、
+ページ単位の進捗・結果・キャンセル要求を保持する。
+進捗とページ単位のイベントはジョブごとのイベントログに積み、SSE などの購読側が
+自分のスレッドで読み出す（OCRを実行するスレッドは購読側を待たない）。
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import env_int
+
+
+# 同時に実行するOCRジョブ数（これを超えたジョブはキューで待機する）
+JOB_WORKERS = max(1, env_int('OCR_JOB_WORKERS', 2))
+# 待機できるジョブ数の上限（超えた投入は拒否する）
+JOB_QUEUE_LIMIT = max(1, env_int('OCR_JOB_QUEUE_LIMIT', 32))
+# 終了したジョブ情報を保持する秒数
+JOB_TTL_SEC = max(60, env_int('OCR_JOB_TTL_SEC', 3600))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINISHED_STATUSES = {STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED}
+
+
+class JobQueueFull(Exception):
+    """待機中ジョブ数が上限に達している。"""
+
+
+class OcrJob:
+    """1件のOCRジョブの状態"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = STATUS_QUEUED
+        self.current = 0
+        self.total = 0
+        self.message = "待機中..."
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.cleanup = None
+        # イベントログ（id は1始まりの連番）。終了したジョブは購読が済んだ後も TTL まで保持する
+        self._events = []
+        self._events_cond = threading.Condition()
+
+    def emit(self, event, data):
+        """イベントをログに追加し、待機中の購読側を起こす。"""
+        with self._events_cond:
+            self._events.append({"id": len(self._events) + 1, "event": event, "data": data})
+            self._events_cond.notify_all()
+
+    def events_after(self, last_id, timeout=None):
+        """id が last_id より後のイベントを返す（なければ最大 timeout 秒待つ）。
+
+        戻り値は (イベントのリスト, ジョブが終了しているか)。終了後に追加されるイベントはない。
+        """
+        with self._events_cond:
+            if len(self._events) <= last_id and self.status not in FINISHED_STATUSES:
+                self._events_cond.wait(timeout)
+            return self._events[last_id:], self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        percent = (self.current / self.total * 100.0) if self.total else 0.0
+        if self.status == STATUS_COMPLETED:
+            percent = 100.0
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": {
+                "current": self.current,
+                "total": self.total,
+                "percent": round(percent, 1),
+                "message": self.message,
+            },
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """OCRジョブを上限付きワーカープールで実行する"""
+
+    def __init__(self, max_workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT, ttl_sec=JOB_TTL_SEC):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-job')
+        self._queue_limit = queue_limit
+        self._ttl_sec = ttl_sec
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, target, cleanup=None, **kwargs):
+        """ジョブを投入して OcrJob を返す。
+
+        target は target(progress_callback=..., cancel_event=..., event_callback=..., **kwargs) の形で呼ばれ、
+        process_pdf と同じ形式の結果 dict を返すこと。event_callback(event, data) はジョブのイベントログに積む。
+        cleanup はジョブ終了時（開始前キャンセルを含む）に1回だけ呼ばれる。
+        """
+        self._prune()
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == STATUS_QUEUED)
+            if queued >= self._queue_limit:
+                raise JobQueueFull(f"待機中のジョブが上限（{self._queue_limit}件）に達しています")
+            job = OcrJob(uuid.uuid4().hex)
+            job.cleanup = cleanup
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run, job, target, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """キャンセルを要求する。対象ジョブがなければ None、既に終了済みなら False を返す。"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in FINISHED_STATUSES:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # まだ開始前だったジョブはその場でキャンセル確定
+            self._finish(job, STATUS_CANCELLED, error="処理がキャンセルされました")
+        return True
+
+    def _run(self, job, target, kwargs):
+        if job.cancel_event.is_set():
+            self._finish(job, STATUS_CANCELLED, error="処理がキャンセルされました")
+            return
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        job.message = "処理開始..."
+        job.emit('status', job.to_dict())
+
+        def progress_callback(current, total, message):
+            job.current = current
+            job.total = total
+            job.message = message
+            job.emit('progress', {"current": current, "total": total, "message": message})
+
+        try:
+            result = target(
+                progress_callback=progress_callback,
+                cancel_event=job.cancel_event,
+                event_callback=job.emit,
+                **kwargs,
+            )
+        except Exception as e:
+            print(f"[JOB エラー] {job.job_id}: {e}")
+            self._finish(job, STATUS_FAILED, error=f"サーバーエラー: {str(e)}")
+            return
+
+        if result.get("success"):
+            self._finish(job, STATUS_COMPLETED, result=result)
+        elif result.get("cancelled"):
+            self._finish(job, STATUS_CANCELLED, error=result.get("error"))
+        else:
+            self._finish(job, STATUS_FAILED, error=result.get("error"))
+
+    def _finish(self, job, status, result=None, error=None):
+        cleanup, job.cleanup = job.cleanup, None
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"[JOB WARN] 後始末に失敗: {e}")
+        # 購読側が「終了済み」と最後の status イベントを同時に観測できるよう、ログのロック内で確定する
+        with job._events_cond:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            if status == STATUS_COMPLETED:
+                job.message = "完了"
+            elif status == STATUS_CANCELLED:
+                job.message = "キャンセルされました"
+            else:
+                job.message = "エラー"
+            job.emit('status', job.to_dict())
+
+    def _prune(self):
+        """保持期限を過ぎた終了済みジョブを破棄する。"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.status in FINISHED_STATUSES and job.finished_at and now - job.finished_at > self._ttl_sec
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -8,33 +8,61 @@
 """
 import os
 import io
-import ssl
-import urllib3
-import numpy as np
-import cv2
-import pypdfium2 as pdfium
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from PIL import Image
-
-# SSL証明書検証を無効化（企業プロキシ環境でのPaddleOCRモデルダウンロード対応）
-# 注意: 本番環境では適切な証明書設定を推奨
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    # Python 2.7.9以前では不要
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
-
-# urllib3のSSL警告を抑制
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# requests/urllib3のSSL検証を無効化
-os.environ['REQUESTS_CA_BUNDLE'] = ''
-os.environ['CURL_CA_BUNDLE'] = ''
+import atexit
+import contextlib
+import contextvars
+import copy
+import ctypes
+import importlib
+import math
+import mmap
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import checkpoint
+import doc_cache
+import metrics
+import ocr_cache
+from checkpoint import PageCheckpoint
+from config import env_flag, env_int
+from engine_pool import EnginePool, EnginePoolTimeout
+from image_input import ImageDocument, is_image_upload
+import rec_batcher
+from rec_batcher import RecognitionBatcher
+import text_overlay
+from text_overlay import TextOverlay, build_text_overlay
+
+
+class _LazyModule:
+    """初回の属性アクセス時に実際のモジュールをインポートする代理オブジェクト。
+
+    numpy / OpenCV / pypdfium2 はインポートだけで数百msかかるため、
+    `import main`（API サーバー起動やワーカープロセス生成）の時点では読み込まない。
+    読み込み後はモジュールのグローバル名を実モジュールに差し替えるので、以降のオーバーヘッドはない。
+    """
+
+    def __init__(self, module_name, global_name):
+        self._module_name = module_name
+        self._global_name = global_name
+
+    def load(self):
+        module = importlib.import_module(self._module_name)
+        globals()[self._global_name] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+np = _LazyModule('numpy', 'np')
+cv2 = _LazyModule('cv2', 'cv2')
+pdfium = _LazyModule('pypdfium2', 'pdfium')
+pdfium_c = _LazyModule('pypdfium2.raw', 'pdfium_c')
 
 # --- OCRフレームワーク セッティング ---
 # PaddleOCR/PaddlePaddle は初回実行時にモデル/キャッシュを配置する。
@@ -79,20 +107,41 @@ PADDLEOCR_HOME = (
 PADDLEX_HOME = os.environ.get('PADDLEX_HOME') or _default_cache_dir('paddlex')
 PADDLE_HOME = os.environ.get('PADDLE_HOME') or _default_cache_dir('paddle')
 
-os.environ.setdefault('PADDLEOCR_HOME', PADDLEOCR_HOME)
-os.environ.setdefault('PADDLE_OCR_HOME', PADDLEOCR_HOME)
-os.environ.setdefault('PADDLEX_HOME', PADDLEX_HOME)
-os.environ.setdefault('PADDLE_HOME', PADDLE_HOME)
 
-for _d in (PADDLEOCR_HOME, PADDLEX_HOME, PADDLE_HOME):
-    try:
-        os.makedirs(_d, exist_ok=True)
-    except Exception:
-        # ディレクトリ作成に失敗しても致命ではないため、後段での例外に任せる
-        pass
+def _prepare_paddle_environment():
+    """PaddleOCR インポート前に、キャッシュ配置先と SSL 検証の設定を行う。
+
+    プロセス全体の SSL/環境変数を書き換えるため、`import main` 時ではなく
+    PaddleOCR を実際に読み込む直前にだけ実行する。
+    """
+    import ssl
+    import urllib3
+
+    # SSL証明書検証を無効化（企業プロキシ環境でのPaddleOCRモデルダウンロード対応）
+    # 注意: 本番環境では適切な証明書設定を推奨
+    ssl._create_default_https_context = ssl._create_unverified_context
+
+    # urllib3のSSL警告を抑制
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    # requests/urllib3のSSL検証を無効化
+    os.environ['REQUESTS_CA_BUNDLE'] = ''
+    os.environ['CURL_CA_BUNDLE'] = ''
 
-# PaddleOCRのモデルホスト接続チェックを無効化（ネットワークタイムアウト回避）
-os.environ.setdefault('DISABLE_MODEL_SOURCE_CHECK', 'True')
+    os.environ.setdefault('PADDLEOCR_HOME', PADDLEOCR_HOME)
+    os.environ.setdefault('PADDLE_OCR_HOME', PADDLEOCR_HOME)
+    os.environ.setdefault('PADDLEX_HOME', PADDLEX_HOME)
+    os.environ.setdefault('PADDLE_HOME', PADDLE_HOME)
+
+    for d in (PADDLEOCR_HOME, PADDLEX_HOME, PADDLE_HOME):
+        try:
+            os.makedirs(d, exist_ok=True)
+        except Exception:
+            # ディレクトリ作成に失敗しても致命ではないため、後段での例外に任せる
+            pass
+
+    # PaddleOCRのモデルホスト接続チェックを無効化（ネットワークタイムアウト回避）
+    os.environ.setdefault('DISABLE_MODEL_SOURCE_CHECK', 'True')
 
 
 def _patch_paddleocr_paths(base_dir: str):
@@ -150,6 +199,10 @@ def ensure_paddleocr_available():
     if _PADDLE_IMPORT_ERROR is not None:
         return False
     try:
+        import ssl
+
+        _prepare_paddle_environment()
+
         # PaddleOCRのrequestsモジュールにSSL検証無効化パッチを適用
         import requests
         from requests.adapters import HTTPAdapter
@@ -204,12 +257,39 @@ def ensure_onnxocr_available():
         print(f"[WARNING] OnnxOCR not available: {e}")
         return False
 
-# 日本語フォント登録
-pdfmetrics.registerFont(UnicodeCIDFont("HeiseiKakuGo-W5"))
+# 透明テキスト用の日本語フォント（ReportLab への登録は初回のオーバーレイ作成時に行う）
+OVERLAY_FONT_NAME = "HeiseiKakuGo-W5"
+_overlay_font_lock = threading.Lock()
+_overlay_font_registered = False
 
-# OCRエンジンのキャッシュ（グローバルで1回だけ初期化）
-_paddle_engine = None
-_onnx_engine = None
+
+def _ensure_overlay_font():
+    """日本語CIDフォントを ReportLab に1回だけ登録する。"""
+    global _overlay_font_registered
+    if _overlay_font_registered:
+        return
+    with _overlay_font_lock:
+        if not _overlay_font_registered:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+            pdfmetrics.registerFont(UnicodeCIDFont(OVERLAY_FONT_NAME))
+            _overlay_font_registered = True
+
+
+def preload_dependencies():
+    """初回利用時まで遅らせている依存ライブラリとフォントを今読み込む（ワーカープロセス起動時用）。"""
+    for value in list(globals().values()):
+        if isinstance(value, _LazyModule):
+            value.load()
+    importlib.import_module('pypdf')
+    importlib.import_module('reportlab.pdfgen.canvas')
+    _ensure_overlay_font()
+
+# OCRエンジンのプール（エンジンごとに OCR_ENGINE_POOL_SIZE 個までインスタンスを保持）
+_engine_pools = {}
+# 起動時のプリロードと初回リクエストが同時にプールを作らないようにする
+_engine_init_lock = threading.RLock()
 
 
 def _normalize_engine_name(engine_name: str | None) -> str:
@@ -219,93 +299,331 @@ def _normalize_engine_name(engine_name: str | None) -> str:
     return eng
 
 
-def get_paddleocr_engine():
-    """PaddleOCR エンジンのシングルトンを取得する。"""
-    global _paddle_engine
+def _create_paddleocr_engine():
+    """PaddleOCR エンジンのインスタンスを1つ作成する。"""
+    print("[OCR] PaddleOCRエンジンを初期化中...")
+    try:
+        # PaddleOCR 2.x 系（今回の想定）での安定設定。
+        # 2.7系では多くのパラメータが非対応のため、最小限のみ指定
+        engine = PaddleOCREngine(
+            lang='japan',
+            use_angle_cls=False,
+        )
+    except (TypeError, ValueError) as e:
+        # 互換: パラメータが異なる場合は言語のみ指定
+        print(f"[OCR] PaddleOCR初期化エラー（最小設定で再試行）: {e}")
+        engine = PaddleOCREngine(lang='japan')
+    print("[OCR] PaddleOCRエンジン初期化完了")
+    return engine
 
-    if not ensure_paddleocr_available():
-        msg = "PaddleOCR is not available. Install with: pip install -r requirements.txt"
-        if _PADDLE_IMPORT_ERROR is not None:
-            msg = f"{msg} (import error: {_PADDLE_IMPORT_ERROR})"
-        raise ValueError(msg)
 
-    if _paddle_engine is None:
-        print("[OCR] PaddleOCRエンジンを初期化中...")
-        try:
-            # PaddleOCR 2.x 系（今回の想定）での安定設定。
-            # 2.7系では多くのパラメータが非対応のため、最小限のみ指定
-            _paddle_engine = PaddleOCREngine(
-                lang='japan',
-                use_angle_cls=False,
-            )
-        except (TypeError, ValueError) as e:
-            # 互換: パラメータが異なる場合は言語のみ指定
-            print(f"[OCR] PaddleOCR初期化エラー（最小設定で再試行）: {e}")
-            _paddle_engine = PaddleOCREngine(lang='japan')
-        print("[OCR] PaddleOCRエンジン初期化完了")
-    return _paddle_engine
-
-
-def get_onnxocr_engine():
-    """OnnxOCR(ONNXPaddleOcr) エンジンのシングルトンを取得する。"""
-    global _onnx_engine
-
-    if not ensure_onnxocr_available():
-        msg = "OnnxOCR is not available. Install with: pip install -r requirements.txt"
-        if _ONNX_IMPORT_ERROR is not None:
-            msg = f"{msg} (import error: {_ONNX_IMPORT_ERROR})"
-        raise ValueError(msg)
-
-    if _onnx_engine is None:
-        print("[OCR] OnnxOCR(ONNXPaddleOcr)エンジンを初期化中...")
-        # OnnxOCR は CPU 推論が基本。GPU は環境依存なので既定で無効。
-        _onnx_engine = ONNXPaddleOcrEngine(use_gpu=False, lang='japan')
-        print("[OCR] OnnxOCR(ONNXPaddleOcr)エンジン初期化完了")
-    return _onnx_engine
-
-
-def get_ocr_engine(engine_name: str | None = None):
-    """指定したOCRエンジンのインスタンスを返す（互換API）。"""
+def _create_onnxocr_engine():
+    """OnnxOCR(ONNXPaddleOcr) エンジンのインスタンスを1つ作成する。"""
+    print("[OCR] OnnxOCR(ONNXPaddleOcr)エンジンを初期化中...")
+    # OnnxOCR は CPU 推論が基本。GPU は環境依存なので既定で無効。
+    engine = ONNXPaddleOcrEngine(use_gpu=False, lang='japan')
+    print("[OCR] OnnxOCR(ONNXPaddleOcr)エンジン初期化完了")
+    return engine
+
+
+def get_engine_pool(engine_name: str | None = None):
+    """指定したOCRエンジンの EnginePool を返す（初回のみ作成。インスタンスは借りた時点で初期化）。"""
     eng = _normalize_engine_name(engine_name)
     if eng == 'paddleocr':
-        return get_paddleocr_engine()
-    if eng == 'onnxocr':
-        return get_onnxocr_engine()
-    # _normalize_engine_name で弾かれるが保険
-    raise ValueError(f"Unsupported OCR engine: {eng}")
+        if not ensure_paddleocr_available():
+            msg = "PaddleOCR is not available. Install with: pip install -r requirements.txt"
+            if _PADDLE_IMPORT_ERROR is not None:
+                msg = f"{msg} (import error: {_PADDLE_IMPORT_ERROR})"
+            raise ValueError(msg)
+        factory = _create_paddleocr_engine
+    else:
+        if not ensure_onnxocr_available():
+            msg = "OnnxOCR is not available. Install with: pip install -r requirements.txt"
+            if _ONNX_IMPORT_ERROR is not None:
+                msg = f"{msg} (import error: {_ONNX_IMPORT_ERROR})"
+            raise ValueError(msg)
+        factory = _create_onnxocr_engine
+
+    with _engine_init_lock:
+        pool = _engine_pools.get(eng)
+        if pool is None:
+            # ONNX Runtime のセッションはスレッドセーフなため、1インスタンスを複数ページで共有できる
+            pool = EnginePool(
+                eng,
+                factory,
+                size=ENGINE_POOL_SIZE,
+                max_users=_instance_concurrency if eng == 'onnxocr' else 1,
+                timeout_sec=ENGINE_POOL_TIMEOUT_SEC,
+            )
+            _engine_pools[eng] = pool
+        return pool
 
 
-def _to_bgr_candidates(pil_img):
-    """PaddleOCR に渡す画像候補(BGR ndarray)を複数生成する。
+def get_paddleocr_engine(timeout=None):
+    """PaddleOCR エンジンをプールから借りる（get_ocr_engine('paddleocr') と同じ）。"""
+    return get_ocr_engine('paddleocr', timeout)
 
-    検出できないケースに備え、
-    - 原画像(BGR)
-    - グレースケール+二値化
-    を試す。
+
+def get_onnxocr_engine(timeout=None):
+    """OnnxOCR(ONNXPaddleOcr) エンジンをプールから借りる（get_ocr_engine('onnxocr') と同じ）。"""
+    return get_ocr_engine('onnxocr', timeout)
+
+
+# 認識器ごとの RecognitionBatcher（エンジンインスタンスの id をキーにする）
+_rec_batchers = {}
+_rec_batcher_lock = threading.Lock()
+
+
+def _unwrap_elapse(result):
+    """PaddleOCR 系の推論器が返す (結果, 所要時間) から結果だけを取り出す。"""
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], float):
+        return result[0]
+    return result
+
+
+def _get_rec_batcher(engine):
+    """OnnxOCR インスタンスの認識器をラップした RecognitionBatcher を返す。"""
+    with _rec_batcher_lock:
+        batcher = _rec_batchers.get(id(engine))
+        if batcher is None:
+            recognizer = engine.text_recognizer
+            # 認識器内部のバッチ分割（既定6枚）をバッチサイズに合わせる
+            if getattr(recognizer, 'rec_batch_num', 0) < REC_BATCH_SIZE:
+                recognizer.rec_batch_num = REC_BATCH_SIZE
+            batcher = RecognitionBatcher(
+                lambda crops: _unwrap_elapse(recognizer(crops)),
+                batch_size=REC_BATCH_SIZE,
+                max_wait_sec=REC_BATCH_WAIT_MS / 1000.0,
+                max_arrival_wait_sec=REC_BATCH_ARRIVAL_WAIT_MS / 1000.0,
+            )
+            _rec_batchers[id(engine)] = batcher
+        return batcher
+
+
+_onnx_pipeline_available = None
+
+
+def _onnx_batching_available():
+    """認識のバッチ化が使えるか（設定で有効、かつ OnnxOCR のパイプライン部品を読み込める）。"""
+    global _onnx_pipeline_available
+    if REC_BATCH_SIZE <= 0:
+        return False
+    if _onnx_pipeline_available is None:
+        try:
+            from onnxocr.predict_system import sorted_boxes  # noqa: F401
+            from onnxocr.utils import get_minarea_rect_crop, get_rotate_crop_image  # noqa: F401
+            _onnx_pipeline_available = True
+        except Exception as e:
+            print(f"[WARN] OnnxOCR の認識バッチ化を無効化: {e}")
+            _onnx_pipeline_available = False
+    return _onnx_pipeline_available
+
+
+def _onnx_batching_enabled(engine):
+    return _onnx_batching_available() and hasattr(engine, 'text_detector') and hasattr(engine, 'text_recognizer')
+
+
+def _onnx_ocr_batched(engine, img):
+    """OnnxOCR の ocr() と同じ結果を返す。検出はこのスレッドで、認識はバッチ化して行う。
+
+    ONNXPaddleOcr.ocr → TextSystem.__call__ と同じ手順（検出 → 並べ替え → 切り出し → 方向分類 → 認識 →
+    drop_score 未満の除外）で、認識だけを RecognitionBatcher に回す。
     """
-    rgb = np.array(pil_img.convert('RGB'))
-    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    from onnxocr.predict_system import sorted_boxes
+    from onnxocr.utils import get_minarea_rect_crop, get_rotate_crop_image
 
-    candidates = [bgr]
+    dt_boxes = _unwrap_elapse(engine.text_detector(img))
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return [[]]
+    dt_boxes = sorted_boxes(dt_boxes)
+
+    quad = getattr(getattr(engine, 'args', None), 'det_box_type', 'quad') == 'quad'
+    crop = get_rotate_crop_image if quad else get_minarea_rect_crop
+    crops = [crop(img, copy.deepcopy(box)) for box in dt_boxes]
+    if getattr(engine, 'use_angle_cls', False):
+        crops = engine.text_classifier(crops)[0]
+
+    rec_res = _get_rec_batcher(engine).recognize(crops)
+
+    # OnnxOCR 本体と同じく drop_score 未満の行は捨てる
+    drop_score = getattr(engine, 'drop_score', 0.5)
+    return [[
+        [box.tolist(), rec_result]
+        for box, rec_result in zip(dt_boxes, rec_res)
+        if rec_result[1] >= drop_score
+    ]]
+
+
+def get_ocr_engine(engine_name: str | None = None, timeout=None):
+    """指定したOCRエンジンをプールから借りるコンテキストマネージャを返す。
+
+    インスタンスは with 文の間だけ借りられ、プールの同時利用数の制限を受ける（PaddleOCR は1スレッドずつ）::
+
+        with get_ocr_engine('onnxocr') as ocr:
+            result = ocr.ocr(img)
+
+    Raises:
+        engine_pool.EnginePoolTimeout: timeout 秒（None ならプールの既定値）待ってもエンジンが空かない
+    """
+    return get_engine_pool(engine_name).lease(timeout)
+
+
+def _warmup_image():
+    """ウォームアップ推論用の小さな画像（白地に黒文字）を作る。"""
+    img = np.full((64, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "OCR 2024", (12, 46), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (0, 0, 0), 3, cv2.LINE_AA)
+    return img
+
+
+def warmup_engines(engine_names):
+    """OCRエンジンを読み込み・初期化し、小さな画像で1回推論しておく（サーバー起動時のプリロード用）。
+
+    Returns:
+        {engine: {'ready', 'import_sec', 'init_sec', 'warmup_sec', 'error'}}
+    """
+    report = {}
+    for name in engine_names:
+        eng = _normalize_engine_name(name)
+        status = {'ready': False, 'import_sec': None, 'init_sec': None, 'warmup_sec': None, 'error': None}
+        report[eng] = status
+        try:
+            started = time.perf_counter()
+            available = ensure_paddleocr_available() if eng == 'paddleocr' else ensure_onnxocr_available()
+            status['import_sec'] = round(time.perf_counter() - started, 3)
+            if not available:
+                raise ValueError(str(_PADDLE_IMPORT_ERROR if eng == 'paddleocr' else _ONNX_IMPORT_ERROR))
+
+            # プールの全インスタンスを借りて初期化し、それぞれで初回推論を済ませる
+            # （初回推論で発生するグラフ最適化・メモリ確保などの遅延を先に済ませる）
+            pool = get_engine_pool(eng)
+            with contextlib.ExitStack() as stack:
+                started = time.perf_counter()
+                instances = [stack.enter_context(pool.lease()) for _ in range(pool.size)]
+                status['init_sec'] = round(time.perf_counter() - started, 3)
+
+                started = time.perf_counter()
+                for ocr in instances:
+                    _run_ocr_with(_warmup_image(), eng, ocr)
+                status['warmup_sec'] = round(time.perf_counter() - started, 3)
+            status['ready'] = True
+            print(f"[OCR] {eng} ウォームアップ完了 (import {status['import_sec']}秒, "
+                  f"初期化 {status['init_sec']}秒, 推論 {status['warmup_sec']}秒)")
+        except Exception as e:
+            status['error'] = str(e)
+            print(f"[OCR] {eng} ウォームアップ失敗: {e}")
+    return report
+
+
+def _to_bgr(img):
+    """PIL Image を BGR ndarray に変換する（ndarray はBGR/グレースケールとみなしてそのまま返す）。"""
+    if isinstance(img, np.ndarray):
+        return img
+    rgb = np.array(img.convert('RGB'))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+# エンジンが入力として要求するチャンネル数（1 ならグレースケールをそのまま渡せる）
+_ENGINE_INPUT_CHANNELS = {
+    'paddleocr': 3,
+    'onnxocr': 3,
+}
 
-    try:
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        # 高解像度で過度に遅くならないよう軽量な前処理に留める
-        gray = cv2.GaussianBlur(gray, (3, 3), 0)
-        thr = cv2.adaptiveThreshold(
-            gray,
-            255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY,
-            31,
-            10,
-        )
-        thr_bgr = cv2.cvtColor(thr, cv2.COLOR_GRAY2BGR)
-        candidates.append(thr_bgr)
-    except Exception as e:
-        print(f"[WARN] PaddleOCR前処理スキップ: {e}")
 
-    return candidates
+def _to_engine_input(img, engine):
+    """エンジン呼び出し直前に、必要な場合だけグレースケールを3チャンネルへ展開する。"""
+    if img.ndim == 2 and _ENGINE_INPUT_CHANNELS.get(engine, 3) == 3:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+
+def _to_gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def _preprocess_adaptive_threshold(img):
+    """グレースケール + 適応的二値化（薄い文字・背景ムラ向け）。"""
+    # 高解像度で過度に遅くならないよう軽量な前処理に留める
+    gray = cv2.GaussianBlur(_to_gray(img), (3, 3), 0)
+    return cv2.adaptiveThreshold(
+        gray,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        31,
+        10,
+    )
+
+
+def _preprocess_contrast(img):
+    """CLAHE による局所コントラスト強調（低コントラストのスキャン向け）。"""
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe.apply(_to_gray(img))
+
+
+def _preprocess_denoise(img):
+    """メディアンフィルタによるごま塩ノイズ除去（FAX・粗いスキャン向け）。"""
+    return cv2.medianBlur(img, 3)
+
+
+# 前処理バリアント: 名前 → 関数(ndarray) -> ndarray
+# 入出力は BGR（3チャンネル）またはグレースケール（2次元）。チャンネル数はエンジン直前で合わせる。
+# 'original' は前処理なし（入力バッファをそのまま使う）
+_PREPROCESS_VARIANTS = {
+    'original': None,
+    'adaptive_threshold': _preprocess_adaptive_threshold,
+    'contrast': _preprocess_contrast,
+    'denoise': _preprocess_denoise,
+}
+
+
+def register_preprocess_variant(name, func):
+    """前処理バリアントを登録する（OCR_PREPROCESS_CHAIN で名前を指定して使う）。
+
+    func は BGR またはグレースケールの ndarray を受け取り、どちらかの ndarray を返すこと。
+    チェーン内で前の候補が失敗したときにだけ呼ばれる。
+    """
+    _PREPROCESS_VARIANTS[name] = func
+
+
+# 試行する前処理の順序（前の候補でテキストが取れなかったときだけ次を生成する）
+PREPROCESS_CHAIN = [
+    name.strip()
+    for name in (os.environ.get('OCR_PREPROCESS_CHAIN', '') or 'original,adaptive_threshold').split(',')
+    if name.strip()
+]
+
+
+def _to_bgr_candidates(pil_img, chain=None):
+    """PaddleOCR に渡す画像候補(BGR またはグレースケールの ndarray)を順に生成するジェネレータ。
+
+    検出できないケースに備え、PREPROCESS_CHAIN の順に前処理バリアントを試す。
+    既定は
+    - 原画像(BGR)
+    - グレースケール+二値化
+    各候補は要求された時点で初めて生成されるため、最初の候補で検出できれば
+    以降の前処理のコストとメモリは発生しない。
+
+    pil_img には BGR / グレースケールの ndarray も渡せる（複数エンジンで同じバッファを共有する場合）。
+    グレースケールはチャンネル数を増やさずに前処理する。
+    """
+    bgr = _to_bgr(pil_img)
+
+    for name in (chain or PREPROCESS_CHAIN):
+        if name not in _PREPROCESS_VARIANTS:
+            print(f"[WARN] 未登録の前処理をスキップ: {name}")
+            continue
+        func = _PREPROCESS_VARIANTS[name]
+        if func is None:
+            yield bgr
+            continue
+        try:
+            with metrics.span('preprocess', variant=name):
+                candidate = func(bgr)
+        except Exception as e:
+            print(f"[WARN] 前処理スキップ ({name}): {e}")
+            continue
+        yield candidate
+        candidate = None
 
 
 def _paddle_ocr_call(ocr, bgr):
@@ -333,68 +651,435 @@ def _paddle_ocr_call(ocr, bgr):
     raise RuntimeError("Unsupported PaddleOCR API: missing ocr()/predict()")
 
 
+# PDFium はスレッドセーフではないため、プロセス内の PDFium 呼び出しはこのロックで直列化する
+_PDFIUM_LOCK = threading.RLock()
+
+
+def _map_file(path, access=mmap.ACCESS_READ):
+    """ファイルをメモリマップする（OSのページキャッシュを直接参照し、プロセス内にコピーを作らない）。"""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=access)
+
+
+def _close_mapping(mapping):
+    try:
+        mapping.close()
+    except BufferError:
+        # まだ参照が残っている場合は GC に任せる
+        pass
+
+
+class PdfSession:
+    """1つのPDFを1回だけ開き、ページ数・ページサイズ・レンダリング・合成用リーダーを提供する。
+
+    ページごとに PdfDocument を開き直したり、ページサイズ取得のためだけに
+    pypdf で全体を再パースしたりしないためのもの。
+    ページサイズは PDFium のページサイズ（レンダリング結果と同じ基準）を使う。
+    元PDFはメモリマップし、PDFium と合成用の pypdf は同じマッピングを直接読む
+    （ファイル全体をメモリへ読み込んだコピーを作らない）。
+    images に ImageDocument を渡すと、OCR用の画像はPDFをレンダリングせず元画像のフレームから取り出す。
+    """
+
+    def __init__(self, pdf_path, images=None):
+        self.pdf_path = pdf_path
+        self.images = images
+        self._mapping = None
+        self._buffer = None
+        source = pdf_path
+        try:
+            # PDFium にはマッピングのアドレスをそのまま渡す。PdfDocument は閉じた後も循環参照で
+            # 入力を保持し続けるため、バッファを export せずアドレスだけを渡し、close() で確実に解放できるようにする
+            self._mapping = _map_file(pdf_path)
+            address = np.frombuffer(self._mapping, dtype=np.uint8).ctypes.data
+            self._buffer = source = (ctypes.c_char * len(self._mapping)).from_address(address)
+        except (OSError, ValueError):
+            # 空ファイルなどマップできない場合はパスで開く（エラーは PDFium に任せる）
+            self._release_mapping()
+        with _PDFIUM_LOCK:
+            self._pdf = pdfium.PdfDocument(source)
+            self.page_count = len(self._pdf)
+        self._reader = None
+
+    def __len__(self):
+        return self.page_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def page_size(self, page_number):
+        """ページサイズ (幅pt, 高さpt) を返す。"""
+        with _PDFIUM_LOCK:
+            width, height = self._pdf.get_page_size(page_number)
+        return float(width), float(height)
+
+    def text_layer_info(self, page_number):
+        """既存テキストレイヤーの情報 (有効文字数, 画像オブジェクトの有無) を返す。
+
+        空白と置換文字（U+FFFD: ToUnicode欠落など）は有効文字に数えない。
+        """
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_number]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range(force_this=True)
+                finally:
+                    textpage.close()
+                image = next(page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]), None)
+            finally:
+                page.close()
+        chars = sum(1 for ch in text if not ch.isspace() and ch != '\ufffd')
+        return chars, image is not None
+
+    def render(self, page_number, dpi=300):
+        """ページを PIL Image にレンダリングして (image, 幅px, 高さpx) を返す。"""
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_number]
+            try:
+                pil_img = page.render(scale=dpi / 72).to_pil()
+            finally:
+                page.close()
+        width, height = pil_img.size
+        return pil_img, width, height
+
+    def render_array(self, page_number, dpi=300, grayscale=False):
+        """ページを ndarray にレンダリングして (image, 幅px, 高さpx) を返す。
+
+        PDFium のビットマップバッファをそのまま参照するビューを返すため、
+        PIL への変換や RGB→BGR 変換によるコピーは発生しない。
+        grayscale=True なら 1チャンネル（2次元）、それ以外は BGR（3チャンネル）。
+        """
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_number]
+            try:
+                # 既定の出力形式は BGR（3チャンネル）。バッファは Python 側が所有する
+                img = page.render(scale=dpi / 72, grayscale=grayscale).to_numpy()
+            finally:
+                page.close()
+        if grayscale:
+            img = img[:, :, 0]
+        height, width = img.shape[:2]
+        return img, width, height
+
+    def render_size(self, page_number, dpi=300):
+        """render_array で得られる画像のサイズ (幅px, 高さpx) を、レンダリングせずに返す。"""
+        scale = dpi / 72
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_number]
+            try:
+                return math.ceil(page.get_width() * scale), math.ceil(page.get_height() * scale)
+            finally:
+                page.close()
+
+    def render_region(self, page_number, dpi, x0, y0, width, height, grayscale=False):
+        """ページの一部（render_array の画像座標で左上 (x0, y0)、幅・高さpx）だけを ndarray にレンダリングする。
+
+        PDFium の crop で指定範囲だけを描画するため、ページ全体のビットマップは作らない。
+        範囲がページからはみ出す分は切り詰める。
+        """
+        scale = dpi / 72
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_number]
+            try:
+                full_width = math.ceil(page.get_width() * scale)
+                full_height = math.ceil(page.get_height() * scale)
+                # crop は各辺から切り落とす量（pt）。PDFium 側で ceil(pt * scale) px に丸められるため、
+                # 半ピクセル手前の値を渡して指定した px 数ちょうどになるようにする
+                crop = tuple(
+                    (px - 0.5) / scale if px > 0 else 0
+                    for px in (x0, full_height - y0 - height, full_width - x0 - width, y0)
+                )
+                img = page.render(scale=scale, crop=crop, grayscale=grayscale).to_numpy()
+            finally:
+                page.close()
+        if grayscale:
+            img = img[:, :, 0]
+        return img
+
+    def is_color(self, page_number):
+        """低解像度プローブで、ページに有意な色成分があるかを判定する。"""
+        probe, width, height = self.render_array(page_number, COLOR_PROBE_DPI)
+        chroma = probe.max(axis=2).astype(np.int16) - probe.min(axis=2)
+        colored = int(np.count_nonzero(chroma > _COLOR_CHROMA_MIN))
+        return colored > width * height * _COLOR_PIXEL_RATIO
+
+    def render_gray(self, page_number, dpi):
+        """ページをグレースケールでレンダリングし、2次元の uint8 ndarray を返す（解析用）。"""
+        gray, _, _ = self.render_array(page_number, dpi, grayscale=True)
+        # 行パディングを含むビューの場合があるため、連続配列にしてから返す
+        return np.ascontiguousarray(gray)
+
+    def reader(self):
+        """合成用の pypdf PdfReader を返す（初回のみパース）。"""
+        if self._reader is None:
+            from pypdf import PdfReader
+
+            if self._mapping is not None:
+                self._reader = PdfReader(self._mapping)
+            else:
+                # Windowsでのファイルロック回避のため、BytesIOで読み込む
+                with open(self.pdf_path, 'rb') as f:
+                    self._reader = PdfReader(io.BytesIO(f.read()))
+        return self._reader
+
+    def _release_mapping(self):
+        self._buffer = None
+        mapping, self._mapping = self._mapping, None
+        if mapping is not None:
+            _close_mapping(mapping)
+
+    def close(self):
+        self._reader = None
+        pdf, self._pdf = self._pdf, None
+        if pdf is not None:
+            try:
+                with _PDFIUM_LOCK:
+                    pdf.close()
+            except Exception:
+                pass
+        # PdfDocument が入力バッファを参照しているため、先に手放してからマッピングを解放する
+        # （Windows ではマップ中のファイルを削除できない）
+        pdf = None
+        self._release_mapping()
+
+
 def render_pdf_to_image(pdf_path, page_number, dpi=300):
     """
     PDFページを画像（PIL Image）として取り出す
     
     Args:
-        pdf_path: PDFファイルのパス
+        pdf_path: PDFファイルのパス、または開いている PdfSession
         page_number: ページ番号（0始まり）
         dpi: 解像度（デフォルト300dpi）
         
     Returns:
         PIL Image, width, height
     """
-    pdf = None
-    page = None
     try:
-        pdf = pdfium.PdfDocument(pdf_path)
-        page = pdf[page_number]
-        scale = dpi / 72
-        pil_img = page.render(scale=scale).to_pil()
-        width, height = pil_img.size
-        return pil_img, width, height
+        if isinstance(pdf_path, PdfSession):
+            return pdf_path.render(page_number, dpi)
+        with PdfSession(pdf_path) as session:
+            return session.render(page_number, dpi)
+    except Exception as e:
+        raise Exception(f"PDFレンダリング失敗: {str(e)}")
+
+
+def render_pdf_to_array(pdf_path, page_number, dpi=300, grayscale=False):
+    """
+    PDFページを ndarray として取り出す（OCR用。PIL を経由しない）
+
+    Args:
+        pdf_path: PDFファイルのパス、または開いている PdfSession
+        page_number: ページ番号（0始まり）
+        dpi: 解像度（デフォルト300dpi）
+        grayscale: True ならグレースケール（2次元）で取り出す
+
+    Returns:
+        ndarray（BGR またはグレースケール）, width, height
+    """
+    try:
+        if isinstance(pdf_path, PdfSession):
+            return pdf_path.render_array(page_number, dpi, grayscale)
+        with PdfSession(pdf_path) as session:
+            return session.render_array(page_number, dpi, grayscale)
     except Exception as e:
         raise Exception(f"PDFレンダリング失敗: {str(e)}")
-    finally:
-        try:
-            if pdf is not None and hasattr(pdf, 'close'):
-                pdf.close()
-        except Exception:
-            pass
 
 
 def run_ocr(pil_img, ocr_engine: str | None = None):
     """指定エンジンで OCR を実行する。
 
-    テキスト検出できないケースに備えて、複数の前処理候補で再試行し、
-    最も多くテキストが取れた結果を採用する。
+    テキスト検出できないケースに備えて、前処理候補を順に試し、
+    最初にテキストが取れた候補の結果を採用する（後続の候補は生成しない）。
+
+    pil_img は PIL Image、BGR ndarray またはグレースケール ndarray。
     """
     eng = _normalize_engine_name(ocr_engine)
-    ocr = get_ocr_engine(eng)
+    # エンジンはプールから借り、このページの処理が終わったら返す
+    pool = get_engine_pool(eng)
+    try:
+        ocr = pool.checkout(timeout=0)
+    except EnginePoolTimeout:
+        # 空きを待つ間は認識バッチの待ち対象から外す（参加できないページを待ってバッチが止まらないように）
+        if eng == 'onnxocr':
+            rec_batcher.release_current()
+        ocr = pool.checkout()
+    try:
+        return _run_ocr_with(pil_img, eng, ocr)
+    finally:
+        pool.release(ocr)
+
+
+def _run_ocr_with(pil_img, eng, ocr):
+    """借りたエンジンインスタンス ocr で run_ocr の処理を行う。"""
+    # OnnxOCR は認識を複数ページ分まとめて実行する（このページの処理中は参加者として登録）
+    batched = eng == 'onnxocr' and _onnx_batching_enabled(ocr)
+    with _get_rec_batcher(ocr).participant() if batched else contextlib.nullcontext():
+        if isinstance(pil_img, (np.ndarray, TiledPage)) and _needs_tiling(pil_img):
+            return _run_ocr_tiled(pil_img, eng, ocr, batched)
+        return _run_ocr_candidates(pil_img, eng, ocr, batched)
+
+
+def _result_lines(results):
+    """OCR結果（実装差異あり）から1ページ分の行リストを取り出す。"""
+    if isinstance(results, list) and results:
+        # 典型: [ [line, line, ...] ]（検出0件は [None] や [[]]）
+        if len(results) == 1 and (results[0] is None or isinstance(results[0], list)):
+            return results[0] or []
+        # まれ: [line, line, ...]
+        if isinstance(results[0], (list, dict)):
+            return results
+    return []
+
+
+def _needs_tiling(img):
+    return TILE_SIZE > 0 and max(img.shape[:2]) > TILE_MAX_SIDE
+
+
+def _tile_starts(length, tile, overlap):
+    """長さ length を tile 幅・overlap 重なりで覆うタイル開始位置を返す（最後のタイルは端に揃える）。"""
+    if length <= tile:
+        return [0]
+    step = max(1, tile - overlap)
+    return list(range(0, length - tile, step)) + [length - tile]
+
+
+class TiledPage:
+    """タイル分割OCRの対象となる大判PDFページ。
+
+    ページ全体のビットマップは作らず、タイルを取り出すたびにその範囲だけを PDFium で描画する。
+    shape / ndim は描画した場合の画像（render_array の結果）と同じ。
+    """
+
+    def __init__(self, session, page_number, dpi, grayscale=False):
+        self._session = session
+        self.page_number = page_number
+        self.dpi = dpi
+        self.grayscale = grayscale
+        width, height = session.render_size(page_number, dpi)
+        self.shape = (height, width) if grayscale else (height, width, 3)
+        self.ndim = len(self.shape)
+
+    def render_tile(self, x0, y0, size):
+        return self._session.render_region(self.page_number, self.dpi, x0, y0, size, size, self.grayscale)
+
+    def digest(self):
+        """OCR結果キャッシュ用の内容ハッシュ（タイルを1枚ずつ描画してハッシュする）。"""
+        return ocr_cache.tiles_digest(self.shape, (tile for _, _, tile in _iter_tiles(self)))
+
+
+def _iter_tiles(img):
+    """(x0, y0, タイル画像) を読み順に返す。
+
+    ndarray は元画像のビュー（コピーなし）、TiledPage はその場で描画したタイルを返す。
+    """
+    height, width = img.shape[:2]
+    for y0 in _tile_starts(height, TILE_SIZE, TILE_OVERLAP):
+        for x0 in _tile_starts(width, TILE_SIZE, TILE_OVERLAP):
+            if isinstance(img, TiledPage):
+                yield x0, y0, img.render_tile(x0, y0, TILE_SIZE)
+            else:
+                yield x0, y0, img[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE]
+
+
+def _offset_line(line, dx, dy):
+    """タイル座標の行をページ座標へ平行移動する。"""
+    if isinstance(line, dict):
+        line = dict(line)
+        key = 'bbox' if 'bbox' in line else 'box'
+        line[key] = [[float(x) + dx, float(y) + dy] for x, y in line[key]]
+        return line
+    quad = [[float(x) + dx, float(y) + dy] for x, y in line[0]]
+    return [quad, line[1]]
+
+
+def _line_rect(line):
+    quad = (line.get('bbox') or line.get('box')) if isinstance(line, dict) else line[0]
+    xs = [p[0] for p in quad]
+    ys = [p[1] for p in quad]
+    return min(xs), min(ys), max(xs), max(ys)
+
 
+def _dedupe_tile_lines(lines, containment=0.7):
+    """タイルの重なりで二重に検出された行を除く。
+
+    大きい矩形から採用し、既に採用した矩形に面積の containment 以上が含まれる行
+    （境界で切れた断片や同じ行の再検出）は捨てる。
+    """
+    rects = [_line_rect(line) for line in lines]
+    order = sorted(range(len(lines)), key=lambda i: -(rects[i][2] - rects[i][0]) * (rects[i][3] - rects[i][1]))
+    kept = []
+    for i in order:
+        x1, y1, x2, y2 = rects[i]
+        area = max(1e-6, (x2 - x1) * (y2 - y1))
+        duplicate = False
+        for j in kept:
+            kx1, ky1, kx2, ky2 = rects[j]
+            iw = min(x2, kx2) - max(x1, kx1)
+            ih = min(y2, ky2) - max(y1, ky1)
+            if iw > 0 and ih > 0 and iw * ih / area >= containment:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(i)
+    # 読み順（上→下、左→右）に並べ直す
+    kept.sort(key=lambda i: (rects[i][1], rects[i][0]))
+    return [lines[i] for i in kept]
+
+
+def _run_ocr_tiled(img, eng, ocr, batched=False):
+    """大きなページを重なりのあるタイルに分けて OCR し、ページ座標で結果を統合する。
+
+    img は ndarray または TiledPage。前処理候補はタイル単位で生成する。
+    TiledPage（PDFページ）はタイルを1枚ずつ描画するため、作業用メモリはページサイズによらず
+    タイルサイズで頭打ちになる。ndarray（画像入力のフレーム）はページ全体をデコード済みの画像のビューを使う。
+    """
+    height, width = img.shape[:2]
+    ys = _tile_starts(height, TILE_SIZE, TILE_OVERLAP)
+    xs = _tile_starts(width, TILE_SIZE, TILE_OVERLAP)
+    print(f"  → タイル分割OCR: {width}x{height}px を {len(xs)}x{len(ys)} タイル（{TILE_SIZE}px）で処理")
+
+    lines = []
+    succeeded = 0
+    last_error = None
+    for x0, y0, tile in _iter_tiles(img):
+        try:
+            results = _run_ocr_candidates(tile, eng, ocr, batched)
+        except Exception as e:
+            last_error = e
+            continue
+        finally:
+            tile = None
+        succeeded += 1
+        lines.extend(_offset_line(line, x0, y0) for line in _result_lines(results))
+
+    if not succeeded:
+        raise Exception(f"OCR処理失敗 ({eng}): {last_error}")
+    return [_dedupe_tile_lines(lines)]
+
+
+def _run_ocr_candidates(pil_img, eng, ocr, batched=False):
     best = None
     best_count = -1
     last_error = None
 
-    for idx, bgr in enumerate(_to_bgr_candidates(pil_img)):
+    for candidate in _to_bgr_candidates(pil_img):
         try:
+            bgr = _to_engine_input(candidate, eng)
             if eng == 'paddleocr':
                 results = _paddle_ocr_call(ocr, bgr)
+            elif batched:
+                results = _onnx_ocr_batched(ocr, bgr)
             else:
                 # OnnxOCR は PaddleOCR と同様に ocr(bgr) を提供する想定
                 results = ocr.ocr(bgr)
 
             # PaddleOCR の戻り値は実装差異があるため、複数パターンを吸収してカウントする
-            count = 0
             try:
-                if isinstance(results, list) and results:
-                    # 典型: [ [line, line, ...] ]
-                    if len(results) == 1 and isinstance(results[0], list):
-                        count = len(results[0])
-                    # まれ: [line, line, ...]
-                    elif isinstance(results[0], (list, dict)):
-                        count = len(results)
+                count = len(_result_lines(results))
             except Exception:
                 count = 0
 
@@ -402,8 +1087,8 @@ def run_ocr(pil_img, ocr_engine: str | None = None):
                 best = results
                 best_count = count
 
-            # 最初の候補で検出できたなら早期終了（高速化）
-            if best_count >= 1 and idx == 0:
+            # 検出できたなら早期終了（以降の前処理候補は生成しない）
+            if best_count >= 1:
                 break
         except Exception as e:
             last_error = e
@@ -499,6 +1184,9 @@ def create_overlay_pdf(page_w_pt, page_h_pt, ocr_items, scale_x=1.0, scale_y=1.0
         PDFのバイトデータ
     """
     try:
+        from reportlab.pdfgen import canvas
+
+        _ensure_overlay_font()
         buf = io.BytesIO()
         c = canvas.Canvas(buf, pagesize=(page_w_pt, page_h_pt))
         c.setFillAlpha(0.0)  # 完全透明
@@ -515,7 +1203,7 @@ def create_overlay_pdf(page_w_pt, page_h_pt, ocr_items, scale_x=1.0, scale_y=1.0
             
             # フォントサイズを矩形の高さに合わせる
             fontsize = max(6, (y2_pt - y1_pt) * 0.9)
-            c.setFont("HeiseiKakuGo-W5", fontsize)
+            c.setFont(OVERLAY_FONT_NAME, fontsize)
             
             # PDF座標は左下原点なので上下を反転
             baseline_y = page_h_pt - y2_pt
@@ -527,24 +1215,356 @@ def create_overlay_pdf(page_w_pt, page_h_pt, ocr_items, scale_x=1.0, scale_y=1.0
         raise Exception(f"オーバーレイPDF作成失敗: {str(e)}")
 
 
-def merge_overlay(original_pdf_path, overlay_bytes_list, output_pdf_path):
+class OverlaySpool:
+    """ページごとのオーバーレイ（TextOverlay またはオーバーレイPDF）を一時ディレクトリへ書き出して保持する。
+
+    ページ番号で読み書きできるリスト互換のコンテナ。メモリには何ページ分も溜めない。
+    """
+
+    def __init__(self, page_count, base_dir=None):
+        self.directory = tempfile.mkdtemp(prefix='ocr-overlay-', dir=base_dir)
+        # ページごとの保存形式: None（なし）/ 'text'（TextOverlay）/ 'pdf'（オーバーレイPDF）
+        self._stored = [None] * page_count
+
+    def _path(self, page_num, kind):
+        return os.path.join(self.directory, f"page_{page_num:06d}.{kind}")
+
+    def __len__(self):
+        return len(self._stored)
+
+    def __setitem__(self, page_num, overlay):
+        if not overlay:
+            self._stored[page_num] = None
+            return
+        kind = 'text' if isinstance(overlay, TextOverlay) else 'pdf'
+        with open(self._path(page_num, kind), 'wb') as f:
+            f.write(overlay.content if kind == 'text' else overlay)
+        self._stored[page_num] = kind
+
+    def __getitem__(self, page_num):
+        kind = self._stored[page_num]
+        if kind is None:
+            return None
+        with open(self._path(page_num, kind), 'rb') as f:
+            data = f.read()
+        return TextOverlay(data) if kind == 'text' else data
+
+    def __iter__(self):
+        for page_num in range(len(self._stored)):
+            yield self[page_num]
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class _IncrementalMergeUnsupported(Exception):
+    """追記方式で合成できないPDF（暗号化など）。"""
+
+
+def _find_startxref(f):
+    """ファイル末尾の startxref が指す相互参照表の位置を返す（妥当性も確認する）。"""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - 2048))
+    tail = f.read()
+    pos = tail.rfind(b'startxref')
+    if pos < 0:
+        raise _IncrementalMergeUnsupported("startxref が見つかりません")
+    try:
+        offset = int(tail[pos + 9:].split()[0])
+    except (IndexError, ValueError):
+        raise _IncrementalMergeUnsupported("startxref が不正です")
+    # 相互参照表（xref）または相互参照ストリーム（n g obj）を指しているか確認
+    f.seek(offset)
+    head = f.read(32).lstrip()
+    if not (head.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', head)):
+        raise _IncrementalMergeUnsupported("startxref が相互参照表を指していません")
+    return offset
+
+
+class _IncrementalWriter:
+    """元PDFの末尾に追記更新（incremental update）セクションを書き出す。"""
+
+    def __init__(self, out, next_id):
+        self._out = out
+        self._next_id = next_id
+        self._offsets = {}
+
+    def reserve(self):
+        from pypdf.generic import IndirectObject
+
+        ref = IndirectObject(self._next_id, 0, None)
+        self._next_id += 1
+        return ref
+
+    def write(self, ref, obj):
+        self._offsets[ref.idnum] = (self._out.tell(), ref.generation)
+        self._out.write(f"{ref.idnum} {ref.generation} obj\n".encode('ascii'))
+        obj.write_to_stream(self._out)
+        self._out.write(b"\nendobj\n")
+
+    def add(self, obj):
+        ref = self.reserve()
+        self.write(ref, obj)
+        return ref
+
+    def finish(self, trailer, prev_xref):
+        xref_offset = self._out.tell()
+        self._out.write(b"xref\n")
+        ids = sorted(self._offsets)
+        start = 0
+        while start < len(ids):
+            end = start
+            while end + 1 < len(ids) and ids[end + 1] == ids[end] + 1:
+                end += 1
+            self._out.write(f"{ids[start]} {end - start + 1}\n".encode('ascii'))
+            for idnum in ids[start:end + 1]:
+                offset, generation = self._offsets[idnum]
+                self._out.write(f"{offset:010d} {generation:05d} n\r\n".encode('ascii'))
+            start = end + 1
+
+        from pypdf.generic import DictionaryObject, NameObject, NumberObject
+
+        new_trailer = DictionaryObject()
+        new_trailer[NameObject('/Size')] = NumberObject(max(self._next_id, int(trailer['/Size'])))
+        for key in ('/Root', '/Info', '/ID'):
+            if key in trailer:
+                new_trailer[NameObject(key)] = trailer.raw_get(key)
+        new_trailer[NameObject('/Prev')] = NumberObject(prev_xref)
+        self._out.write(b"trailer\n")
+        new_trailer.write_to_stream(self._out)
+        self._out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+
+
+def _import_foreign(obj, writer, memo):
+    """別PDF（オーバーレイ）のオブジェクトを番号を振り直して書き出し、参照を返す。"""
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        EncodedStreamObject,
+        IndirectObject,
+        NameObject,
+        StreamObject,
+    )
+
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            memo[key] = writer.reserve()
+            writer.write(memo[key], _import_foreign(obj.get_object(), writer, memo))
+        return memo[key]
+    if isinstance(obj, StreamObject):
+        copied = EncodedStreamObject()
+        copied._data = obj._data
+        for key, value in obj.items():
+            if key != '/Length':
+                copied[NameObject(key)] = _import_foreign(value, writer, memo)
+        return copied
+    if isinstance(obj, DictionaryObject):
+        copied = DictionaryObject()
+        for key, value in obj.items():
+            copied[NameObject(key)] = _import_foreign(value, writer, memo)
+        return copied
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_import_foreign(value, writer, memo) for value in obj)
+    return obj
+
+
+def _content_stream(data):
+    from pypdf.generic import DecodedStreamObject
+
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def _add_object(writer, obj):
+    """PdfWriter に間接オブジェクトを追加して参照を返す。
+
+    pypdf には公開APIがないため内部メソッドを使う（requirements.txt でバージョンを固定し、
+    test_backend.test_text_layer で合成結果を確認している）。
+    """
+    return writer._add_object(obj)
+
+
+def _apply_text_overlay(page, overlay, font_ref, save_state_ref, add_object):
+    """ページ辞書の Resources / Contents を差し替え、透明テキストを元の描画の後ろに追加する。
+
+    font_ref は文書で共有するフォント、save_state_ref は "q" だけのストリームへの参照。
+    add_object(obj) はオブジェクトを出力先に追加して参照を返す関数。
+    """
+    from pypdf.generic import ArrayObject, DictionaryObject, NameObject
+
+    # ページのリソースを複製してフォントを追加（共有リソースは書き換えない）
+    resources = DictionaryObject()
+    if '/Resources' in page:
+        resources.update(page['/Resources'].get_object())
+    fonts = DictionaryObject()
+    if '/Font' in resources:
+        fonts.update(resources['/Font'].get_object())
+    name = text_overlay.FONT_RESOURCE_NAME
+    suffix = 0
+    while name in fonts:
+        suffix += 1
+        name = f'{text_overlay.FONT_RESOURCE_NAME}{suffix}'
+    fonts[NameObject(name)] = font_ref
+    resources[NameObject('/Font')] = fonts
+
+    # 元の描画を q/Q で囲み、グラフィックス状態をリセットしてから透明テキストを描く
+    contents = ArrayObject([save_state_ref])
+    if '/Contents' in page:
+        original = page.raw_get('/Contents')
+        resolved = original.get_object()
+        if isinstance(resolved, ArrayObject):
+            contents.extend(resolved)
+        else:
+            contents.append(original)
+    contents.append(add_object(_content_stream(b"Q\n" + overlay.render(name)).flate_encode()))
+
+    page[NameObject('/Resources')] = resources
+    page[NameObject('/Contents')] = contents
+
+
+def _merge_overlay_incremental(original_pdf_path, overlay_bytes_list, output_pdf_path):
+    """元PDFをそのままコピーし、オーバーレイ付きページだけを追記更新で差し替える。
+
+    TextOverlay はページの Contents 末尾に追加し、フォントは文書全体で1つ共有する。
+    旧形式のオーバーレイPDF（bytes）は Form XObject として追加し、Contents 末尾で描画する。
+    元PDFを丸ごとメモリに読み込まず、ページも1枚ずつしか保持しないため、
+    ページ数が増えてもメモリ使用量はほぼ一定。
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject
+
+    src = _map_file(original_pdf_path)
+    try:
+        reader = PdfReader(src)
+        if reader.is_encrypted:
+            raise _IncrementalMergeUnsupported("暗号化PDF")
+        prev_xref = _find_startxref(src)
+        trailer = reader.trailer
+
+        with open(output_pdf_path, 'wb') as out:
+            # 元PDFはマッピングからそのまま書き出す
+            with metrics.span('write'):
+                out.write(src)
+                out.write(b"\n")
+            writer = _IncrementalWriter(out, int(trailer['/Size']))
+            save_state = writer.add(_content_stream(b"q\n"))
+            font_ref = None
+
+            for page_num, overlay_bytes in enumerate(overlay_bytes_list):
+                if not overlay_bytes:
+                    continue
+                page = reader.pages[page_num]
+                if isinstance(overlay_bytes, TextOverlay):
+                    if font_ref is None:
+                        font_ref = writer.add(text_overlay.font_dict())
+                    new_page = DictionaryObject()
+                    new_page.update(page)
+                    _apply_text_overlay(new_page, overlay_bytes, font_ref, save_state, writer.add)
+                    writer.write(page.indirect_reference, new_page)
+                    continue
+
+                overlay_page = PdfReader(io.BytesIO(overlay_bytes)).pages[0]
+
+                # オーバーレイを Form XObject 化（リソース名の衝突を避けるため）
+                form = _content_stream(overlay_page.get_contents().get_data())
+                form[NameObject('/Type')] = NameObject('/XObject')
+                form[NameObject('/Subtype')] = NameObject('/Form')
+                form[NameObject('/BBox')] = ArrayObject(
+                    FloatObject(v) for v in overlay_page.mediabox
+                )
+                if '/Resources' in overlay_page:
+                    form[NameObject('/Resources')] = _import_foreign(
+                        overlay_page.raw_get('/Resources'), writer, {}
+                    )
+                form_ref = writer.add(form.flate_encode())
+
+                # ページのリソースを複製して XObject を追加（共有リソースは書き換えない）
+                resources = DictionaryObject()
+                if '/Resources' in page:
+                    resources.update(page['/Resources'].get_object())
+                xobjects = DictionaryObject()
+                if '/XObject' in resources:
+                    xobjects.update(resources['/XObject'].get_object())
+                name = '/OcrText'
+                suffix = 0
+                while name in xobjects:
+                    suffix += 1
+                    name = f'/OcrText{suffix}'
+                xobjects[NameObject(name)] = form_ref
+                resources[NameObject('/XObject')] = xobjects
+
+                # 元の描画を q/Q で囲み、グラフィックス状態をリセットしてからオーバーレイを描く
+                contents = ArrayObject([save_state])
+                if '/Contents' in page:
+                    original = page.raw_get('/Contents')
+                    resolved = original.get_object()
+                    if isinstance(resolved, ArrayObject):
+                        contents.extend(resolved)
+                    else:
+                        contents.append(original)
+                contents.append(writer.add(_content_stream(f"Q\nq {name} Do Q\n".encode('ascii'))))
+
+                new_page = DictionaryObject()
+                new_page.update(page)
+                new_page[NameObject('/Resources')] = resources
+                new_page[NameObject('/Contents')] = contents
+                writer.write(page.indirect_reference, new_page)
+
+            writer.finish(trailer, prev_xref)
+    finally:
+        reader = None
+        _close_mapping(src)
+
+
+def merge_overlay(original_pdf_path, overlay_bytes_list, output_pdf_path, session=None, streaming=False):
     """
     PyPDFで元PDFとオーバーレイPDFを合体する
     
     Args:
         original_pdf_path: 元のPDFファイルパス
-        overlay_bytes_list: 各ページのオーバーレイPDFバイトデータのリスト
+        overlay_bytes_list: 各ページのオーバーレイ（TextOverlay または旧形式のオーバーレイPDFバイトデータ）のリスト
+            （OverlaySpool も可）
         output_pdf_path: 出力PDFファイルパス
+        session: 開いている PdfSession（指定時は元PDFを再パースせずに使う）
+        streaming: True なら元PDFに追記更新する方式で合成し、メモリ使用量をページ数に依存させない
     """
+    from pypdf import PdfReader, PdfWriter
+
+    mapping = None
     try:
-        # Windowsでのファイルロック回避のため、BytesIOで読み込む
-        with open(original_pdf_path, 'rb') as f:
-            reader = PdfReader(io.BytesIO(f.read()))
+        if streaming:
+            try:
+                _merge_overlay_incremental(original_pdf_path, overlay_bytes_list, output_pdf_path)
+                print(f"[完了] 検索可能PDF生成完了（追記方式）: {output_pdf_path}")
+                return
+            except _IncrementalMergeUnsupported as e:
+                print(f"[WARN] 追記方式で合成できないため通常方式で合成します: {e}")
+
+        if session is not None:
+            reader = session.reader()
+        else:
+            # 元PDFはメモリマップして読む（合成後に解放するので Windows のファイルロックも残らない）
+            mapping = _map_file(original_pdf_path)
+            reader = PdfReader(mapping)
         writer = PdfWriter()
+        font_ref = None
+        save_state = None
         
         for page_num, overlay_bytes in enumerate(overlay_bytes_list):
             page = reader.pages[page_num]
-            
+
+            if isinstance(overlay_bytes, TextOverlay) and overlay_bytes:
+                # 透明テキストはコンテンツストリームとして直接追加する（ページごとのPDF再パースなし）
+                if font_ref is None:
+                    font_ref = _add_object(writer, text_overlay.font_dict())
+                    save_state = _add_object(writer, _content_stream(b"q\n"))
+                _apply_text_overlay(writer.add_page(page), overlay_bytes, font_ref, save_state,
+                                    lambda obj: _add_object(writer, obj))
+                continue
+
             if overlay_bytes:
                 overlay_reader = PdfReader(io.BytesIO(overlay_bytes))
                 overlay_page = overlay_reader.pages[0]
@@ -552,12 +1572,721 @@ def merge_overlay(original_pdf_path, overlay_bytes_list, output_pdf_path):
             
             writer.add_page(page)
         
-        with open(output_pdf_path, "wb") as f:
+        with metrics.span('write'), open(output_pdf_path, "wb") as f:
             writer.write(f)
             
         print(f"[完了] 検索可能PDF生成完了: {output_pdf_path}")
     except Exception as e:
         raise Exception(f"PDF合成失敗: {str(e)}")
+    finally:
+        if mapping is not None:
+            _close_mapping(mapping)
+
+
+class ProcessingCancelled(Exception):
+    """process_pdf の処理がキャンセル要求により中断されたことを表す。"""
+
+
+# エンジンごとに保持するインスタンス数（同一プロセスで並行処理できる文書数の上限）
+ENGINE_POOL_SIZE = max(1, env_int('OCR_ENGINE_POOL_SIZE', 1))
+# エンジンが空くのを待つ上限（秒）
+ENGINE_POOL_TIMEOUT_SEC = max(1, env_int('OCR_ENGINE_POOL_TIMEOUT_SEC', 600))
+
+# ページ並列処理のワーカープロセス数（1 = 従来どおり逐次処理）
+DEFAULT_PAGE_WORKERS = env_int('OCR_PAGE_WORKERS', 1)
+# このページ数以上のPDFはオーバーレイを一時ディレクトリへ退避し、追記方式で合成する（0 = 無効）
+STREAM_OUTPUT_MIN_PAGES = max(0, env_int('OCR_STREAM_OUTPUT_PAGES', 200))
+# ページ単位のチェックポイントの保存先（process_pdf の checkpoint_dir 未指定時。未設定なら記録しない）
+DEFAULT_CHECKPOINT_DIR = (os.environ.get('OCR_CHECKPOINT_DIR', '') or '').strip() or None
+# 再開されないまま残ったチェックポイントを削除するまでの時間（秒）
+CHECKPOINT_TTL_SEC = max(60, env_int('OCR_CHECKPOINT_TTL_SEC', 24 * 3600))
+# 既存テキストレイヤーの扱い
+# - force: 全ページをOCRする（従来動作）
+# - skip: 有効なテキストレイヤーを持つページはOCRせずそのまま出力する
+# - image_only: テキストレイヤーがなく画像を含むページだけOCRする（白紙・ベクターのみのページも対象外）
+TEXT_LAYER_MODES = ('force', 'skip', 'image_only')
+DEFAULT_TEXT_LAYER_MODE = (os.environ.get('OCR_TEXT_LAYER_MODE', '') or '').strip().lower() or 'force'
+# この文字数以上のテキストがあれば「有効なテキストレイヤーあり」とみなす
+TEXT_LAYER_MIN_CHARS = max(1, env_int('OCR_TEXT_LAYER_MIN_CHARS', 20))
+# 逐次処理時に OCR と並行して先読みレンダリングするページ数（0 = 先読みなし）
+# 高DPIでは1ページ数十MBになるため、メモリ上限に合わせて調整する
+DEFAULT_PREFETCH_PAGES = max(0, env_int('OCR_PREFETCH_PAGES', 2))
+# 適応DPI（dpi='auto'）: 低解像度のプローブ画像から文字高さを推定し、
+# 文字高さが TARGET_TEXT_PX 前後になる最小のDPIでページをレンダリングする
+ADAPTIVE_DPI = 'auto'
+ADAPTIVE_PROBE_DPI = max(36, env_int('OCR_ADAPTIVE_PROBE_DPI', 100))
+ADAPTIVE_MIN_DPI = max(36, env_int('OCR_ADAPTIVE_MIN_DPI', 100))
+ADAPTIVE_MAX_DPI = max(ADAPTIVE_MIN_DPI, env_int('OCR_ADAPTIVE_MAX_DPI', 300))
+TARGET_TEXT_PX = max(8, env_int('OCR_TARGET_TEXT_PX', 32))
+# 文字高さの推定に必要な最小の文字成分数（これ未満なら推定不能として最大DPIを使う）
+_ADAPTIVE_MIN_COMPONENTS = 20
+# レンダリングの色モード
+# - auto: 低解像度プローブで色を判定し、モノクロのページはグレースケールでレンダリングする
+# - color: 常にカラー（BGR）でレンダリングする
+# - gray: 常にグレースケールでレンダリングする
+COLOR_MODES = ('auto', 'color', 'gray')
+DEFAULT_COLOR_MODE = (os.environ.get('OCR_COLOR_MODE', '') or '').strip().lower() or 'auto'
+COLOR_PROBE_DPI = 36
+# 彩度（チャンネル間の最大差）がこの値を超える画素を「色あり」とみなす
+_COLOR_CHROMA_MIN = 32
+# 「色あり」画素がこの割合を超えるページをカラーページとみなす
+_COLOR_PIXEL_RATIO = 0.002
+# OnnxOCR の認識バッチ化: 複数ページの文字行画像をまとめて認識モデルに渡す
+# - REC_BATCH_SIZE: 1回の認識で処理する文字行画像の目安（0 でバッチ化しない）
+# - REC_BATCH_WAIT_MS: 検出中の他ページの認識要求を待つ最大時間
+# - REC_BATCH_ARRIVAL_WAIT_MS: 同じ文書のレンダリング中のページ（予告済み）の参加を待つ最大時間
+#   （ページのレンダリング数回分。予告は文書・エンジンインスタンス単位なので、他の文書の処理は待たない）
+# - REC_BATCH_PAGES: 逐次処理時に同時にOCRするページ数（検出は並行、認識はまとめて実行）
+REC_BATCH_SIZE = max(0, env_int('OCR_REC_BATCH_SIZE', 48))
+REC_BATCH_WAIT_MS = max(0, env_int('OCR_REC_BATCH_WAIT_MS', 50))
+REC_BATCH_ARRIVAL_WAIT_MS = max(0, env_int('OCR_REC_BATCH_ARRIVAL_WAIT_MS', 1000))
+REC_BATCH_PAGES = max(1, env_int('OCR_REC_BATCH_PAGES', 4))
+# タイル分割OCR: 長辺が TILE_MAX_SIDE px を超えるページは TILE_SIZE px のタイルに分けて検出・認識する
+# （検出器の内部縮小で小さい文字が潰れるのを防ぐ。TILE_SIZE=0 で無効）
+TILE_SIZE = max(0, env_int('OCR_TILE_SIZE', 2048))
+TILE_OVERLAP = max(0, env_int('OCR_TILE_OVERLAP', 256))
+TILE_MAX_SIDE = max(1, env_int('OCR_TILE_MAX_SIDE', 5000))
+# ページ画像ハッシュをキーにした OCR 結果キャッシュ（0 / false / off で無効）
+OCR_CACHE_ENABLED = env_flag('OCR_CACHE')
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR') or _default_cache_dir('ocr_cache')
+OCR_CACHE_MAX_MB = max(1, env_int('OCR_CACHE_MAX_MB', 256))
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """OCR結果キャッシュ（シングルトン）を返す。無効時・初期化失敗時は None。"""
+    global _ocr_cache, OCR_CACHE_ENABLED
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            try:
+                _ocr_cache = ocr_cache.OcrCache(OCR_CACHE_DIR, OCR_CACHE_MAX_MB * 1024 * 1024)
+            except Exception as e:
+                print(f"[OCR CACHE WARN] キャッシュを開けないため無効化します: {e}")
+                OCR_CACHE_ENABLED = False
+                return None
+        return _ocr_cache
+
+
+def _ocr_settings_fingerprint():
+    """OCR結果を変える設定（前処理チェーン・タイル分割）をキャッシュキー用の文字列にする。
+
+    同じページ画像でも設定を変えれば結果が変わるため、変更前の設定の結果を返さないようにキーに含める。
+    """
+    return f"pre={','.join(PREPROCESS_CHAIN)};tile={TILE_SIZE}/{TILE_OVERLAP}/{TILE_MAX_SIDE}"
+
+
+def _resolve_engines(ocr_engine=None, ocr_engines=None):
+    """process_pdf に渡されたエンジン指定を正規化したリストにする。"""
+    # エンジンリスト決定（複数エンジン優先、なければ単一エンジン）
+    if ocr_engines:
+        engines_to_use = [_normalize_engine_name(e) for e in ocr_engines if e]
+    elif ocr_engine:
+        engines_to_use = [_normalize_engine_name(ocr_engine)]
+    else:
+        engines_to_use = [DEFAULT_OCR_ENGINE]
+
+    # 重複削除
+    return list(dict.fromkeys(engines_to_use))
+
+
+# エンジンごとの専用ワーカースレッド（複数エンジン指定時に同一ページを同時にOCRする）
+_engine_executors = {}
+_engine_executors_lock = threading.Lock()
+
+
+def _page_concurrency(eng: str) -> int:
+    """1つのエンジンインスタンスを同時に呼び出してよいページ数。
+
+    OnnxOCR は認識をバッチ化する場合のみ複数ページの検出を並行させる
+    （ONNX Runtime のセッションはスレッドセーフ）。PaddleOCR は常に1。
+    """
+    if eng == 'onnxocr' and _onnx_batching_available():
+        return REC_BATCH_PAGES
+    return 1
+
+
+def _instance_concurrency(engine) -> int:
+    """OnnxOCR インスタンスを同時に貸し出してよいページ数（バッチ化できないインスタンスは1）。"""
+    return REC_BATCH_PAGES if _onnx_batching_enabled(engine) else 1
+
+
+def _get_engine_executor(eng: str):
+    """エンジン専用の Executor を返す。
+
+    スレッド数をプールのインスタンス数 × _page_concurrency に合わせ、
+    借りられるエンジン数以上のページが同時に待機しないようにする。
+    """
+    with _engine_executors_lock:
+        executor = _engine_executors.get(eng)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=ENGINE_POOL_SIZE * _page_concurrency(eng),
+                thread_name_prefix=f'ocr-{eng}',
+            )
+            _engine_executors[eng] = executor
+        return executor
+
+
+def _ocr_one_engine(bgr, eng, confidence_threshold, cache_key=None, dpi=None):
+    """1エンジン分の OCR + 正規化を行い、(items, 所要秒数, 例外, キャッシュヒット) を返す。
+
+    cache_key 指定時は閾値適用前の正規化結果をキャッシュし、閾値は取り出した後に適用する。
+    dpi はメトリクスのラベル（OCR・正規化の所要時間をエンジン・DPI別に記録する）。
+    """
+    started = time.perf_counter()
+    cache = get_ocr_cache() if cache_key else None
+    try:
+        items = None
+        if cache is not None:
+            try:
+                items = cache.get(cache_key)
+            except Exception as e:
+                print(f"[OCR CACHE WARN] 読み込み失敗: {e}")
+        hit = items is not None
+        if not hit:
+            with metrics.span('ocr', engine=eng, dpi=dpi):
+                ocr_results = run_ocr(bgr, eng)
+            with metrics.span('normalize', engine=eng, dpi=dpi):
+                items = normalize_ocr_results(ocr_results, confidence_threshold if cache is None else 0.0)
+            if cache is None:
+                return items, time.perf_counter() - started, None, False
+            try:
+                cache.put(cache_key, items)
+            except Exception as e:
+                print(f"[OCR CACHE WARN] 書き込み失敗: {e}")
+        items = [item for item in items if item['confidence'] >= confidence_threshold]
+        return items, time.perf_counter() - started, None, hit
+    except Exception as e:
+        return None, time.perf_counter() - started, e, False
+
+
+def _normalize_dpi(dpi):
+    """dpi 引数を int または ADAPTIVE_DPI に正規化する。"""
+    if isinstance(dpi, str) and dpi.strip().lower() == ADAPTIVE_DPI:
+        return ADAPTIVE_DPI
+    dpi = int(dpi)
+    if dpi <= 0:
+        raise ValueError(f"Invalid dpi: {dpi}")
+    return dpi
+
+
+def _dpi_label(dpi):
+    """メトリクスの dpi ラベル（画像入力の非整数DPIは丸めて系列数を抑える）。"""
+    return str(int(round(dpi))) if dpi else ''
+
+
+def estimate_text_height(gray, dpi):
+    """グレースケール画像の連結成分から文字高さ（px）を推定する。推定できなければ None。
+
+    漢字など複数の連結成分に分かれる文字をまとめるため、横方向にだけ軽く膨張してから
+    成分の高さを集計する。小さい文字の読み取りを優先し、中央値より小さめの分位点を採用する。
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, int(dpi) // 20), 1))
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+    stats = stats[1:]  # 0 は背景
+    w = stats[:, cv2.CC_STAT_WIDTH].astype(np.float64)
+    h = stats[:, cv2.CC_STAT_HEIGHT].astype(np.float64)
+    fill = stats[:, cv2.CC_STAT_AREA] / (w * h)
+    # 文字らしい成分のみ: ノイズ点・縦罫線・写真・塗りつぶし領域を除外
+    glyph = (
+        (h >= 3)
+        & (h <= gray.shape[0] / 10.0)
+        & (h <= w * 12)
+        & (fill >= 0.1)
+        & (fill <= 0.95)
+    )
+    if int(glyph.sum()) < _ADAPTIVE_MIN_COMPONENTS:
+        return None
+    return float(np.percentile(h[glyph], 35))
+
+
+def _choose_page_dpi(session, page_num):
+    """低解像度プローブで文字高さを推定し、ページのレンダリングDPIを決める。"""
+    probe_dpi = ADAPTIVE_PROBE_DPI
+    text_px = estimate_text_height(session.render_gray(page_num, probe_dpi), probe_dpi)
+    if text_px is None:
+        print(f"  → 適応DPI: 文字高さを推定できないため {ADAPTIVE_MAX_DPI}dpi")
+        return ADAPTIVE_MAX_DPI
+    # 25dpi 刻みで切り上げ、上下限でクランプ
+    dpi = int(np.ceil(probe_dpi * TARGET_TEXT_PX / text_px / 25.0) * 25)
+    dpi = max(ADAPTIVE_MIN_DPI, min(ADAPTIVE_MAX_DPI, dpi))
+    print(f"  → 適応DPI: 文字高さ {text_px:.1f}px@{probe_dpi}dpi → {dpi}dpi")
+    return dpi
+
+
+def _resolve_page_dpi(session, page_num, dpi):
+    """固定DPIならそのまま、ADAPTIVE_DPI ならページごとに推定したDPIを返す。"""
+    if dpi != ADAPTIVE_DPI:
+        return dpi
+    try:
+        return _choose_page_dpi(session, page_num)
+    except Exception as e:
+        print(f"[警告] 適応DPIの推定に失敗したため {ADAPTIVE_MAX_DPI}dpi で処理: {e}")
+        return ADAPTIVE_MAX_DPI
+
+
+def _normalize_color_mode(mode):
+    mode = (mode or '').strip().lower() or DEFAULT_COLOR_MODE
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unsupported color mode: {mode}. Supported: {list(COLOR_MODES)}")
+    return mode
+
+
+def _resolve_page_grayscale(session, page_num, color_mode):
+    """ページをグレースケールでレンダリングするかを決める。"""
+    if color_mode != 'auto':
+        return color_mode == 'gray'
+    try:
+        return not session.is_color(page_num)
+    except Exception as e:
+        print(f"[警告] 色判定に失敗したためカラーで処理: {e}")
+        return False
+
+
+def _normalize_text_layer_mode(mode):
+    mode = (mode or '').strip().lower() or DEFAULT_TEXT_LAYER_MODE
+    if mode not in TEXT_LAYER_MODES:
+        raise ValueError(f"Unsupported text layer mode: {mode}. Supported: {list(TEXT_LAYER_MODES)}")
+    return mode
+
+
+def _select_pages_to_ocr(session, mode, min_chars=TEXT_LAYER_MIN_CHARS):
+    """既存テキストレイヤーを事前スキャンし、OCR対象のページ番号リストを返す。"""
+    if mode == 'force':
+        return list(range(session.page_count))
+
+    targets = []
+    for page_num in range(session.page_count):
+        chars, has_image = session.text_layer_info(page_num)
+        if chars >= min_chars:
+            # 既存テキストレイヤーあり（デジタル生成PDF・OCR済みページ）
+            continue
+        if mode == 'image_only' and not has_image:
+            # 画像を含まないページはOCRしても何も得られない
+            continue
+        targets.append(page_num)
+    return targets
+
+
+def _ocr_page_all_engines(page_img, engines_to_use, confidence_threshold, dpi=None):
+    """1ページ分の画像に対して全エンジンで OCR を実行する。
+
+    複数エンジン指定時は各エンジンを専用スレッドで同時に実行する。
+    page_img は BGR ndarray（PDFiumのバッファのビュー）、TiledPage または PIL Image。
+    BGR ndarray と TiledPage は変換せずにそのまま全エンジンで共有する（コピーしない）。
+    推論本体（ONNX Runtime / Paddle Inference）はGILを解放するため、
+    ページ処理時間はおおむね最も遅いエンジンの処理時間になる。
+
+    OCR結果キャッシュが有効な場合は、ページ画像のハッシュ + エンジン + バージョン + DPI で
+    キャッシュを引き、ヒットしたエンジンは OCR を省略する。
+
+    Returns:
+        (engine_results, engine_timings, cache_hits)
+        engine_results: {engine: {'items', 'avg_confidence', 'text_count'}}（検出0件のエンジンは含まない）
+        engine_timings: {engine: OCR所要秒数}（全エンジン）
+        cache_hits: キャッシュから結果を得たエンジン数
+    """
+    bgr = page_img if isinstance(page_img, TiledPage) else _to_bgr(page_img)
+    dpi_label = _dpi_label(dpi)
+
+    cache_keys = dict.fromkeys(engines_to_use)
+    if get_ocr_cache() is not None:
+        digest = bgr.digest() if isinstance(bgr, TiledPage) else ocr_cache.image_digest(bgr)
+        settings = _ocr_settings_fingerprint()
+        cache_keys = {eng: ocr_cache.make_key(digest, eng, dpi, settings) for eng in engines_to_use}
+
+    if len(engines_to_use) > 1:
+        futures = {}
+        for eng in engines_to_use:
+            print(f"  → {eng} OCR実行中...")
+            # コンテキストごと渡す（ページの到着予告をエンジンのスレッドで解除するため）
+            futures[eng] = _get_engine_executor(eng).submit(
+                contextvars.copy_context().run,
+                _ocr_one_engine, bgr, eng, confidence_threshold, cache_keys[eng], dpi_label,
+            )
+        outcomes = {eng: future.result() for eng, future in futures.items()}
+    else:
+        outcomes = {}
+        for eng in engines_to_use:
+            print(f"  → {eng} OCR実行中...")
+            outcomes[eng] = _ocr_one_engine(bgr, eng, confidence_threshold, cache_keys[eng], dpi_label)
+
+    engine_results = {}
+    engine_timings = {}
+    cache_hits = 0
+    for eng in engines_to_use:
+        ocr_items, elapsed, error, hit = outcomes[eng]
+        engine_timings[eng] = elapsed
+        cache_hits += int(hit)
+        source = "キャッシュ" if hit else f"{elapsed:.2f}秒"
+        if error is not None:
+            print(f"    ✗ {eng}: OCR実行エラー: {error}")
+        elif ocr_items:
+            avg_confidence = sum(item['confidence'] for item in ocr_items) / len(ocr_items)
+            print(f"    ✓ {eng}: {len(ocr_items)}個のテキスト検出 (平均信頼度: {avg_confidence:.2%}, {source})")
+            engine_results[eng] = {
+                'items': ocr_items,
+                'avg_confidence': avg_confidence,
+                'text_count': len(ocr_items),
+            }
+        else:
+            print(f"    ✗ {eng}: テキストが検出されませんでした")
+    return engine_results, engine_timings, cache_hits
+
+
+def _render_for_ocr(session, page_num, dpi, color_mode):
+    """OCR用にページをレンダリングし、(image, 使用DPI) を返す。
+
+    dpi='auto' ならページごとにDPIを決め、モノクロと判定したページはグレースケールで描画する。
+    画像入力（session.images あり）は元画像のフレームをそのままデコードし、画像の解像度を使用DPIとする。
+    タイル分割の対象になる大判PDFページはここでは描画せず、TiledPage を返す（OCR時にタイルごとに描画する）。
+    """
+    started = time.perf_counter()
+    if session.images is not None:
+        frame, page_dpi = session.images.load_frame(page_num)
+        page_img = np.array(frame) if frame.mode == 'L' else _to_bgr(frame)
+        if color_mode == 'gray':
+            page_img = _to_gray(page_img)
+    else:
+        page_dpi = _resolve_page_dpi(session, page_num, dpi)
+        grayscale = _resolve_page_grayscale(session, page_num, color_mode)
+        page_img = TiledPage(session, page_num, page_dpi, grayscale)
+        if not _needs_tiling(page_img):
+            page_img, _, _ = session.render_array(page_num, page_dpi, grayscale=grayscale)
+    metrics.observe('render', time.perf_counter() - started, dpi=_dpi_label(page_dpi))
+    return page_img, page_dpi
+
+
+def _process_page(source, page_num, dpi, page_w_pt, page_h_pt, engines_to_use, confidence_threshold,
+                  color_mode='color', images=None):
+    """1ページ分の「レンダリング → 全エンジンOCR → オーバーレイ作成」を行う。
+
+    ページ並列処理（ワーカープロセス）から呼ばれる。
+    source は PdfSession（またはPDFパス。画像入力なら images に ImageDocument）。
+    戻り値は pickle 可能な dict で、OCRアイテム本体は含めない（親プロセスへの転送量削減）。
+    """
+    if not isinstance(source, PdfSession):
+        with PdfSession(source, images=images) as session:
+            return _process_page(session, page_num, dpi, page_w_pt, page_h_pt, engines_to_use,
+                                 confidence_threshold, color_mode)
+
+    # 1. PDFページを画像として取り出す
+    try:
+        page_img, dpi = _render_for_ocr(source, page_num, dpi, color_mode)
+    except Exception as e:
+        raise Exception(f"PDFレンダリング失敗: {str(e)}")
+    return _process_rendered_page(page_img, page_num, page_w_pt, page_h_pt, engines_to_use, confidence_threshold, dpi)
+
+
+def _process_rendered_page(page_img, page_num, page_w_pt, page_h_pt, engines_to_use, confidence_threshold, dpi=None):
+    """レンダリング済みの1ページ（BGR ndarray、TiledPage または PIL Image）に対して「全エンジンOCR → オーバーレイ作成」を行う。"""
+    if isinstance(page_img, (np.ndarray, TiledPage)):
+        img_height, img_width = page_img.shape[:2]
+    else:
+        img_width, img_height = page_img.size
+    mode = "グレースケール" if isinstance(page_img, (np.ndarray, TiledPage)) and page_img.ndim == 2 else "カラー"
+    print(f"  → 画像レンダリング完了: {img_width}x{img_height}px（{mode}）")
+
+    # 画像px → PDFpt 変換係数
+    scale_x = page_w_pt / float(img_width)
+    scale_y = page_h_pt / float(img_height)
+
+    # 2. 全エンジンでOCRを実行
+    engine_results, engine_timings, cache_hits = _ocr_page_all_engines(
+        page_img, engines_to_use, confidence_threshold, dpi,
+    )
+
+    # 3. 最良のエンジン結果を選択（平均信頼度が最も高いもの）
+    best_engine = None
+    best_result = None
+    best_confidence = -1.0
+
+    for eng, res in engine_results.items():
+        if res['avg_confidence'] > best_confidence:
+            best_confidence = res['avg_confidence']
+            best_engine = eng
+            best_result = res
+
+    # 4. 透明テキストレイヤーを作成（最良エンジンの結果を使用。フォントは合成時に文書全体で共有）
+    overlay = None
+    if best_result:
+        with metrics.span('overlay', engine=best_engine, dpi=_dpi_label(dpi)):
+            overlay = build_text_overlay(
+                page_h_pt,
+                best_result['items'],
+                scale_x=scale_x,
+                scale_y=scale_y,
+            )
+    if overlay:
+        print(f"  → 透明テキスト作成完了（使用エンジン: {best_engine}, 信頼度: {best_confidence:.2%}）")
+    else:
+        print(f"  → テキストが検出されませんでした")
+
+    return {
+        'page_num': page_num,
+        'overlay': overlay,
+        'best_engine': best_engine,
+        'engine_results': {
+            eng: {
+                'text_count': res['text_count'],
+                'conf_sum': sum(item['confidence'] for item in res['items']),
+            }
+            for eng, res in engine_results.items()
+        },
+        'engine_timings': engine_timings,
+        'cache_hits': cache_hits,
+        'dpi': dpi,
+        'grayscale': mode == "グレースケール",
+        'image_size': [img_width, img_height],
+    }
+
+
+def _announce_each(items, stream=None):
+    """items を1つずつ取り出し、(要素, Arrival または None) を返すジェネレータ。
+
+    Arrival は要素を取り出す（ページのレンダリングを待つ）前に stream（文書の rec_batcher.PageStream）で
+    予告したもので、この文書のページが参加している認識バッチはこのページが参加するまで実行を待つ。
+    呼び出し側はページをOCRに回さない場合 release() すること。stream が None なら予告しない。
+    """
+    while True:
+        arrival = stream.announce() if stream is not None else None
+        try:
+            item = next(items)
+        except BaseException as e:
+            if arrival is not None:
+                arrival.release()
+            if isinstance(e, StopIteration):
+                return
+            raise
+        yield item, arrival
+
+
+def _process_arrived_page(arrival, *args):
+    """予告済みのページに対して _process_rendered_page を行う（OCRに参加した時点で予告を解除する）。"""
+    if arrival is None:
+        return _process_rendered_page(*args)
+    with arrival.bind():
+        return _process_rendered_page(*args)
+
+
+def _page_worker_init(threads_per_worker):
+    """ページ並列ワーカープロセスの初期化。
+
+    OCRエンジンはワーカーごとに遅延初期化され、プロセス内シングルトンとして保持される。
+    ワーカー数 × 推論スレッド数がコア数を超えないよう、スレッド数を絞っておく。
+    """
+    if threads_per_worker:
+        os.environ.setdefault('OMP_NUM_THREADS', str(threads_per_worker))
+        try:
+            cv2.setNumThreads(threads_per_worker)
+        except Exception:
+            pass
+
+
+_PREFETCH_DONE = object()
+
+
+def _iter_rendered_pages(session, page_numbers, dpi, depth, color_mode='color'):
+    """ページを順にレンダリングし、(page_num, image, page_dpi, error) を返すジェネレータ。
+
+    depth >= 1 の場合は別スレッドで最大 depth ページ先までレンダリングしておき、
+    呼び出し側がページNをOCRしている間にページN+1..N+depthを準備する。
+    キューが上限に達するとレンダリングは待機するため、保持する画像は高々 depth+1 枚。
+    呼び出し側は途中で抜ける場合に close() すること（先読みスレッドを止める）。
+    """
+    if depth <= 0:
+        for page_num in page_numbers:
+            try:
+                page_img, page_dpi = _render_for_ocr(session, page_num, dpi, color_mode)
+            except Exception as e:
+                yield page_num, None, None, e
+                continue
+            yield page_num, page_img, page_dpi, None
+        return
+
+    rendered = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                rendered.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        for page_num in page_numbers:
+            if stop.is_set():
+                return
+            try:
+                page_img, page_dpi = _render_for_ocr(session, page_num, dpi, color_mode)
+                item = (page_num, page_img, page_dpi, None)
+            except Exception as e:
+                item = (page_num, None, None, e)
+            if not _put(item):
+                return
+        _put(_PREFETCH_DONE)
+
+    producer = threading.Thread(target=_producer, name='pdf-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = rendered.get()
+            if item is _PREFETCH_DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        # 待機中の put を解放してからスレッド終了を待つ
+        while True:
+            try:
+                rendered.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
+
+
+# ワーカープロセス内で開いている PdfSession（同じPDFのページはこれを使い回す）
+_worker_session = None
+
+
+def _get_worker_session(pdf_path, images=None):
+    global _worker_session
+    if _worker_session is None or _worker_session.pdf_path != pdf_path:
+        if _worker_session is not None:
+            _worker_session.close()
+        _worker_session = PdfSession(pdf_path, images=images)
+    return _worker_session
+
+
+def _process_page_task(args):
+    """ワーカープロセス側のエントリポイント（例外はページ単位で握りつぶす）。"""
+    pdf_path, page_num, images = args[0], args[1], args[-1]
+    try:
+        result = _process_page(_get_worker_session(pdf_path, images), *args[1:-1])
+    except Exception as e:
+        print(f"[エラー] ページ {page_num + 1} の処理でエラー: {e}")
+        result = {'page_num': page_num, 'overlay': None, 'best_engine': None, 'engine_results': {},
+                  'engine_timings': {}, 'error': str(e)}
+    # このページで計測したメトリクスは親プロセスの集計に加える
+    result['metrics'] = metrics.drain()
+    return result
+
+
+# ページ並列処理のプロセスプール（初回の並列処理で作成し、文書をまたいで使い回す）。
+# ワーカーはエンジンをプロセス内シングルトンとして保持し続けるため、2文書目以降は起動・モデル読み込みがない
+_page_pool = None
+_page_pool_workers = 0
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool(workers):
+    """ワーカー数 workers のプロセスプールを返す（ワーカー数が変わった場合だけ作り直す）。_page_pool_lock 内で呼ぶ。"""
+    global _page_pool, _page_pool_workers
+    if _page_pool is not None and _page_pool_workers == workers:
+        return _page_pool
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    if _page_pool is not None:
+        # 旧プールに投入済みのページ（他の文書）は最後まで処理させてから終了させる
+        _page_pool.shutdown(wait=False)
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    # fork はOCRエンジン内部のスレッドと相性が悪いため、全OSで spawn を使う
+    _page_pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_page_worker_init,
+        initargs=(threads_per_worker,),
+    )
+    _page_pool_workers = workers
+    print(f"[開始] ページ並列ワーカー起動: {workers}プロセス")
+    return _page_pool
+
+
+def _submit_page_tasks(page_tasks, workers):
+    """ページ単位のタスクをプロセスプールへ投入し、{future: page_num} を返す。"""
+    global _page_pool
+    from concurrent.futures.process import BrokenProcessPool
+
+    with _page_pool_lock:
+        pool = _get_page_pool(workers)
+        try:
+            return {pool.submit(_process_page_task, task): task[1] for task in page_tasks}
+        except BrokenProcessPool:
+            # ワーカーが異常終了していたプールは作り直す
+            print("[警告] ページ並列ワーカーが停止していたため再起動します")
+            pool.shutdown(wait=False, cancel_futures=True)
+            _page_pool = None
+            pool = _get_page_pool(workers)
+            return {pool.submit(_process_page_task, task): task[1] for task in page_tasks}
+
+
+def shutdown_page_pool():
+    """ページ並列処理のプロセスプールを停止する（プロセス終了時に自動で呼ばれる）。"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=True, cancel_futures=True)
+            _page_pool = None
+
+
+atexit.register(shutdown_page_pool)
+
+
+def _run_pages_parallel(page_tasks, workers, on_result, progress_callback=None, cancel_event=None):
+    """ページ単位のタスクをプロセスプールで並列実行する。
+
+    結果は完了順に on_result(page_num, page_result) へ渡す（失敗ページは page_result=None）。
+    プロセスプールは呼び出しをまたいで共有する（_get_page_pool）。
+    """
+    page_count = len(page_tasks)
+    futures = _submit_page_tasks(page_tasks, workers)
+    pending = set(futures)
+    done = 0
+
+    def record(future):
+        page_num = futures.pop(future)
+        try:
+            page_result = future.result()
+            metrics.merge(page_result.pop('metrics', None))
+        except Exception as e:
+            print(f"[エラー] ページ {page_num + 1} のワーカー実行でエラー: {e}")
+            page_result = None
+        on_result(page_num, page_result)
+
+    try:
+        while pending:
+            # キャンセル要求に素早く反応できるよう、短い間隔で待つ
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                for future in pending:
+                    future.cancel()
+                # 実行中だったページは完了を待ち、完了済みのページと合わせて結果を渡す（チェックポイントに残す）
+                finished |= wait([future for future in pending if not future.cancelled()])[0]
+                for future in finished:
+                    if not future.cancelled():
+                        record(future)
+                raise ProcessingCancelled("処理がキャンセルされました")
+            for future in finished:
+                record(future)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, page_count, f"ページ {done}/{page_count} 完了")
+    finally:
+        # 途中で抜けた場合、未着手のページを共有プールに残さない
+        for future in pending:
+            future.cancel()
 
 
 def process_pdf(
@@ -568,32 +2297,68 @@ def process_pdf(
     progress_callback=None,
     ocr_engine=None,
     ocr_engines=None,
+    workers=None,
+    cancel_event=None,
+    prefetch=None,
+    stream_output=None,
+    text_layer_mode=None,
+    color_mode=None,
+    images=None,
+    checkpoint_dir=None,
+    resume=False,
+    checkpoint_key=None,
+    event_callback=None,
 ):
     """PDFを処理して検索可能PDFに変換する（メイン処理）
 
-    複数エンジン並列処理対応。各ページで全エンジンを実行し、最も高精度なエンジンの結果を採用。
+    複数エンジン並列処理対応。各ページで全エンジンを同時に実行し、最も高精度なエンジンの結果を採用。
+    workers に2以上を指定すると、ページ単位でワーカープロセスに分散して処理する。
     
     Args:
         input_pdf_path: 入力PDFファイルパス
         output_pdf_path: 出力PDFファイルパス
-        dpi: OCR用の画像解像度
+        dpi: OCR用の画像解像度。'auto' ならページごとに文字サイズから決める（適応DPI）
         confidence_threshold: OCR信頼度の閾値
         progress_callback: 進捗コールバック関数 callback(current, total, message)
         ocr_engine: 単一エンジン名（後方互換性）
         ocr_engines: 複数エンジンリスト（複数エンジン対応）
+        workers: ページ並列処理のワーカープロセス数（None なら環境変数 OCR_PAGE_WORKERS、既定1）
+        cancel_event: キャンセル要求（threading.Event 互換）。セットされるとページ境界で中断する
+        prefetch: 逐次処理時に先読みレンダリングするページ数（None なら環境変数 OCR_PREFETCH_PAGES、0で無効）
+        stream_output: オーバーレイを一時ディレクトリへ退避し、追記方式で合成する（None ならページ数で自動判定）
+        text_layer_mode: 既存テキストレイヤーの扱い force / skip / image_only（None なら環境変数 OCR_TEXT_LAYER_MODE）
+        color_mode: レンダリングの色モード auto / color / gray（None なら環境変数 OCR_COLOR_MODE）
+        images: 入力PDFが ImageDocument.write_pdf で作った画像PDFの場合、その ImageDocument。
+            OCRはPDFを再レンダリングせず元画像のフレームで行い、dpi / text_layer_mode は使わない
+        checkpoint_dir: 完了したページをその都度記録するディレクトリ（None なら環境変数 OCR_CHECKPOINT_DIR、空なら記録しない）
+        resume: checkpoint_dir に同じ文書・同じパラメータの記録があれば、未完了のページだけを処理する
+        checkpoint_key: チェックポイントの文書キー（None なら入力PDFの内容と処理パラメータのハッシュ）
+        event_callback: ページ単位のイベント通知 callback(event, data)。このプロセスのメインスレッドから呼ばれる
+            page_rendered: page / width / height / dpi / grayscale
+            page_ocr: page / engine / elapsed_sec / text_count / avg_confidence（エンジンごと）
+            page_overlay: page / best_engine / has_text
+            page_failed: page / error
+            merged: pages / elapsed_sec / output_bytes
     """
-    pdf = None
+    def emit(event, **data):
+        if event_callback is None:
+            return
+        try:
+            event_callback(event, data)
+        except Exception as e:
+            print(f"[警告] イベント通知に失敗: {e}")
+
+    def emit_rendered(page_num, width, height, page_dpi, grayscale):
+        emit('page_rendered', page=page_num + 1, width=width, height=height, dpi=page_dpi, grayscale=grayscale)
+
+    session = None
+    overlays = None
+    page_checkpoint = None
     try:
-        # エンジンリスト決定（複数エンジン優先、なければ単一エンジン）
-        if ocr_engines:
-            engines_to_use = [_normalize_engine_name(e) for e in ocr_engines if e]
-        elif ocr_engine:
-            engines_to_use = [_normalize_engine_name(ocr_engine)]
-        else:
-            engines_to_use = [DEFAULT_OCR_ENGINE]
-        
-        # 重複削除
-        engines_to_use = list(dict.fromkeys(engines_to_use))
+        engines_to_use = _resolve_engines(ocr_engine, ocr_engines)
+        text_layer_mode = _normalize_text_layer_mode(text_layer_mode)
+        dpi = _normalize_dpi(dpi)
+        color_mode = _normalize_color_mode(color_mode)
         
         # エンジンの可用性を早めにチェック
         for eng in engines_to_use:
@@ -604,15 +2369,61 @@ def process_pdf(
                 if not ensure_onnxocr_available():
                     raise ValueError(f"OnnxOCR is not available: {_ONNX_IMPORT_ERROR}")
 
-        # PDFページ数を取得
-        pdf = pdfium.PdfDocument(input_pdf_path)
-        page_count = len(pdf)
-        print(f"[開始] PDFファイル: {input_pdf_path}, ページ数: {page_count}, エンジン: {engines_to_use}")
+        # PDFを1回だけ開き、ページ数・ページサイズ・レンダリング・合成で使い回す
+        session = PdfSession(input_pdf_path, images=images)
+        page_count = session.page_count
+
+        if images is not None:
+            # 画像PDFにテキストレイヤーはないため全ページが対象
+            pages_to_ocr = list(range(page_count))
+            print(f"[開始] 画像入力: {images.page_count}フレームを元画像のままOCR（PDFの再レンダリングなし）")
+        else:
+            # 既存テキストレイヤーを事前スキャンし、OCRが必要なページだけを対象にする
+            pages_to_ocr = _select_pages_to_ocr(session, text_layer_mode)
+        pages_skipped = page_count - len(pages_to_ocr)
+
+        # チェックポイント: 完了済みのページは記録から復元し、残りのページだけを処理する
+        restored = {}
+        if checkpoint_dir is None:
+            checkpoint_dir = DEFAULT_CHECKPOINT_DIR
+        if checkpoint_dir:
+            checkpoint.prune(checkpoint_dir, CHECKPOINT_TTL_SEC)
+            if checkpoint_key is None:
+                checkpoint_key = doc_cache.make_key(
+                    input_pdf_path,
+                    dpi=dpi,
+                    confidence_threshold=confidence_threshold,
+                    ocr_engines=engines_to_use,
+                    text_layer_mode=text_layer_mode,
+                    color_mode=color_mode,
+                )
+            try:
+                page_checkpoint = PageCheckpoint(checkpoint_dir, checkpoint_key, page_count, resume=resume)
+            except checkpoint.CheckpointBusy as e:
+                # 同じ文書を処理中の別ジョブの記録は壊さないよう、このジョブは記録なしで処理する
+                print(f"[警告] {e}。チェックポイントなしで処理します")
+            if page_checkpoint is not None and resume:
+                restored = page_checkpoint.load()
+                pages_to_ocr = [page_num for page_num in pages_to_ocr if page_num not in restored]
+                if restored:
+                    print(f"[開始] チェックポイントから再開: {len(restored)}ページ完了済み、残り {len(pages_to_ocr)}ページ")
+
+        if workers is None:
+            workers = DEFAULT_PAGE_WORKERS
+        workers = max(1, min(int(workers), len(pages_to_ocr) or 1))
+        print(f"[開始] PDFファイル: {input_pdf_path}, ページ数: {page_count}, エンジン: {engines_to_use}, ワーカー: {workers}")
+        if pages_skipped:
+            print(f"[開始] テキストレイヤー事前スキャン（{text_layer_mode}）: {pages_skipped}ページはOCRせずそのまま出力")
+
+        # PDFページサイズ（pt）を取得（PDFiumのページサイズ = レンダリングと同じ基準）
+        page_sizes = [session.page_size(page_num) for page_num in range(page_count)]
+
+        page_tasks = [
+            (input_pdf_path, page_num, dpi, page_sizes[page_num][0], page_sizes[page_num][1],
+             engines_to_use, confidence_threshold, color_mode, images)
+            for page_num in pages_to_ocr
+        ]
 
-        # PDFページサイズ（pt）を取得
-        with open(input_pdf_path, 'rb') as f:
-            reader_for_size = PdfReader(io.BytesIO(f.read()))
-        
         # エンジン別の精度集計
         engine_stats = {}
         for eng in engines_to_use:
@@ -620,94 +2431,142 @@ def process_pdf(
                 'total_text_count': 0,
                 'total_conf_sum': 0.0,
                 'pages_processed': 0,
+                'total_ocr_sec': 0.0,
+                'pages_timed': 0,
             }
-        
-        # 各ページで全エンジンを実行し、最良の結果を選択
-        overlay_list = []
-        
-        for page_num in range(page_count):
+
+        # オーバーレイはページ番号の位置に格納し、ページ順で merge_overlay に渡す。
+        # ストリーミング出力時はメモリに溜めず、完了したページから一時ディレクトリへ書き出す。
+        if stream_output is None:
+            stream_output = 0 < STREAM_OUTPUT_MIN_PAGES <= page_count
+        if stream_output:
+            overlays = OverlaySpool(page_count)
+            print(f"[開始] ストリーミング出力: オーバーレイを一時ディレクトリへ退避 ({overlays.directory})")
+        else:
+            overlays = [None] * page_count
+
+        ocr_cache_hits = 0
+        # ページごとに実際に使ったDPI（OCRしなかったページは None）
+        page_dpis = [None] * page_count
+        pages_grayscale = 0
+
+        def collect(page_num, page_result):
+            """完了したページの結果を集計し、オーバーレイを格納する。"""
+            nonlocal ocr_cache_hits, pages_grayscale
+            if not page_result:
+                return
+            for eng, res in page_result['engine_results'].items():
+                engine_stats[eng]['total_text_count'] += res['text_count']
+                engine_stats[eng]['total_conf_sum'] += res['conf_sum']
+                engine_stats[eng]['pages_processed'] += 1
+            for eng, elapsed in page_result['engine_timings'].items():
+                engine_stats[eng]['total_ocr_sec'] += elapsed
+                engine_stats[eng]['pages_timed'] += 1
+            ocr_cache_hits += page_result.get('cache_hits', 0)
+            page_dpis[page_num] = page_result.get('dpi')
+            pages_grayscale += int(page_result.get('grayscale', False))
+            overlays[page_num] = page_result['overlay']
+
+        def on_page_done(page_num, page_result):
+            """ページの結果を集計し、チェックポイントに記録する（失敗したページは記録せず、再開時に処理し直す）。"""
+            collect(page_num, page_result)
+            if not page_result or 'error' in page_result:
+                emit('page_failed', page=page_num + 1,
+                     error=(page_result or {}).get('error', "ワーカー実行エラー"))
+                return
+            if workers > 1:
+                # ページ並列時のレンダリングはワーカー内で行われるため、結果から通知する
+                emit_rendered(page_num, *page_result['image_size'], page_result.get('dpi'),
+                              page_result.get('grayscale', False))
+            for eng, elapsed in page_result['engine_timings'].items():
+                res = page_result['engine_results'].get(eng)
+                emit('page_ocr', page=page_num + 1, engine=eng, elapsed_sec=round(elapsed, 4),
+                     text_count=res['text_count'] if res else 0,
+                     avg_confidence=res['conf_sum'] / res['text_count'] if res and res['text_count'] else 0.0)
+            emit('page_overlay', page=page_num + 1, best_engine=page_result['best_engine'],
+                 has_text=bool(page_result['overlay']))
+            if page_checkpoint is None:
+                return
             try:
-                if progress_callback:
-                    progress_callback(page_num + 1, page_count, f"ページ {page_num + 1}/{page_count} を処理中...")
-                
-                print(f"\n[処理中] ページ {page_num + 1}/{page_count}")
-                
-                # 1. PDFページを画像として取り出す
-                pil_img, img_width, img_height = render_pdf_to_image(input_pdf_path, page_num, dpi)
-                print(f"  → 画像レンダリング完了: {img_width}x{img_height}px")
-
-                # PDFのページサイズ（ポイント）
-                pdf_page = reader_for_size.pages[page_num]
-                page_w_pt = float(pdf_page.mediabox.width)
-                page_h_pt = float(pdf_page.mediabox.height)
-
-                # 画像px → PDFpt 変換係数
-                scale_x = page_w_pt / float(img_width)
-                scale_y = page_h_pt / float(img_height)
-                
-                # 2. 全エンジンでOCRを実行
-                engine_results = {}
-                for eng in engines_to_use:
-                    print(f"  → {eng} OCR実行中...")
+                page_checkpoint.save(page_num, page_result)
+            except Exception as e:
+                print(f"[警告] ページ {page_num + 1} のチェックポイント記録に失敗: {e}")
+
+        for page_num, page_result in restored.items():
+            collect(page_num, page_result)
+        if restored and progress_callback:
+            progress_callback(len(restored), page_count, f"チェックポイントから {len(restored)}ページを復元")
+
+        if workers > 1:
+            # ページ並列: 各ワーカープロセスが自前のOCRエンジンを持ち、ページを独立に処理する
+            _run_pages_parallel(page_tasks, workers, on_page_done, progress_callback, cancel_event)
+        else:
+            if prefetch is None:
+                prefetch = DEFAULT_PREFETCH_PAGES
+            # 同時にOCRするページ数（OnnxOCR の認識バッチ化時のみ複数ページ。PaddleOCR は専用スレッドで直列化される）
+            page_threads = max(_page_concurrency(eng) for eng in engines_to_use)
+            in_flight = {}
+
+            def finish(futures):
+                for future in futures:
+                    page_num = in_flight.pop(future)
                     try:
-                        ocr_results = run_ocr(pil_img, eng)
-                        ocr_items = normalize_ocr_results(ocr_results, confidence_threshold)
-                        
-                        if ocr_items:
-                            avg_confidence = sum(item['confidence'] for item in ocr_items) / len(ocr_items)
-                            print(f"    ✓ {eng}: {len(ocr_items)}個のテキスト検出 (平均信頼度: {avg_confidence:.2%})")
-                            
-                            engine_stats[eng]['total_text_count'] += len(ocr_items)
-                            engine_stats[eng]['total_conf_sum'] += sum(item['confidence'] for item in ocr_items)
-                            engine_stats[eng]['pages_processed'] += 1
-                            
-                            engine_results[eng] = {
-                                'items': ocr_items,
-                                'avg_confidence': avg_confidence,
-                                'text_count': len(ocr_items),
-                            }
-                        else:
-                            print(f"    ✗ {eng}: テキストが検出されませんでした")
+                        on_page_done(page_num, future.result())
                     except Exception as e:
-                        print(f"    ✗ {eng}: OCR実行エラー: {e}")
-                
-                # 3. 最良のエンジン結果を選択（平均信頼度が最も高いもの）
-                best_engine = None
-                best_result = None
-                best_confidence = -1.0
-                
-                for eng, res in engine_results.items():
-                    if res['avg_confidence'] > best_confidence:
-                        best_confidence = res['avg_confidence']
-                        best_engine = eng
-                        best_result = res
-                
-                # 4. 透明テキストレイヤーPDFを作成（最良エンジンの結果を使用）
-                if best_result:
-                    overlay_bytes = create_overlay_pdf(
-                        page_w_pt,
-                        page_h_pt,
-                        best_result['items'],
-                        scale_x=scale_x,
-                        scale_y=scale_y,
-                    )
-                    print(f"  → オーバーレイPDF作成完了（使用エンジン: {best_engine}, 信頼度: {best_confidence:.2%}）")
-                else:
-                    overlay_bytes = None
-                    print(f"  → テキストが検出されませんでした")
-                
-                overlay_list.append(overlay_bytes)
-                
-            except Exception as e:
-                print(f"[エラー] ページ {page_num + 1} の処理でエラー: {e}")
-                overlay_list.append(None)
-                continue
-        
+                        print(f"[エラー] ページ {page_num + 1} の処理でエラー: {e}")
+                        emit('page_failed', page=page_num + 1, error=str(e))
+
+            # レンダリング（先読みスレッド）と OCR（ページスレッド）をパイプライン化する
+            try:
+                with contextlib.closing(_iter_rendered_pages(session, pages_to_ocr, dpi, prefetch, color_mode)) as pages, \
+                        ThreadPoolExecutor(max_workers=page_threads, thread_name_prefix='ocr-page') as page_executor:
+                    # 認識をバッチ化する場合は、レンダリング待ちのページを予告してバッチに加わるのを待たせる
+                    for (page_num, page_img, page_dpi, render_error), arrival in _announce_each(pages, rec_batcher.PageStream() if page_threads > 1 else None):
+                        try:
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise ProcessingCancelled("処理がキャンセルされました")
+                            if progress_callback:
+                                progress_callback(page_num + 1, page_count, f"ページ {page_num + 1}/{page_count} を処理中...")
+
+                            print(f"\n[処理中] ページ {page_num + 1}/{page_count}")
+                            if render_error is not None:
+                                print(f"[エラー] ページ {page_num + 1} の処理でエラー: PDFレンダリング失敗: {render_error}")
+                                emit('page_failed', page=page_num + 1, error=f"PDFレンダリング失敗: {render_error}")
+                                continue
+                            emit_rendered(page_num, page_img.shape[1], page_img.shape[0], page_dpi, page_img.ndim == 2)
+                            page_w_pt, page_h_pt = page_sizes[page_num]
+                            future = page_executor.submit(
+                                _process_arrived_page, arrival,
+                                page_img, page_num, page_w_pt, page_h_pt, engines_to_use, confidence_threshold, page_dpi,
+                            )
+                            # 予告はページスレッドがOCRに参加した時点で解除される
+                            arrival = None
+                        finally:
+                            if arrival is not None:
+                                arrival.release()
+                        in_flight[future] = page_num
+                        page_img = None
+                        if len(in_flight) >= page_threads:
+                            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                            finish(finished)
+            finally:
+                # キャンセル・エラーで抜けた場合も、完了済みのページは集計してチェックポイントに記録する
+                # （ページスレッドの終了は with ブロックの終わりで待っている）
+                finish([future for future in list(in_flight) if future.done() and not future.cancelled()])
+
         # 5. 元PDFとオーバーレイPDFを合体
         if progress_callback:
             progress_callback(page_count, page_count, "PDF合成中...")
         
-        merge_overlay(input_pdf_path, overlay_list, output_pdf_path)
+        merge_start = time.perf_counter()
+        merge_overlay(input_pdf_path, overlays, output_pdf_path, session=session, streaming=stream_output)
+        merge_sec = time.perf_counter() - merge_start
+        metrics.observe('merge', merge_sec)
+        emit('merged', pages=page_count, elapsed_sec=round(merge_sec, 4),
+             output_bytes=os.path.getsize(output_pdf_path))
+        if page_checkpoint is not None:
+            page_checkpoint.remove()
+            page_checkpoint = None
         
         if progress_callback:
             progress_callback(page_count, page_count, "完了")
@@ -728,6 +2587,11 @@ def process_pdf(
                 "avg_confidence": avg_conf,
                 "total_text_count": stats['total_text_count'],
                 "pages_processed": stats['pages_processed'],
+                # エンジン別のOCR所要時間（複数エンジンは同時実行されるため合計はページ時間を超え得る）
+                "total_ocr_sec": stats['total_ocr_sec'],
+                "avg_ocr_sec_per_page": (
+                    stats['total_ocr_sec'] / stats['pages_timed'] if stats['pages_timed'] else 0.0
+                ),
             }
             
             if avg_conf > best_confidence_overall:
@@ -738,11 +2602,27 @@ def process_pdf(
             "success": True,
             "output_path": output_pdf_path,
             "pages_processed": page_count,
+            "pages_ocr": len(pages_to_ocr) + len(restored),
+            "pages_skipped": pages_skipped,
+            "pages_resumed": len(restored),
+            "ocr_cache_hits": ocr_cache_hits,
+            "dpi": dpi,
+            "page_dpis": page_dpis,
+            "color_mode": color_mode,
+            "pages_grayscale": pages_grayscale,
+            "text_layer_mode": text_layer_mode,
             "engines": engines_to_use,
             "engine_stats": engine_stats_summary,
             "best_engine": best_engine_overall,
         }
         
+    except ProcessingCancelled as e:
+        print(f"[中断] {e}")
+        return {
+            "success": False,
+            "cancelled": True,
+            "error": str(e),
+        }
     except Exception as e:
         error_msg = f"PDF処理エラー: {str(e)}"
         print(f"[エラー] {error_msg}")
@@ -751,30 +2631,77 @@ def process_pdf(
             "error": error_msg,
         }
     finally:
+        if page_checkpoint is not None:
+            page_checkpoint.close()
+        if isinstance(overlays, OverlaySpool):
+            overlays.close()
+        if session is not None:
+            session.close()
+
+
+def process_images(image_paths, output_pdf_path, **kwargs):
+    """画像（JPEG / PNG / マルチページTIFF、またはそれらの ZIP）を検索可能PDFに変換する。
+
+    元画像の圧縮データをそのまま埋め込んだ画像PDFを作り、OCRはデコードしたフレームに対して行う。
+    引数・戻り値は process_pdf と同じ（image_paths は1つのパスまたはパスのリスト）。
+    """
+    fd, base_pdf_path = tempfile.mkstemp(
+        prefix='images_', suffix='.pdf', dir=os.path.dirname(os.path.abspath(output_pdf_path)),
+    )
+    os.close(fd)
+    try:
         try:
-            if pdf is not None and hasattr(pdf, 'close'):
-                pdf.close()
-        except Exception:
-            pass
+            with metrics.span('image_to_pdf'):
+                images = ImageDocument(image_paths)
+                images.write_pdf(base_pdf_path)
+        except Exception as e:
+            error_msg = f"画像読み込みエラー: {str(e)}"
+            print(f"[エラー] {error_msg}")
+            return {"success": False, "error": error_msg}
+        return process_pdf(base_pdf_path, output_pdf_path, images=images, **kwargs)
+    finally:
+        os.remove(base_pdf_path)
+
 
 if __name__ == "__main__":
     # テスト実行
+    import argparse
     import sys
-    
-    if len(sys.argv) < 3:
-        print("使用方法: python main.py <入力PDF> <出力PDF>")
-        sys.exit(1)
-    
-    input_pdf = sys.argv[1]
-    output_pdf = sys.argv[2]
-    
+
+    parser = argparse.ArgumentParser(description="スキャンPDF/画像を検索可能PDFに変換する")
+    parser.add_argument("input", help="入力PDF / 画像（JPEG, PNG, TIFF）/ 画像のZIP")
+    parser.add_argument("output", help="出力PDF")
+    parser.add_argument(
+        "--checkpoint-dir",
+        default=DEFAULT_CHECKPOINT_DIR,
+        help="完了したページを記録するディレクトリ（既定: 環境変数 OCR_CHECKPOINT_DIR）",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="チェックポイントに記録済みのページを再利用し、未完了のページだけを処理する",
+    )
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume には --checkpoint-dir（または環境変数 OCR_CHECKPOINT_DIR）が必要です")
+
     def print_progress(current, total, message):
         print(f"進捗: [{current}/{total}] {message}")
-    
-    result = process_pdf(input_pdf, output_pdf, progress_callback=print_progress)
-    
+
+    options = dict(
+        progress_callback=print_progress,
+        checkpoint_dir=args.checkpoint_dir or '',
+        resume=args.resume,
+    )
+    if is_image_upload(args.input):
+        result = process_images(args.input, args.output, **options)
+    else:
+        result = process_pdf(args.input, args.output, **options)
+
     if result["success"]:
         print(f"\n✓ 成功: {result['pages_processed']}ページを処理しました")
+        if result.get("pages_resumed"):
+            print(f"  チェックポイントから再開: {result['pages_resumed']}ページ")
         print(f"  出力: {result['output_path']}")
     else:
         print(f"\n✗ 失敗: {result['error']}")
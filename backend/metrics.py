@@ -0,0 +1,109 @@
+"""
+処理段階ごとの所要時間メトリクス
+アップロード受信・画像→PDF・レンダリング・前処理・エンジンごとのOCR・正規化・オーバーレイ作成・
+合成・書き出しの所要時間をヒストグラムに集計し、Prometheus のテキスト形式で出力する（/metrics）。
+
+ラベルは stage（処理段階）/ engine（OCRエンジン）/ dpi（レンダリングDPI）/ variant（前処理の種類）。
+段階に関係しないラベルは空のまま（出力では省略）にする。
+
+ワーカープロセス（OcrWorkerPool・ページ並列）で計測した値は drain() で取り出して
+呼び出し側のプロセスへ送り、merge() で集計に加える。
+"""
+import contextlib
+import threading
+import time
+
+METRIC_NAME = 'ocr_stage_duration_seconds'
+METRIC_HELP = '処理段階ごとの所要時間（秒）'
+LABEL_NAMES = ('stage', 'engine', 'dpi', 'variant')
+# バケットの上限（秒）。ページのOCRは数百ミリ秒〜数十秒、合成は文書サイズに比例する
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+# {ラベル値のタプル: [バケットごとの件数..., 合計秒数, 件数]}
+_series = {}
+
+
+def _labels(stage, engine, dpi, variant):
+    return (str(stage), str(engine or ''), str(dpi or ''), str(variant or ''))
+
+
+def observe(stage, seconds, engine=None, dpi=None, variant=None):
+    """stage の所要時間 seconds を記録する。"""
+    key = _labels(stage, engine, dpi, variant)
+    with _lock:
+        values = _series.get(key)
+        if values is None:
+            values = _series[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+                break
+        values[-2] += seconds
+        values[-1] += 1
+
+
+@contextlib.contextmanager
+def span(stage, engine=None, dpi=None, variant=None):
+    """with ブロックの所要時間を stage として記録する（例外で抜けた場合も記録する）。"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, engine, dpi, variant)
+
+
+def drain():
+    """記録済みの値を取り出して空にする（ワーカープロセスから呼び出し側へ送る用。pickle 可能な dict）。"""
+    global _series
+    with _lock:
+        series, _series = _series, {}
+    return series
+
+
+def merge(series):
+    """drain() で取り出した値を集計に加える。"""
+    if not series:
+        return
+    with _lock:
+        for key, values in series.items():
+            current = _series.get(key)
+            if current is None:
+                _series[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    current[i] += value
+
+
+def _format_labels(key, extra=''):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(LABEL_NAMES, key) if value]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """集計を Prometheus のテキスト形式で返す。"""
+    with _lock:
+        series = {key: list(values) for key, values in _series.items()}
+
+    lines = [f"# HELP {METRIC_NAME} {METRIC_HELP}", f"# TYPE {METRIC_NAME} histogram"]
+    for key in sorted(series):
+        values = series[key]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            labels = _format_labels(key, 'le="%s"' % bound)
+            lines.append(f"{METRIC_NAME}_bucket{labels} {cumulative}")
+        labels = _format_labels(key, 'le="+Inf"')
+        lines.append(f"{METRIC_NAME}_bucket{labels} {values[-1]}")
+        labels = _format_labels(key)
+        lines.append(f"{METRIC_NAME}_sum{labels} {values[-2]!r}")
+        lines.append(f"{METRIC_NAME}_count{labels} {values[-1]}")
+    return '\n'.join(lines) + '\n'
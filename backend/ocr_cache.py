@@ -0,0 +1,140 @@
+"""
+OCR結果キャッシュ
+レンダリング済みページ画像のハッシュをキーに、正規化済みOCRアイテムを SQLite に保存する。
+同じ文書を再処理した場合はレンダリングとハッシュ計算だけで OCR を省略できる。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# エンジン名 → モデル/実装バージョンを取得する配布パッケージ名
+_ENGINE_DISTRIBUTIONS = {
+    'paddleocr': ('paddleocr', 'paddlepaddle'),
+    'onnxocr': ('onnxocr', 'onnxruntime'),
+}
+
+_engine_versions = {}
+
+
+def engine_version(engine):
+    """キャッシュキーに含めるエンジンのバージョン文字列を返す（取得できない場合は 'unknown'）。"""
+    version = _engine_versions.get(engine)
+    if version is None:
+        from importlib import metadata
+
+        parts = []
+        for dist in _ENGINE_DISTRIBUTIONS.get(engine, (engine,)):
+            try:
+                parts.append(f"{dist}={metadata.version(dist)}")
+            except metadata.PackageNotFoundError:
+                continue
+        version = ','.join(parts) or 'unknown'
+        _engine_versions[engine] = version
+    return version
+
+
+def image_digest(img):
+    """ページ画像（ndarray）の内容ハッシュを返す。形状・型も含める。"""
+    h = hashlib.blake2b(digest_size=32)
+    h.update(f"{img.shape}|{img.dtype}".encode('ascii'))
+    _update(h, img)
+    return h.hexdigest()
+
+
+def tiles_digest(shape, tiles):
+    """タイルごとに描画されるページ画像の内容ハッシュを返す（ページ全体のビットマップは作らない）。
+
+    tiles はタイル画像（ndarray）を決まった順に返す反復可能オブジェクト。
+    """
+    h = hashlib.blake2b(digest_size=32)
+    h.update(f"{tuple(shape)}|tiles".encode('ascii'))
+    for tile in tiles:
+        h.update(f"{tile.shape}|{tile.dtype}".encode('ascii'))
+        _update(h, tile)
+    return h.hexdigest()
+
+
+def _update(h, img):
+    # コピーせずにハッシュする（行パディング付きのビューは行単位で読む）
+    if img.flags['C_CONTIGUOUS']:
+        h.update(memoryview(img).cast('B'))
+    else:
+        import numpy as np
+
+        for row in img:
+            h.update(memoryview(np.ascontiguousarray(row)).cast('B'))
+
+
+def make_key(digest, engine, dpi, settings=''):
+    """キャッシュキーを作る。settings にはOCR結果を変える設定（前処理・タイル分割など）の文字列を渡す。"""
+    if settings:
+        settings = hashlib.blake2b(settings.encode('utf-8'), digest_size=8).hexdigest()
+    return f"{digest}:{engine}:{engine_version(engine)}:{dpi}:{settings}"
+
+
+class OcrCache:
+    """サイズ上限付き LRU の OCR 結果キャッシュ（SQLite）"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'ocr_cache.sqlite3')
+        self._lock = threading.Lock()
+        # ページ並列時は複数プロセスが同じファイルを開くため、ロック待ちを許容する
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' items TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+
+    def get(self, key):
+        """キャッシュ済みアイテムのリストを返す（なければ None）。"""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT items FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        items = json.loads(row[0])
+        for item in items:
+            item['bbox'] = tuple(item['bbox'])
+        return items
+
+    def put(self, key, items):
+        # 座標は numpy のスカラー型で来ることがあるため float に寄せる
+        payload = json.dumps(items, ensure_ascii=False, default=float)
+        size = len(payload.encode('utf-8')) + len(key)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, items, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, payload, size, time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        """合計サイズが上限を超えていれば、最終アクセスが古いものから削除する。"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        removed = 0
+        doomed = []
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY last_access'):
+            doomed.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        self._conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
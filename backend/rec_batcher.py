@@ -0,0 +1,209 @@
+"""
+テキスト認識のバッチ化
+複数ページ（複数スレッド）から届く文字行画像をまとめ、認識モデルを大きなバッチで1回だけ実行する。
+ONNX Runtime (CPU) は小さなバッチを何度も実行するより、まとめて実行した方がスループットが高い。
+
+ページのレンダリングは直列のため、次のページが参加するのは前のページの検出より後になることが多い。
+文書ごとの PageStream でレンダリング待ちのページを予告しておくと、その文書のページが最後に参加したバッチは、
+予告したページが参加するまで実行を待つ（別の文書・別のエンジンインスタンスのバッチは待たない）。
+"""
+import contextlib
+import contextvars
+import threading
+import time
+
+# PageStream / Arrival と各バッチの予告数（_arrivals）を保護する
+_lock = threading.Lock()
+# このコンテキストのページの Arrival（participant() に入った時点で解除する）
+_current_arrival = contextvars.ContextVar('rec_batcher_arrival', default=None)
+
+
+class PageStream:
+    """1文書分のページの並び
+
+    announce() で予告したページは、この文書のページが最後に参加した RecognitionBatcher の待ち対象になる
+    （まだどのバッチにも参加していなければ、最初に参加したバッチに数える）。
+    """
+
+    def __init__(self):
+        self._batcher = None
+        self._pending = set()
+
+    def announce(self):
+        """まもなく認識要求を出すページを予告し、Arrival を返す。"""
+        arrival = Arrival(self)
+        with _lock:
+            self._pending.add(arrival)
+            if self._batcher is not None:
+                self._batcher._arrivals += 1
+        return arrival
+
+    def _attach(self, batcher):
+        """予告中のページを batcher の待ち対象に移す。"""
+        with _lock:
+            previous = self._batcher
+            if previous is batcher:
+                return
+            self._batcher = batcher
+            if previous is not None:
+                previous._arrivals -= len(self._pending)
+            batcher._arrivals += len(self._pending)
+        if previous is not None:
+            previous._notify()
+
+
+class Arrival:
+    """PageStream.announce() で予告したページ（participant() に入るか release() で解除される）"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._released = False
+
+    def release(self):
+        """予告を解除する（2回目以降は何もしない）。"""
+        with _lock:
+            if self._released:
+                return
+            self._released = True
+            self._stream._pending.discard(self)
+            batcher = self._stream._batcher
+            if batcher is not None:
+                batcher._arrivals -= 1
+        if batcher is not None:
+            batcher._notify()
+
+    @contextlib.contextmanager
+    def bind(self):
+        """with ブロック内（コピーしたコンテキストで動く別スレッドを含む）で最初に participant() に入ったときに解除する。"""
+        token = _current_arrival.set(self)
+        try:
+            yield self
+        finally:
+            _current_arrival.reset(token)
+            self.release()
+
+
+def release_current():
+    """このコンテキストのページの予告を解除する（エンジンの空き待ちなど、すぐには参加できないとき）。"""
+    arrival = _current_arrival.get()
+    if arrival is not None:
+        arrival.release()
+
+
+class _Request:
+    def __init__(self, crops):
+        self.crops = crops
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RecognitionBatcher:
+    """文字行画像の認識要求を集約してバッチ実行する
+
+    recognize(crops) は [(text, score), ...] を返す認識関数（入力と同じ順序）。
+    次のいずれかでバッチを実行する:
+    - 集まった画像数が batch_size に達した
+    - 参加中のスレッドが全員要求を出して待っていて、このバッチに予告済みのページもない（これ以上待っても増えない）
+    - 予告済みのページがある場合は、最初の要求から max_arrival_wait_sec 経過した
+    - 予告済みのページがなく、検出中のスレッドだけを待っている場合は、最初の要求から max_wait_sec 経過した
+
+    arrival_timeouts は予告済みのページを待ちきれずに実行したバッチ数（0 でなければ予告が過剰か待ち時間が短い）。
+    """
+
+    def __init__(self, recognize, batch_size=32, max_wait_sec=0.05, max_arrival_wait_sec=1.0):
+        self._recognize = recognize
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait_sec = max(0.0, float(max_wait_sec))
+        self.max_arrival_wait_sec = max(self.max_wait_sec, float(max_arrival_wait_sec))
+        self._cond = threading.Condition()
+        self._pending = []
+        self._participants = 0
+        # このバッチを待ち対象にしている予告済みページ数（_lock で更新する）
+        self._arrivals = 0
+        self.arrival_timeouts = 0
+        self._thread = threading.Thread(target=self._loop, name='rec-batcher', daemon=True)
+        self._thread.start()
+
+    @contextlib.contextmanager
+    def participant(self):
+        """このスレッドが認識要求を出す可能性がある期間を示す（バッチ実行の判断に使う）。"""
+        with self._cond:
+            self._participants += 1
+        # 参加者に数えてから予告を解除する（間に「全員待機」と判定されないように）。
+        # 同じ文書の残りの予告はこのバッチの待ち対象に移す
+        arrival = _current_arrival.get()
+        if arrival is not None:
+            arrival._stream._attach(self)
+            arrival.release()
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._participants -= 1
+                self._cond.notify_all()
+
+    def recognize(self, crops):
+        """crops を認識して結果を返す（他スレッドの要求とまとめて実行されるまで待つ）。"""
+        if not crops:
+            return []
+        request = _Request(list(crops))
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _deadline(self, started):
+        """まだ待つ場合の期限を返す（すぐに実行すべきなら None）。"""
+        if sum(len(r.crops) for r in self._pending) >= self.batch_size:
+            return None
+        if self._arrivals > 0:
+            return started + self.max_arrival_wait_sec
+        if len(self._pending) >= self._participants:
+            return None
+        return started + self.max_wait_sec
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                started = time.monotonic()
+                while True:
+                    deadline = self._deadline(started)
+                    if deadline is None:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        if self._arrivals > 0:
+                            self.arrival_timeouts += 1
+                        break
+                    self._cond.wait(timeout=remaining)
+                batch, self._pending = self._pending, []
+            self._run(batch)
+
+    def _run(self, batch):
+        crops = [crop for request in batch for crop in request.crops]
+        try:
+            results = list(self._recognize(crops))
+            if len(results) != len(crops):
+                raise Exception(f"認識結果の件数が一致しません: {len(results)} != {len(crops)}")
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        # 要求ごとに結果を切り分けて返す
+        offset = 0
+        for request in batch:
+            request.result = results[offset:offset + len(request.crops)]
+            offset += len(request.crops)
+            request.done.set()
@@ -3,6 +3,11 @@ Pythonバックエンドの基本機能テスト
 """
 import sys
 import os
+import json
+import subprocess
+import tempfile
+import time
+import zipfile
 
 def test_imports():
     """必要なパッケージのインポートテスト"""
@@ -42,7 +47,8 @@ def test_ocr_engine():
     try:
         from main import get_ocr_engine
         print("OCRエンジンを初期化中...")
-        ocr = get_ocr_engine()
+        with get_ocr_engine() as ocr:
+            assert ocr is not None
         print("✓ OCRエンジン初期化成功")
         return True
     except Exception as e:
@@ -50,6 +56,148 @@ def test_ocr_engine():
         return False
 
 
+def test_onnx_batched_ocr():
+    """認識バッチ化のテスト: _onnx_ocr_batched の結果が OnnxOCR 本体の ocr() と一致すること
+
+    モデルは読み込まず、ONNXPaddleOcr の検出器・認識器だけをスタブに差し替えて比較する。
+    """
+    print("\n" + "=" * 60)
+    print("認識バッチ化テスト")
+    print("=" * 60)
+
+    try:
+        import numpy as np
+        from onnxocr.onnx_paddleocr import ONNXPaddleOcr
+        import main
+
+        # 同じ行で左右が逆順の2行（並べ替えの確認）と、drop_score 未満の1行
+        boxes = np.array([
+            [[220, 12], [300, 12], [300, 40], [220, 40]],
+            [[10, 10], [200, 10], [200, 40], [10, 40]],
+            [[10, 80], [150, 80], [150, 110], [10, 110]],
+        ], dtype=np.float32)
+
+        def detect(img):
+            return boxes.copy()
+
+        def recognize(crops):
+            # 切り出し画像の内容から結果を決める（切り出し方が違えば結果も変わる）
+            return [(f"行{crop.shape[1]}x{crop.shape[0]}:{int(crop.sum()) % 997}", 0.3 if crop.shape[1] < 150 else 0.9)
+                    for crop in crops]
+
+        engine = ONNXPaddleOcr.__new__(ONNXPaddleOcr)
+        engine.text_detector = detect
+        engine.text_recognizer = recognize
+        engine.use_angle_cls = False
+        engine.drop_score = 0.5
+        engine.args = type('Args', (), {'det_box_type': 'quad', 'save_crop_res': False})()
+        engine.crop_image_res_index = 0
+
+        img = np.random.default_rng(0).integers(0, 255, (128, 320, 3), dtype=np.uint8)
+        plain = engine.ocr(img, cls=False)
+        batched = main._onnx_ocr_batched(engine, img)
+        assert [[line[0], tuple(line[1])] for line in batched[0]] == \
+            [[line[0], tuple(line[1])] for line in plain[0]], f"{batched} != {plain}"
+        print("✓ ocr() と同じ結果 ... OK")
+
+        class NoPipeline:
+            def ocr(self, img):
+                return [[]]
+
+        assert main._instance_concurrency(NoPipeline()) == 1, "バッチ化できないインスタンスは同時に1ページ"
+        print("✓ バッチ化できないインスタンスの同時実行数 ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ 認識バッチ化エラー: {e}")
+        return False
+
+
+def test_rec_batch_concurrent_documents():
+    """認識バッチ化のテスト: 2文書を同時に処理しても、他の文書のページを待ってバッチが止まらないこと
+
+    エンジンはスタブ（検出・認識の代わりに短時間スリープ）。1インスタンスを2文書で共有し、
+    予告したページを待ちきれずに実行したバッチ（arrival_timeouts）がないことを確認する。
+    """
+    print("\n" + "=" * 60)
+    print("認識バッチ化（複数文書の同時処理）テスト")
+    print("=" * 60)
+
+    try:
+        import threading
+        import numpy as np
+        from reportlab.pdfgen import canvas
+        from engine_pool import EnginePool
+        import main
+
+        class StubDetector:
+            def __call__(self, img):
+                time.sleep(0.02)
+                return np.array([[[10, 10], [60, 10], [60, 30], [10, 30]]], dtype=np.float32)
+
+        class StubRecognizer:
+            rec_batch_num = 6
+
+            def __call__(self, crops):
+                time.sleep(0.02)
+                return [("テキスト", 0.9) for _ in crops]
+
+        class StubEngine:
+            drop_score = 0.5
+            use_angle_cls = False
+            args = type('Args', (), {'det_box_type': 'quad'})()
+            text_detector = StubDetector()
+            text_recognizer = StubRecognizer()
+
+        saved_pool = main._engine_pools.get('onnxocr')
+        saved_cache = main.OCR_CACHE_ENABLED
+        engine = StubEngine()
+        main._engine_pools['onnxocr'] = EnginePool(
+            'onnxocr', lambda: engine, size=1, max_users=main._instance_concurrency,
+        )
+        main.OCR_CACHE_ENABLED = False
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                pdf_path = os.path.join(tmp, 'doc.pdf')
+                pdf = canvas.Canvas(pdf_path, pagesize=(200, 200))
+                for page in range(6):
+                    pdf.drawString(20, 150, f"page {page + 1}")
+                    pdf.showPage()
+                pdf.save()
+
+                results = {}
+
+                def process(index):
+                    results[index] = main.process_pdf(
+                        pdf_path, os.path.join(tmp, f'out{index}.pdf'),
+                        dpi=72, ocr_engine='onnxocr', checkpoint_dir='',
+                    )
+
+                started = time.monotonic()
+                threads = [threading.Thread(target=process, args=(i,)) for i in range(2)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.monotonic() - started
+
+            assert all(r["success"] and r["engine_stats"]["onnxocr"]["total_text_count"] == 6
+                       for r in results.values()), results
+            batcher = main._get_rec_batcher(engine)
+            assert batcher.arrival_timeouts == 0, f"予告ページ待ちの時間切れ {batcher.arrival_timeouts}回"
+            print(f"✓ 2文書の同時処理で待ちの時間切れなし（{elapsed:.2f}秒） ... OK")
+        finally:
+            main.OCR_CACHE_ENABLED = saved_cache
+            if saved_pool is None:
+                main._engine_pools.pop('onnxocr', None)
+            else:
+                main._engine_pools['onnxocr'] = saved_pool
+            main._rec_batchers.pop(id(engine), None)
+        return True
+    except Exception as e:
+        print(f"✗ 認識バッチ化（複数文書）エラー: {e}")
+        return False
+
+
 def test_pdf_functions():
     """PDF処理関数のテスト"""
     print("\n" + "=" * 60)
@@ -58,14 +206,16 @@ def test_pdf_functions():
     
     try:
         from main import render_pdf_to_image, run_ocr, normalize_ocr_results
-        from main import create_overlay_pdf, merge_overlay
+        from main import create_overlay_pdf, build_text_overlay, merge_overlay, process_images
         
         functions = [
             "render_pdf_to_image",
             "run_ocr",
             "normalize_ocr_results",
             "create_overlay_pdf",
+            "build_text_overlay",
             "merge_overlay",
+            "process_images",
         ]
         
         for func_name in functions:
@@ -77,6 +227,383 @@ def test_pdf_functions():
         return False
 
 
+def test_text_layer():
+    """透明テキストレイヤーのテスト: 合成したPDFからBMP外の文字も含めて抽出でき、フォントを全ページで共有すること"""
+    print("\n" + "=" * 60)
+    print("透明テキストレイヤーテスト")
+    print("=" * 60)
+
+    try:
+        import pypdfium2 as pdfium
+        from pypdf import PdfReader
+        from reportlab.pdfgen import canvas
+        from main import build_text_overlay, merge_overlay
+
+        with tempfile.TemporaryDirectory() as tmp:
+            original_path = os.path.join(tmp, 'blank.pdf')
+            pdf = canvas.Canvas(original_path, pagesize=(300, 300))
+            pdf.showPage()
+            pdf.showPage()
+            pdf.save()
+
+            # 𠮷 は CJK 拡張B（BMP外）の漢字
+            text = '吉野家𠮷テスト'
+            overlay = build_text_overlay(300, [{"text": text, "bbox": (10, 10, 200, 40)}])
+            output_path = os.path.join(tmp, 'output.pdf')
+            # 通常方式（pypdf の PdfWriter で合成）
+            merge_overlay(original_path, [overlay, overlay], output_path, streaming=False)
+
+            document = pdfium.PdfDocument(output_path)
+            try:
+                extracted = document[1].get_textpage().get_text_bounded()
+            finally:
+                document.close()
+            assert text in extracted, f"抽出テキスト {extracted!r}"
+            fonts = [page['/Resources']['/Font'].raw_get('/OcrF') for page in PdfReader(output_path).pages]
+            assert fonts[0].idnum == fonts[1].idnum, "フォントが共有されていない"
+            # UCS2 の CMap ではサロゲートが2文字分の別々のコードとして解釈される
+            encoding = fonts[0].get_object()['/Encoding']
+            assert encoding == '/UniJIS-UTF16-H', f"CMap {encoding}"
+            print("✓ BMP外の文字の抽出と共有フォント ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ 透明テキストレイヤーエラー: {e}")
+        return False
+
+
+def test_tiled_render():
+    """タイル分割のテスト: 大判ページはページ全体を描画せず、タイルごとの描画結果が全体描画の切り出しと一致すること"""
+    print("\n" + "=" * 60)
+    print("タイル分割レンダリングテスト")
+    print("=" * 60)
+
+    try:
+        import numpy as np
+        from reportlab.pdfgen import canvas
+        import main
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, 'large.pdf')
+            pdf = canvas.Canvas(pdf_path, pagesize=(1200, 900))
+            for i in range(20):
+                pdf.drawString(30 + i * 40, 30 + i * 40, f"Line {i} sample text")
+            pdf.showPage()
+            pdf.save()
+
+            saved = (main.TILE_SIZE, main.TILE_OVERLAP, main.TILE_MAX_SIDE)
+            main.TILE_SIZE, main.TILE_OVERLAP, main.TILE_MAX_SIDE = 512, 64, 1000
+            try:
+                with main.PdfSession(pdf_path) as session:
+                    page_img, _ = main._render_for_ocr(session, 0, 150, 'color')
+                    assert isinstance(page_img, main.TiledPage), type(page_img)
+                    full, width, height = session.render_array(0, 150)
+                    assert page_img.shape == full.shape, (page_img.shape, full.shape)
+                    tiles = list(main._iter_tiles(page_img))
+                    for x0, y0, tile in tiles:
+                        expected = full[y0:y0 + 512, x0:x0 + 512]
+                        assert tile.shape == expected.shape, f"タイル ({x0}, {y0}) {tile.shape}"
+                        # 切り口にかかるグリフだけは1px程度ずれて描画されることがあるため、ごく一部の差は許容する
+                        assert np.count_nonzero(tile != expected) <= tile.size * 0.01, f"タイル ({x0}, {y0})"
+                    print(f"✓ {width}x{height}px を {len(tiles)} タイルで個別に描画 ... OK")
+            finally:
+                main.TILE_SIZE, main.TILE_OVERLAP, main.TILE_MAX_SIDE = saved
+        return True
+    except Exception as e:
+        print(f"✗ タイル分割レンダリングエラー: {e}")
+        return False
+
+
+def test_image_input():
+    """画像入力（マルチページTIFF・ZIP）のテスト: 元の圧縮データのままPDFに埋め込まれること"""
+    print("\n" + "=" * 60)
+    print("画像入力テスト")
+    print("=" * 60)
+
+    try:
+        from PIL import Image
+        from pypdf import PdfReader
+        from image_input import ImageDocument
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # ファクス相当: 204x98dpi の G4 圧縮 2ページ TIFF を ZIP にまとめる
+            frames = [Image.new('1', (1728, 1100), 1), Image.new('1', (1728, 1100), 0)]
+            tiff_path = os.path.join(tmp, 'fax.tif')
+            frames[0].save(tiff_path, compression='group4', save_all=True,
+                           append_images=frames[1:], dpi=(204, 98))
+            zip_path = os.path.join(tmp, 'batch.zip')
+            with zipfile.ZipFile(zip_path, 'w') as archive:
+                archive.write(tiff_path, 'fax.tif')
+
+            document = ImageDocument(zip_path)
+            pdf_path = document.write_pdf(os.path.join(tmp, 'images.pdf'))
+            pages = PdfReader(pdf_path).pages
+            assert len(pages) == 2, f"ページ数 {len(pages)}"
+            page_w, page_h = (float(v) for v in pages[0].mediabox.upper_right)
+            assert abs(page_w - 1728 * 72 / 204) < 0.01 and abs(page_h - 1100 * 72 / 98) < 0.01, "ページサイズ"
+            filters = {xobj.get_object()['/Filter'] for xobj in pages[1]['/Resources']['/XObject'].values()}
+            assert filters == {'/CCITTFaxDecode'}, f"フィルタ {filters}"
+            print("✓ G4 TIFF（ZIP内・2ページ）を再圧縮せず埋め込み ... OK")
+
+            frame, dpi = document.load_frame(1)
+            assert (frame.mode, frame.size, dpi) == ('L', (1728, 2290), 204), (frame.mode, frame.size, dpi)
+            print("✓ OCR用フレーム（正方ピクセル化） ... OK")
+
+            # 展開後サイズ・メンバー数の上限を超える ZIP は展開せずに拒否する
+            import image_input
+            bomb_path = os.path.join(tmp, 'bomb.zip')
+            with zipfile.ZipFile(bomb_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('page1.png', b'\0' * (4 * 1024 * 1024))
+                archive.writestr('page2.png', b'\0' * 1024)
+                archive.writestr('page3.png', b'\0' * 1024)
+            assert os.path.getsize(bomb_path) < 64 * 1024, "圧縮後サイズ"
+            saved = (image_input.ZIP_MAX_MEMBERS, image_input.ZIP_MAX_MEMBER_BYTES, image_input.ZIP_MAX_TOTAL_BYTES)
+            try:
+                for limits, reason in (((10, 1024 * 1024, 64 * 1024 * 1024), '大きすぎます'),
+                                       ((10, 64 * 1024 * 1024, 1024 * 1024), '大きすぎます'),
+                                       ((2, 64 * 1024 * 1024, 64 * 1024 * 1024), '多すぎます')):
+                    image_input.ZIP_MAX_MEMBERS, image_input.ZIP_MAX_MEMBER_BYTES, image_input.ZIP_MAX_TOTAL_BYTES = limits
+                    try:
+                        ImageDocument(bomb_path)
+                    except ValueError as e:
+                        assert reason in str(e), f"{limits}: {e}"
+                    else:
+                        raise AssertionError(f"上限 {limits} で拒否されない")
+            finally:
+                image_input.ZIP_MAX_MEMBERS, image_input.ZIP_MAX_MEMBER_BYTES, image_input.ZIP_MAX_TOTAL_BYTES = saved
+            print("✓ 上限を超えるZIPの拒否 ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ 画像入力エラー: {e}")
+        return False
+
+
+def test_document_cache():
+    """文書キャッシュのテスト: 利用されても登録時刻から TTL で期限切れになること"""
+    print("\n" + "=" * 60)
+    print("文書キャッシュテスト")
+    print("=" * 60)
+
+    try:
+        from doc_cache import DocumentCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DocumentCache(os.path.join(tmp, 'cache'), ttl_sec=100, max_bytes=1024 * 1024)
+            output_path = os.path.join(tmp, 'output.pdf')
+            with open(output_path, 'wb') as f:
+                f.write(b'%PDF-1.4\n')
+            cache.store('doc', output_path, {"success": True})
+
+            created = time.time() - 90
+            os.utime(os.path.join(tmp, 'cache', 'doc.json'), (created, created))
+            assert cache.fetch('doc', os.path.join(tmp, 'hit.pdf')) == {"success": True}, "期限内の取り出し"
+            created -= 20
+            os.utime(os.path.join(tmp, 'cache', 'doc.json'), (created, created))
+            assert cache.fetch('doc', os.path.join(tmp, 'expired.pdf')) is None, "利用でTTLが延長された"
+            print("✓ 登録時刻からのTTL ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ 文書キャッシュエラー: {e}")
+        return False
+
+
+def test_checkpoint():
+    """チェックポイントのテスト: 記録したページを再開時に復元できること"""
+    print("\n" + "=" * 60)
+    print("チェックポイントテスト")
+    print("=" * 60)
+
+    try:
+        import checkpoint
+        from checkpoint import PageCheckpoint
+        from text_overlay import TextOverlay
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PageCheckpoint(tmp, 'doc', page_count=3)
+            store.save(0, {'page_num': 0, 'overlay': TextOverlay(b'BT\nET\n'), 'engine_results': {}, 'dpi': 300})
+            store.save(2, {'page_num': 2, 'overlay': None, 'engine_results': {}, 'dpi': 300})
+
+            # 記録中の文書は別の処理と共有せず、期限切れの掃除でも消さない
+            try:
+                PageCheckpoint(tmp, 'doc', page_count=3, resume=False)
+                assert False, "使用中のチェックポイントを開けてしまった"
+            except checkpoint.CheckpointBusy:
+                pass
+            old = time.time() - 3600
+            os.utime(os.path.join(tmp, 'doc'), (old, old))
+            checkpoint.prune(tmp, 60)
+            assert os.path.isdir(os.path.join(tmp, 'doc')), "使用中のチェックポイントが掃除された"
+            store.close()
+            print("✓ 使用中のチェックポイントの保護 ... OK")
+
+            resumed = PageCheckpoint(tmp, 'doc', page_count=3, resume=True)
+            pages = resumed.load()
+            resumed.close()
+            assert sorted(pages) == [0, 2], f"復元ページ {sorted(pages)}"
+            assert pages[0]['overlay'].content == b'BT\nET\n' and pages[2]['overlay'] is None
+            print("✓ 記録済みページの復元 ... OK")
+
+            resized = PageCheckpoint(tmp, 'doc', page_count=4, resume=True)
+            assert resized.load() == {}, "ページ数違いは破棄"
+            resized.close()
+            print("✓ ページ数が異なる記録の破棄 ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ チェックポイントエラー: {e}")
+        return False
+
+
+def test_job_events():
+    """ジョブのイベントログのテスト: 進捗・ページイベント・終了状態を順に読み出せること"""
+    print("\n" + "=" * 60)
+    print("ジョブイベントテスト")
+    print("=" * 60)
+
+    try:
+        from jobs import JobManager
+
+        def target(progress_callback, cancel_event, event_callback):
+            progress_callback(1, 1, "ページ 1/1 を処理中...")
+            event_callback('page_ocr', {'page': 1, 'engine': 'onnxocr', 'elapsed_sec': 0.1, 'text_count': 2})
+            return {"success": True}
+
+        manager = JobManager(max_workers=1)
+        job = manager.submit(target)
+        events, cursor, finished = [], 0, False
+        while not finished:
+            new_events, finished = job.events_after(cursor, timeout=5)
+            events += new_events
+            cursor = events[-1]["id"] if events else 0
+        names = [item["event"] for item in events]
+        assert names == ['status', 'progress', 'page_ocr', 'status'], f"イベント順 {names}"
+        assert events[-1]["data"]["status"] == 'completed'
+        assert job.events_after(2, timeout=0) == (events[2:], True), "途中からの再読み出し"
+        print("✓ イベントの順序と再読み出し ... OK")
+        return True
+    except Exception as e:
+        print(f"✗ ジョブイベントエラー: {e}")
+        return False
+
+
+def test_metrics():
+    """メトリクスのテスト: 段階ごとの所要時間をヒストグラムとして出力し、ワーカーの値を合算できること"""
+    print("\n" + "=" * 60)
+    print("メトリクステスト")
+    print("=" * 60)
+
+    try:
+        import metrics
+
+        saved = metrics.drain()
+        try:
+            metrics.observe('ocr', 0.3, engine='onnxocr', dpi=300)
+            worker_series = metrics.drain()
+            metrics.observe('ocr', 2.0, engine='onnxocr', dpi=300)
+            with metrics.span('merge'):
+                pass
+            metrics.merge(worker_series)
+
+            text = metrics.render()
+            labels = 'stage="ocr",engine="onnxocr",dpi="300"'
+            assert f'ocr_stage_duration_seconds_bucket{{{labels},le="0.5"}} 1' in text, text
+            assert f'ocr_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text, text
+            assert f'ocr_stage_duration_seconds_count{{{labels}}} 2' in text, text
+            assert 'ocr_stage_duration_seconds_count{stage="merge"} 1' in text, text
+            print("✓ ヒストグラム出力とワーカー分の合算 ... OK")
+        finally:
+            metrics.drain()
+            metrics.merge(saved)
+        return True
+    except Exception as e:
+        print(f"✗ メトリクスエラー: {e}")
+        return False
+
+
+# `import main` にかけてよい時間（ミリ秒）。重い依存は初回利用時に読み込むため、これを超えたら退行。
+IMPORT_BUDGET_MS = int(os.environ.get('OCR_IMPORT_BUDGET_MS', '1000'))
+# `import main` の時点では読み込まれていてはいけないモジュール
+LAZY_MODULES = ["numpy", "cv2", "pypdfium2", "pypdf", "reportlab", "PIL", "urllib3", "ssl"]
+
+
+def test_import_time():
+    """main モジュールのインポート時間テスト（別プロセスで計測）"""
+    print("\n" + "=" * 60)
+    print("インポート時間テスト")
+    print("=" * 60)
+
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        "import main\n"
+        "elapsed_ms = (time.perf_counter() - t) * 1000\n"
+        f"loaded = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed_ms': elapsed_ms, 'loaded': loaded}))\n"
+    )
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+    except Exception as e:
+        print(f"✗ 計測失敗: {e}")
+        return False
+
+    ok = True
+    print(f"  import main: {report['elapsed_ms']:.0f}ms (上限 {IMPORT_BUDGET_MS}ms)")
+    if report['elapsed_ms'] > IMPORT_BUDGET_MS:
+        print("✗ インポート時間が上限を超えています")
+        ok = False
+    if report['loaded']:
+        print(f"✗ インポート時に重い依存が読み込まれています: {', '.join(report['loaded'])}")
+        ok = False
+    if ok:
+        print("✓ インポート時間 ... OK")
+    return ok
+
+
+def test_event_stream_limit():
+    """イベントストリームのテスト: 1ジョブあたりの同時接続数を超えた接続は 429 になり、切断すると枠が空くこと"""
+    print("\n" + "=" * 60)
+    print("イベントストリーム接続数テスト")
+    print("=" * 60)
+
+    try:
+        import threading
+        import app as app_module
+
+        release = threading.Event()
+
+        def target(progress_callback, cancel_event, event_callback):
+            release.wait(10)
+            return {"success": True}
+
+        job = app_module.job_manager.submit(target)
+        client = app_module.app.test_client()
+        url = f"/api/ocr/jobs/{job.job_id}/events"
+        streams = []
+        try:
+            streams += [client.get(url, buffered=False) for _ in range(app_module.SSE_MAX_STREAMS_PER_JOB)]
+            assert all(r.status_code == 200 for r in streams), [r.status_code for r in streams]
+            rejected = client.get(url)
+            assert rejected.status_code == 429 and rejected.headers.get('Retry-After'), rejected.status_code
+            streams.pop().close()
+            reopened = client.get(url, buffered=False)
+            assert reopened.status_code == 200, "切断後に枠が空かない"
+            streams.append(reopened)
+            print("✓ 1ジョブあたりの同時接続数の上限 ... OK")
+        finally:
+            release.set()
+            for response in streams:
+                response.close()
+        return True
+    except Exception as e:
+        print(f"✗ イベントストリーム接続数エラー: {e}")
+        return False
+
+
 def test_flask_app():
     """Flask APIのテスト"""
     print("\n" + "=" * 60)
@@ -88,8 +615,13 @@ def test_flask_app():
         
         endpoints = [
             "/api/health",
+            "/api/ready",
             "/api/ocr/process",
+            "/api/ocr/jobs",
+            "/api/ocr/jobs/<job_id>",
+            "/api/ocr/jobs/<job_id>/events",
             "/api/ocr/download/<file_id>",
+            "/metrics",
         ]
         
         print("✓ Flaskアプリケーション初期化成功")
@@ -115,7 +647,18 @@ def run_all_tests():
     # 各テストを実行
     results.append(("パッケージインポート", test_imports()))
     results.append(("OCRエンジン初期化", test_ocr_engine()))
+    results.append(("認識バッチ化", test_onnx_batched_ocr()))
+    results.append(("認識バッチ化（複数文書）", test_rec_batch_concurrent_documents()))
     results.append(("PDF処理関数", test_pdf_functions()))
+    results.append(("透明テキストレイヤー", test_text_layer()))
+    results.append(("タイル分割レンダリング", test_tiled_render()))
+    results.append(("画像入力", test_image_input()))
+    results.append(("文書キャッシュ", test_document_cache()))
+    results.append(("チェックポイント", test_checkpoint()))
+    results.append(("ジョブイベント", test_job_events()))
+    results.append(("メトリクス", test_metrics()))
+    results.append(("インポート時間", test_import_time()))
+    results.append(("イベントストリーム接続数", test_event_stream_limit()))
     results.append(("Flask API", test_flask_app()))
     
     # 結果サマリー
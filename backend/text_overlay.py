@@ -0,0 +1,92 @@
+"""
+透明テキストレイヤー
+OCR結果からページに追記する透明テキストのコンテンツストリームを直接生成する。
+ページごとに ReportLab で PDF を作って合成時に再パースする代わりに、
+合成時は文書全体で1つの日本語CIDフォント（Type0, UniJIS-UTF16-H）を共有する。
+文字列は UTF-16BE で書くため、BMP外の文字（CJK拡張B の漢字など）もサロゲートペアのまま1文字として扱われる。
+"""
+
+# コンテンツストリーム内でフォントを参照するリソース名（ページ側で衝突する場合は合成時に付け替える）
+FONT_RESOURCE_NAME = '/OcrF'
+# ReportLab の組み込みCIDフォント（埋め込みなし）
+FONT_NAME = 'HeiseiKakuGo-W5'
+FONT_ENCODING = 'UniJIS-UTF16-H'
+
+
+class TextOverlay:
+    """1ページ分の透明テキスト（BT〜ET のコンテンツストリーム）"""
+
+    def __init__(self, content):
+        self.content = content
+
+    def render(self, font_resource_name=FONT_RESOURCE_NAME):
+        """フォントのリソース名を font_resource_name にしたコンテンツストリームを返す。"""
+        if font_resource_name == FONT_RESOURCE_NAME:
+            return self.content
+        # 文字列は16進表記なので、リソース名以外に '/' は現れない
+        return self.content.replace(
+            FONT_RESOURCE_NAME.encode('ascii') + b' ',
+            font_resource_name.encode('ascii') + b' ',
+        )
+
+    def __bool__(self):
+        return bool(self.content)
+
+
+def build_text_overlay(page_h_pt, ocr_items, scale_x=1.0, scale_y=1.0):
+    """正規化済みOCRアイテムから透明テキストの TextOverlay を作る（文字がなければ None）。
+
+    配置・フォントサイズは create_overlay_pdf と同じ。描画モード 3（不可視）で描くため、
+    透明度の ExtGState も不要。
+    """
+    lines = []
+    for item in ocr_items:
+        text = item["text"]
+        if not text:
+            continue
+        x1, y1, x2, y2 = item["bbox"]
+
+        # OCR結果(画像px)をPDFポイント座標へ変換し、矩形の高さにフォントサイズを合わせる
+        fontsize = max(6, (y2 - y1) * scale_y * 0.9)
+        # PDF座標は左下原点なので上下を反転
+        baseline_y = page_h_pt - y2 * scale_y
+        lines.append(
+            f"{FONT_RESOURCE_NAME} {fontsize:.2f} Tf 1 0 0 1 {x1 * scale_x:.2f} {baseline_y:.2f} Tm "
+            f"<{text.encode('utf-16-be').hex()}> Tj"
+        )
+    if not lines:
+        return None
+    return TextOverlay(("BT\n3 Tr\n" + "\n".join(lines) + "\nET\n").encode('ascii'))
+
+
+def _to_pdf_object(value):
+    """ReportLab のフォント定義（dict / tuple / '/Name' / '(String)' / 数値）を pypdf のオブジェクトにする。"""
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        NameObject,
+        NumberObject,
+        TextStringObject,
+    )
+
+    if isinstance(value, dict):
+        return DictionaryObject({NameObject('/' + k): _to_pdf_object(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return ArrayObject(_to_pdf_object(v) for v in value)
+    if isinstance(value, str):
+        if value.startswith('/'):
+            return NameObject(value)
+        if value.startswith('(') and value.endswith(')'):
+            return TextStringObject(value[1:-1])
+    return NumberObject(value)
+
+
+def font_dict():
+    """文書で共有する Type0 フォント辞書（pypdf の DictionaryObject）を作る。"""
+    from reportlab.pdfbase._cidfontdata import CIDFontInfo
+
+    info = dict(CIDFontInfo[FONT_NAME])
+    # 'Name'（PDF 1.0 の名残で省略可）はリソース名と食い違うため入れない
+    info.pop('Name', None)
+    info['Encoding'] = '/' + FONT_ENCODING
+    return _to_pdf_object(info)
@@ -0,0 +1,218 @@
+"""
+OCRワーカープロセスプール
+OCRエンジンはスレッド間で共有すると安全でないため、本番運用ではエンジンを
+ワーカープロセスごとに1組ずつ持たせ、空いているワーカーにジョブを振り分ける。
+
+- 重いライブラリ（numpy / OpenCV / pypdfium2 / pypdf / ReportLab / OnnxOCR）は
+  forkserver の親プロセスで一度だけ読み込み、各ワーカーはそれを fork して共有する（コピーオンライト）。
+- 推論セッションはスレッドを持つため fork 後に使えない。エンジン本体は各ワーカーの起動時に
+  初期化・ウォームアップし、完了をプールに報告する。
+- Windows など fork できない環境では spawn で起動し、ワーカーごとに読み込む。
+- 進捗・ページ単位のイベント・メトリクスとキャンセル要求は Manager のキュー/イベントでプロセス間を中継する。
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+# forkserver の親プロセスで先に読み込んでおくモジュール（読み込めないものは無視される）
+_PRELOAD_MODULES = [
+    'numpy',
+    'cv2',
+    'pypdfium2',
+    'pypdf',
+    'reportlab.pdfgen.canvas',
+    'main',
+]
+_ENGINE_PRELOAD_MODULES = {
+    'onnxocr': ['onnxocr.onnx_paddleocr'],
+}
+
+# 進捗キューを確認する間隔（秒）
+_POLL_INTERVAL_SEC = 0.2
+# 起動時に全ワーカーのウォームアップ完了を待ち合わせる上限（秒）
+_STARTUP_TIMEOUT_SEC = 600
+
+# ワーカープロセス内: 起動時のウォームアップ結果
+_worker_report = None
+
+
+def _start_method():
+    """forkserver が使えればそれを、使えなければ spawn を返す。"""
+    methods = multiprocessing.get_all_start_methods()
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _init_worker(engines):
+    """ワーカープロセスの初期化: 自分専用のエンジンを読み込みウォームアップする。"""
+    global _worker_report
+    import main
+
+    main.preload_dependencies()
+    _worker_report = main.warmup_engines(engines)
+
+
+def _report_ready(barrier):
+    """全ワーカーがそろうまで待ってから自分のウォームアップ結果を返す。
+
+    ワーカー数と同じ数だけ投入すると、待ち合わせにより各ワーカーが1件ずつ受け取るため、
+    全プロセスの起動とウォームアップを確認できる。
+    """
+    barrier.wait(_STARTUP_TIMEOUT_SEC)
+    return os.getpid(), _worker_report
+
+
+def _run_process_pdf(kwargs, progress_queue, cancel_event, relay_events=False):
+    """ワーカープロセス側で process_pdf を実行する。
+
+    進捗は ('progress', (current, total, message))、イベントは ('event', (event, data))、
+    終了時にこのジョブで計測したメトリクスを ('metrics', series) としてキューに送る。
+    """
+    import main
+
+    def progress_callback(current, total, message):
+        progress_queue.put(('progress', (current, total, message)))
+
+    def event_callback(event, data):
+        progress_queue.put(('event', (event, data)))
+
+    try:
+        return main.process_pdf(
+            progress_callback=progress_callback,
+            cancel_event=cancel_event,
+            event_callback=event_callback if relay_events else None,
+            **kwargs,
+        )
+    finally:
+        progress_queue.put(('metrics', metrics.drain()))
+
+
+class OcrWorkerPool:
+    """OCRエンジンを保持するワーカープロセスのプール
+
+    process_pdf() は main.process_pdf と同じ引数・戻り値で、空いているワーカーで実行される。
+    ワーカーが異常終了した場合はプールを作り直して以降のジョブを受け付ける。
+    """
+
+    def __init__(self, workers, engines, on_ready=None):
+        """
+        Args:
+            workers: ワーカープロセス数
+            engines: 各ワーカーで事前に読み込むエンジン名のリスト
+            on_ready: 全ワーカーのウォームアップ報告がそろったときに {pid: report} で呼ばれる
+        """
+        self.workers = max(1, int(workers))
+        self.engines = list(engines)
+        self._on_ready = on_ready
+        self._ctx = multiprocessing.get_context(_start_method())
+        self._lock = threading.Lock()
+        self._manager = None
+        self._executor = None
+
+    def start(self):
+        """ワーカープロセスを起動する（エンジンの読み込みはバックグラウンドで進む）。"""
+        with self._lock:
+            if self._executor is None:
+                self._start_locked()
+
+    def _start_locked(self):
+        if self._ctx.get_start_method() == 'forkserver':
+            preload = list(_PRELOAD_MODULES)
+            for eng in self.engines:
+                preload.extend(_ENGINE_PRELOAD_MODULES.get(eng, []))
+            self._ctx.set_forkserver_preload(preload)
+        if self._manager is None:
+            self._manager = self._ctx.Manager()
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(self.engines,),
+        )
+        print(f"[WORKERS] OCRワーカー起動: {self.workers}プロセス ({self._ctx.get_start_method()})")
+        # ProcessPoolExecutor はタスク投入時にワーカーを起動するため、ここで全ワーカーを立ち上げる
+        barrier = self._manager.Barrier(self.workers)
+        futures = [self._executor.submit(_report_ready, barrier) for _ in range(self.workers)]
+        threading.Thread(
+            target=self._collect_reports, args=(futures,),
+            name='ocr-worker-reports', daemon=True,
+        ).start()
+
+    def _collect_reports(self, futures):
+        reports = {}
+        for future in futures:
+            try:
+                pid, report = future.result()
+            except Exception as e:
+                print(f"[WORKERS WARN] ワーカーの起動確認に失敗: {e}")
+                continue
+            reports[pid] = report
+            print(f"[WORKERS] ワーカー {pid} 準備完了")
+        if self._on_ready is not None:
+            self._on_ready(reports)
+
+    def _submit(self, kwargs, progress_queue, cancel_event, relay_events):
+        args = (kwargs, progress_queue, cancel_event, relay_events)
+        with self._lock:
+            if self._executor is None:
+                self._start_locked()
+            try:
+                return self._executor.submit(_run_process_pdf, *args)
+            except BrokenProcessPool:
+                print("[WORKERS WARN] ワーカープールが停止していたため再起動します")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._start_locked()
+                return self._executor.submit(_run_process_pdf, *args)
+
+    def process_pdf(self, progress_callback=None, cancel_event=None, event_callback=None, **kwargs):
+        """空いているワーカーで process_pdf を実行し、結果 dict を返す。
+
+        progress_callback / cancel_event / event_callback は呼び出し側プロセスのもので、ワーカーとの間を中継する。
+        """
+        with self._lock:
+            if self._manager is None:
+                self._start_locked()
+            progress_queue = self._manager.Queue()
+            remote_cancel = self._manager.Event()
+
+        future = self._submit(kwargs, progress_queue, remote_cancel, event_callback is not None)
+
+        def relay_progress(block):
+            while True:
+                try:
+                    kind, payload = progress_queue.get(block, _POLL_INTERVAL_SEC)
+                except queue.Empty:
+                    return
+                if kind == 'progress' and progress_callback:
+                    progress_callback(*payload)
+                elif kind == 'event' and event_callback:
+                    event_callback(*payload)
+                elif kind == 'metrics':
+                    metrics.merge(payload)
+                block = False
+
+        while not future.done():
+            relay_progress(block=True)
+            if cancel_event is not None and cancel_event.is_set() and not remote_cancel.is_set():
+                remote_cancel.set()
+        relay_progress(block=False)
+
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            return {"success": False, "error": f"OCRワーカーが異常終了しました: {e}"}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
@@ -8,6 +8,94 @@ const API_BASE_URL =
     ? process.env.REACT_APP_API_URL
     : 'http://localhost:5000';
 
+// エラーレスポンスからメッセージを取り出す
+async function readErrorMessage(response, fallback) {
+  try {
+    const errorData = await response.json();
+    return errorData?.error || fallback;
+  } catch (_) {
+    try {
+      const text = await response.text();
+      if (text) return text;
+    } catch (_) {
+      // ignore
+    }
+  }
+  return fallback;
+}
+
+// ジョブ状態のポーリング間隔（イベントストリームを使えない場合）
+const JOB_POLL_INTERVAL_MS = 1000;
+
+// ジョブ状態を一定間隔で取得し、完了時の結果を返す
+async function pollJob(jobId, signal, onProgress) {
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const response = await fetch(`${API_BASE_URL}/api/ocr/jobs/${jobId}`, { signal });
+    if (!response.ok) {
+      throw new Error(await readErrorMessage(response, 'OCR処理の進捗を取得できませんでした'));
+    }
+    const job = await response.json();
+    if (job.progress?.total) {
+      onProgress(job.progress.current / job.progress.total);
+    }
+    if (job.status === 'completed') {
+      return job.result;
+    }
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      throw new Error(job.error || 'OCR処理に失敗しました');
+    }
+  }
+}
+
+// ジョブのイベントストリーム（Server-Sent Events）を購読し、完了時の結果を返す
+// 中断時はイベントストリームを閉じ、サーバー側のジョブもキャンセルする
+function waitForJob(jobId, signal, onProgress) {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}/api/ocr/jobs/${jobId}/events`);
+
+    const close = () => {
+      source.close();
+      signal.removeEventListener('abort', onAbort);
+    };
+    const onAbort = () => {
+      close();
+      fetch(`${API_BASE_URL}/api/ocr/jobs/${jobId}`, { method: 'DELETE' }).catch(() => {});
+      const abortError = new Error('処理が中断されました');
+      abortError.name = 'AbortError';
+      reject(abortError);
+    };
+    signal.addEventListener('abort', onAbort);
+
+    source.addEventListener('progress', (event) => {
+      const { current, total } = JSON.parse(event.data);
+      if (total) {
+        onProgress(current / total);
+      }
+    });
+    source.addEventListener('status', (event) => {
+      const job = JSON.parse(event.data);
+      if (job.status === 'completed') {
+        close();
+        resolve(job.result);
+      } else if (job.status === 'failed' || job.status === 'cancelled') {
+        close();
+        reject(new Error(job.error || 'OCR処理に失敗しました'));
+      }
+    });
+    // 一時的な切断は EventSource が Last-Event-ID 付きで再接続する。
+    // 再接続しない場合（同時接続数の上限で 429 になった場合など）はジョブ状態のポーリングに切り替える
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        source.close();
+        pollJob(jobId, signal, onProgress).then(resolve, reject).finally(() => {
+          signal.removeEventListener('abort', onAbort);
+        });
+      }
+    };
+  });
+}
+
 export function useOCR() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [progress, setProgress] = useState(0);
@@ -53,30 +141,34 @@ export function useOCR() {
       console.log('[useOCR] APIリクエスト送信中...');
       setProgress(10);
 
-      // PythonバックエンドにOCR処理をリクエスト
-      const response = await fetch(`${API_BASE_URL}/api/ocr/process`, {
-        method: 'POST',
-        body: formData,
-        signal: abortControllerRef.current.signal,
-      });
-
-      if (!response.ok) {
-        let message = 'OCR処理に失敗しました';
-        try {
-          const errorData = await response.json();
-          message = errorData?.error || message;
-        } catch (_) {
-          try {
-            const text = await response.text();
-            if (text) message = text;
-          } catch (_) {
-            // ignore
-          }
+      const { signal } = abortControllerRef.current;
+      let result;
+      if (typeof EventSource !== 'undefined') {
+        // ジョブとして投入し、ページ単位の進捗をイベントストリームで受け取る
+        const response = await fetch(`${API_BASE_URL}/api/ocr/jobs`, {
+          method: 'POST',
+          body: formData,
+          signal,
+        });
+        if (!response.ok) {
+          throw new Error(await readErrorMessage(response, 'OCR処理に失敗しました'));
         }
-        throw new Error(message);
+        const job = await response.json();
+        result = await waitForJob(job.job_id, signal, (ratio) => {
+          setProgress(Math.round(10 + 70 * ratio));
+        });
+      } else {
+        // EventSource が使えない環境では処理完了まで待機する同期APIを使う
+        const response = await fetch(`${API_BASE_URL}/api/ocr/process`, {
+          method: 'POST',
+          body: formData,
+          signal,
+        });
+        if (!response.ok) {
+          throw new Error(await readErrorMessage(response, 'OCR処理に失敗しました'));
+        }
+        result = await response.json();
       }
-
-      const result = await response.json();
       console.log('[useOCR] OCR処理完了:', result);
 
       if (!result.success) {
@@ -93,7 +185,7 @@ export function useOCR() {
       // 処理済みPDFをダウンロード
       console.log('[useOCR] 処理済みPDFダウンロード中...');
       const downloadResponse = await fetch(`${API_BASE_URL}/api/ocr/download/${result.file_id}`, {
-        signal: abortControllerRef.current.signal,
+        signal,
       });
 
       if (!downloadResponse.ok) {
@@ -277,3 +277,198 @@ describe('useOCR Hook', () => {
     expect(processResult.pdfBlob).toBeNull();
   });
 });
+
+describe('useOCR Hook（イベントストリーム）', () => {
+  // EventSource をモック（生成されたインスタンスからイベントを送る）
+  class MockEventSource {
+    static CLOSED = 2;
+
+    constructor(url) {
+      this.url = url;
+      this.readyState = 1;
+      this.listeners = {};
+      MockEventSource.instances.push(this);
+    }
+
+    addEventListener(type, listener) {
+      (this.listeners[type] = this.listeners[type] || []).push(listener);
+    }
+
+    close() {
+      this.readyState = MockEventSource.CLOSED;
+    }
+
+    send(type, data) {
+      (this.listeners[type] || []).forEach((listener) => listener({ data: JSON.stringify(data) }));
+    }
+  }
+
+  beforeEach(() => {
+    jest.clearAllMocks();
+    MockEventSource.instances = [];
+    global.EventSource = MockEventSource;
+  });
+
+  afterEach(() => {
+    delete global.EventSource;
+  });
+
+  it('ジョブのイベントで進捗を更新し、完了時の結果でPDFを取得する', async () => {
+    const mockFile = new File(['dummy content'], 'test.pdf', { type: 'application/pdf' });
+    const mockPdfBlob = new Blob(['mock pdf'], { type: 'application/pdf' });
+
+    global.fetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({ success: true, job_id: 'job-1', status: 'queued' }),
+      })
+      .mockResolvedValueOnce({
+        ok: true,
+        blob: async () => mockPdfBlob,
+      });
+
+    const { result } = renderHook(() => useOCR());
+
+    let processPromise;
+    act(() => {
+      processPromise = result.current.processPages(mockFile, ['onnxocr']);
+    });
+
+    await waitFor(() => {
+      expect(MockEventSource.instances).toHaveLength(1);
+    });
+    const source = MockEventSource.instances[0];
+    expect(source.url).toBe('http://localhost:5000/api/ocr/jobs/job-1/events');
+    expect(global.fetch.mock.calls[0][0]).toBe('http://localhost:5000/api/ocr/jobs');
+
+    act(() => {
+      source.send('progress', { current: 1, total: 2, message: 'ページ 1/2 を処理中...' });
+    });
+    expect(result.current.progress).toBe(45);
+
+    let processResult;
+    await act(async () => {
+      source.send('status', {
+        status: 'completed',
+        result: { success: true, file_id: 'out.pdf', pages_processed: 2, best_engine: 'onnxocr' },
+      });
+      processResult = await processPromise;
+    });
+
+    expect(source.readyState).toBe(MockEventSource.CLOSED);
+    expect(global.fetch.mock.calls[1][0]).toBe('http://localhost:5000/api/ocr/download/out.pdf');
+    expect(processResult.pdfBlob).toBe(mockPdfBlob);
+    expect(processResult.pagesProcessed).toBe(2);
+    expect(result.current.progress).toBe(100);
+  });
+
+  it('イベントストリームに接続できない場合はジョブ状態のポーリングで完了を待つ', async () => {
+    const mockFile = new File(['dummy content'], 'test.pdf', { type: 'application/pdf' });
+    const mockPdfBlob = new Blob(['mock pdf'], { type: 'application/pdf' });
+
+    global.fetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({ success: true, job_id: 'job-4', status: 'queued' }),
+      })
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({
+          success: true,
+          status: 'completed',
+          progress: { current: 2, total: 2 },
+          result: { success: true, file_id: 'out.pdf', pages_processed: 2, best_engine: 'onnxocr' },
+        }),
+      })
+      .mockResolvedValueOnce({
+        ok: true,
+        blob: async () => mockPdfBlob,
+      });
+
+    const { result } = renderHook(() => useOCR());
+
+    let processPromise;
+    act(() => {
+      processPromise = result.current.processPages(mockFile, ['onnxocr']);
+    });
+
+    await waitFor(() => {
+      expect(MockEventSource.instances).toHaveLength(1);
+    });
+    const source = MockEventSource.instances[0];
+
+    let processResult;
+    await act(async () => {
+      // 同時接続数の上限（429）などで EventSource が再接続せずに閉じた
+      source.readyState = MockEventSource.CLOSED;
+      source.onerror();
+      processResult = await processPromise;
+    });
+
+    expect(global.fetch.mock.calls[1][0]).toBe('http://localhost:5000/api/ocr/jobs/job-4');
+    expect(global.fetch.mock.calls[2][0]).toBe('http://localhost:5000/api/ocr/download/out.pdf');
+    expect(processResult.pdfBlob).toBe(mockPdfBlob);
+    expect(result.current.progress).toBe(100);
+  });
+
+  it('ジョブが失敗した場合はエラーを返す', async () => {
+    const mockFile = new File(['dummy content'], 'test.pdf', { type: 'application/pdf' });
+
+    global.fetch.mockResolvedValueOnce({
+      ok: true,
+      json: async () => ({ success: true, job_id: 'job-2', status: 'queued' }),
+    });
+
+    const { result } = renderHook(() => useOCR());
+
+    let processPromise;
+    act(() => {
+      processPromise = result.current.processPages(mockFile, ['onnxocr']);
+    });
+
+    await waitFor(() => {
+      expect(MockEventSource.instances).toHaveLength(1);
+    });
+
+    await act(async () => {
+      MockEventSource.instances[0].send('status', { status: 'failed', error: 'OCR処理エラー' });
+      await expect(processPromise).rejects.toThrow();
+    });
+
+    expect(result.current.error).not.toBeNull();
+    expect(result.current.isProcessing).toBe(false);
+    expect(global.fetch).toHaveBeenCalledTimes(1);
+  });
+
+  it('キャンセル時はイベントストリームを閉じてジョブをキャンセルする', async () => {
+    const mockFile = new File(['dummy content'], 'test.pdf', { type: 'application/pdf' });
+
+    global.fetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({ success: true, job_id: 'job-3', status: 'queued' }),
+      })
+      .mockResolvedValueOnce({ ok: true, json: async () => ({ success: true }) });
+
+    const { result } = renderHook(() => useOCR());
+
+    let processPromise;
+    act(() => {
+      processPromise = result.current.processPages(mockFile, ['onnxocr']);
+    });
+
+    await waitFor(() => {
+      expect(MockEventSource.instances).toHaveLength(1);
+    });
+
+    let processResult;
+    await act(async () => {
+      result.current.cancelProcessing();
+      processResult = await processPromise;
+    });
+
+    expect(MockEventSource.instances[0].readyState).toBe(MockEventSource.CLOSED);
+    expect(global.fetch).toHaveBeenLastCalledWith('http://localhost:5000/api/ocr/jobs/job-3', { method: 'DELETE' });
+    expect(processResult.pdfBlob).toBeNull();
+  });
+});